@@ -1,27 +1,28 @@
-from langchain_openai import ChatOpenAI
 from langsmith import traceable
-from langchain.schema import HumanMessage, AIMessage, SystemMessage
-from langchain.tools import Tool
 from typing import TypedDict, Literal, List, Optional, Dict, Any
-from pymongo import MongoClient
-from bson import ObjectId
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Union
 from bson import ObjectId
-from langchain_openai import ChatOpenAI
-from langgraph.prebuilt import create_react_agent
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.tools import Tool
 
 import os
 import re
+from datetime import datetime, timezone
 
-from tools.pdf_source import get_pdf_source_tool
-from tools.uri_source import get_uri_source_tool
+from db import collection, run_db
+from history import ConversationHistory, history_budget
+from graph_cache import CachedAgentGraph, agent_graph_cache, agent_graph_key
+from registry import REGISTRY_PAGE_SIZE, name_key, registry
+from response_cache import response_cache
+from router import ROUTER_MODE, agent_router, match_agent_name
+from telemetry import span, warn
+from tools.execution import AGENT_TOOL_CONCURRENCY, TOOL_TIMEOUT, limit_tools
+from tools.factories import tool_factories
 
-sessions_db = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/")).llmtf.sessions
-agents_db = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/")).llmtf.agents
-connectors_db = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/")).llmtf.connectors
+sessions_db = collection("sessions")
+agents_db = collection("agents")
+connectors_db = collection("connectors")
 
 Connectors = Literal[
     "source_pdf",
@@ -89,6 +90,10 @@ class Agent(BaseModel):
     temperature: float = Field(default=0.7, ge=0.0, le=2.0)
     tools: List[Tool] = []
     connector_ids: List[PyObjectId] = Field(default_factory=list)
+    history_token_budget: Optional[int] = Field(default=None, gt=0)
+    summarize_history: bool = True
+    tool_concurrency: Optional[int] = Field(default=None, gt=0)
+    response_cache: bool = False
     created_at: str
     updated_at: str
 
@@ -99,6 +104,10 @@ class AgentCreate(BaseModel):
     temperature: float = Field(default=0.7, ge=0.0, le=2.0)
     tools: List[Tool] = []
     connector_ids: List[PyObjectId] = Field(default_factory=list)
+    history_token_budget: Optional[int] = Field(default=None, gt=0)
+    summarize_history: bool = True
+    tool_concurrency: Optional[int] = Field(default=None, gt=0)
+    response_cache: bool = False
 
 class AgentUpdate(BaseModel):
     name: Optional[str] = None
@@ -107,6 +116,12 @@ class AgentUpdate(BaseModel):
     temperature: Optional[float] = Field(default=None, ge=0.0, le=2.0)
     tools: Optional[List[Tool]] = None
     connector_ids: Optional[List[PyObjectId]] = None
+    history_token_budget: Optional[int] = Field(default=None, gt=0)
+    summarize_history: Optional[bool] = None
+    tool_concurrency: Optional[int] = Field(default=None, gt=0)
+    response_cache: Optional[bool] = None
+
+GENERALIST_CACHE_KEY = "__generalist__"
 
 class ChatHistoryEntry(TypedDict):
     user: str
@@ -121,90 +136,281 @@ class AgentState(TypedDict, total=False):
     agent_name: str
     answer: str
 
-@traceable
-async def get_agent_graph(
-    question: str,
-    organization_id: ObjectId,
-    chat_history: Optional[List[dict]] = None,
-    agent_id: Optional[str] = None,
-) -> Tuple:
-    """Return a LangGraph ReAct agent graph + metadata for execution."""
-    if isinstance(question, dict):
-        action = question.get("action")
-        if action == "list_agents":
-            return None, [{"agents": list(agents_db.find({}))}], None, None
-        elif action == "list_connectors":
-            return None, [{"connectors": list(connectors_db.find({}))}], None, None
-
-    question = question.strip()
-    chat_history = chat_history or []
+def _apply_settings_action(question: dict, organization_id: Optional[ObjectId]) -> List[dict]:
+    """
+    Run an add/edit/delete/link settings action and drop the cached graphs it
+    affects. Actions on existing agents and connectors only match those of
+    organization_id, and report how many documents they matched.
+    """
+    action = question.get("action")
+    now = datetime.now(timezone.utc).isoformat()
+    agent_id = question.get("agent_id")
+    connector_id = question.get("connector_id")
 
-    # --- Step 1: Select agent (either explicit ID or via router) ---
-    print(f"Selecting agent for question: {agent_id}")
-    if agent_id:
-        selected_agent = agents_db.find_one(
-            {"_id": ObjectId(agent_id)}
-        )
+    if action == "add_agent":
+        result = agents_db.insert_one({
+            "name": question["name"],
+            "name_key": name_key(question["name"]),
+            "description": question.get("description", ""),
+            "org": organization_id,
+            "model": question.get("model", "gpt-4o-mini"),
+            "temperature": question.get("temperature", 0.7),
+            "connector_ids": [],
+            "history_token_budget": question.get("history_token_budget"),
+            "summarize_history": question.get("summarize_history", True),
+            "tool_concurrency": question.get("tool_concurrency"),
+            "response_cache": question.get("response_cache", False),
+            "created_at": now,
+            "updated_at": now,
+        })
+        return [{"agent_id": str(result.inserted_id)}]
+    elif action == "edit_agent":
+        fields = {k: question[k] for k in ("name", "description", "model", "temperature", "history_token_budget", "summarize_history", "tool_concurrency", "response_cache") if question.get(k) is not None}
+        if "name" in fields:
+            fields["name_key"] = name_key(fields["name"])
+        matched = agents_db.update_one(
+            {"_id": ObjectId(agent_id), "org": organization_id}, {"$set": {**fields, "updated_at": now}}
+        ).matched_count
+        if matched:
+            agent_graph_cache.invalidate(agent_id=agent_id)
+            response_cache.invalidate(agent_id=agent_id)
+            agent_router.invalidate(agent_id)
+    elif action == "delete_agent":
+        matched = agents_db.delete_one({"_id": ObjectId(agent_id), "org": organization_id}).deleted_count
+        if matched:
+            agent_graph_cache.invalidate(agent_id=agent_id)
+            response_cache.invalidate(agent_id=agent_id)
+            agent_router.invalidate(agent_id)
+    elif action == "add_connector":
+        result = connectors_db.insert_one({
+            "name": question["name"],
+            "name_key": name_key(question["name"]),
+            "connector_type": question.get("type"),
+            "settings": question.get("settings", {}),
+            "org": organization_id,
+        })
+        return [{"connector_id": str(result.inserted_id)}]
+    elif action == "edit_connector":
+        fields = {"name": question.get("name"), "connector_type": question.get("type"), "settings": question.get("settings")}
+        fields = {k: v for k, v in fields.items() if v is not None}
+        if "name" in fields:
+            fields["name_key"] = name_key(fields["name"])
+        scope = {"_id": ObjectId(connector_id), "org": organization_id}
+        if fields:
+            matched = connectors_db.update_one(scope, {"$set": fields}).matched_count
+        else:
+            matched = int(connectors_db.find_one(scope, {"_id": 1}) is not None)
+        if matched:
+            agent_graph_cache.invalidate(connector_id=connector_id)
+            response_cache.invalidate(connector_id=connector_id)
+    elif action == "delete_connector":
+        matched = connectors_db.delete_one({"_id": ObjectId(connector_id), "org": organization_id}).deleted_count
+        if matched:
+            agents_db.update_many({"connector_ids": ObjectId(connector_id)}, {"$pull": {"connector_ids": ObjectId(connector_id)}})
+            agent_graph_cache.invalidate(connector_id=connector_id)
+            response_cache.invalidate(connector_id=connector_id)
+    elif action in ("link_connector", "unlink_connector"):
+        operator = "$addToSet" if action == "link_connector" else "$pull"
+        matched = 0
+        # Both sides must belong to the organization: linking another organization's connector would expose its data.
+        if connectors_db.find_one({"_id": ObjectId(connector_id), "org": organization_id}, {"_id": 1}) is not None:
+            matched = agents_db.update_one(
+                {"_id": ObjectId(agent_id), "org": organization_id},
+                {operator: {"connector_ids": ObjectId(connector_id)}, "$set": {"updated_at": now}},
+            ).matched_count
+        if matched:
+            agent_graph_cache.invalidate(agent_id=agent_id)
+            response_cache.invalidate(agent_id=agent_id)
     else:
-        agents = list(agents_db.find({"org": organization_id}))
-        selected_agent = None
-        if agents:
-            agent_descriptions = "\n".join(
-                [f"- {agent['name']}: {agent['description']}" for agent in agents]
-            )
-            router_prompt = [
-                SystemMessage(
-                    content="Route the user's question to the most appropriate agent.\n"
-                            f"Available Agents:\n{agent_descriptions}"
-                ),
-                HumanMessage(content=question),
-            ]
-            router_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-            selected_agent_name = (await router_llm.ainvoke(router_prompt)).content.strip()
-            selected_agent = next((a for a in agents if a["name"] == selected_agent_name), None)
-
-    # --- Step 2: Collect tools ---
+        raise ValueError(f"Unknown settings action: {action}")
+    return [{"matched": matched}]
+
+def chat_model(**kwargs: Any):
+    """A ChatOpenAI client; langchain_openai is only imported once an agent actually needs a model."""
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(**kwargs)
+
+def _build_agent_graph(selected_agent: Optional[dict], agent_connectors: List[dict], key: str) -> CachedAgentGraph:
     tools: List[Tool] = []
     if selected_agent:
-        tools.extend(selected_agent.get("tools", []))
-        tool_factory_map = {
-            "source_pdf": get_pdf_source_tool,
-            "source_uri": get_uri_source_tool
-        }
-        connector_ids = selected_agent.get("connector_ids", [])
-        if connector_ids:
-            agent_connectors = list(connectors_db.find({"_id": {"$in": connector_ids}}))
+        with span("agent.tool_construction") as s:
+            tools.extend(selected_agent.get("tools", []))
+            timeouts = {}
+            data_sources = []
             for connector in agent_connectors:
-                factory = tool_factory_map.get(connector.get("connector_type"))
+                factory = tool_factories.get(connector.get("connector_type"))
                 if not factory:
                     continue
                 tool_name = f"{connector['connector_type']}_{connector['name']}".replace(" ", "_").lower()
                 tools.append(factory(settings=connector["settings"], name=tool_name))
+                timeouts[tool_name] = float(connector["settings"].get("timeout", TOOL_TIMEOUT))
+                data_version = tool_factories.data_version(connector.get("connector_type"))
+                if data_version:
+                    data_sources.append((data_version, connector["settings"]))
+            # Calls from one model step run concurrently, up to the agent's limit.
+            tools = limit_tools(tools, selected_agent.get("tool_concurrency") or AGENT_TOOL_CONCURRENCY, timeouts)
+            s.set(tools=[t.name for t in tools])
 
-        for t in tools:
-            print(f"Using tool: {t.name} - {t.description}")
-
-        llm = ChatOpenAI(
+        llm = chat_model(
             model=selected_agent["model"],
             temperature=selected_agent.get("temperature", 0.7),
             streaming=True,
+            stream_usage=True,
             max_retries=3,
         )
         system_prompt = selected_agent["description"]
         final_agent_id, final_agent_name = selected_agent["_id"], selected_agent["name"]
     else:
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, max_retries=3)
+        llm = chat_model(model="gpt-4o-mini", temperature=0.7, streaming=True, stream_usage=True, max_retries=3)
         system_prompt = "You are a helpful general-purpose assistant."
         final_agent_id, final_agent_name = None, "Generalist"
+        data_sources = []
+
+    with span("agent.graph_compile"):
+        from langgraph.prebuilt import create_react_agent
+
+        graph = create_react_agent(llm, tools)
+    return CachedAgentGraph(
+        key=key,
+        graph=graph,
+        tools=tools,
+        system_prompt=system_prompt,
+        agent_id=final_agent_id,
+        agent_name=final_agent_name,
+        org=selected_agent.get("org") if selected_agent else None,
+        connector_ids=frozenset(str(c["_id"]) for c in agent_connectors),
+        model=selected_agent["model"] if selected_agent else "gpt-4o-mini",
+        history_token_budget=selected_agent.get("history_token_budget") if selected_agent else None,
+        summarize_history=selected_agent.get("summarize_history", True) if selected_agent else True,
+        response_cache=bool(selected_agent.get("response_cache")) if selected_agent else False,
+        data_sources=data_sources,
+    )
+
+def _cached_agent_graph(selected_agent: Optional[dict]) -> CachedAgentGraph:
+    """Return the compiled graph for an agent, rebuilding it only when its configuration changed."""
+    if not selected_agent:
+        cached = agent_graph_cache.get(GENERALIST_CACHE_KEY, key=GENERALIST_CACHE_KEY)
+        return cached or agent_graph_cache.put(GENERALIST_CACHE_KEY, _build_agent_graph(None, [], GENERALIST_CACHE_KEY))
 
-    # --- Step 3: Create graph ---
-    graph = create_react_agent(llm, tools)
+    cache_id = str(selected_agent["_id"])
+    cached = agent_graph_cache.get(cache_id)
+    if cached:
+        return cached
+
+    connector_ids = selected_agent.get("connector_ids", [])
+    with span("agent.connector_load") as s:
+        agent_connectors = list(connectors_db.find({"_id": {"$in": connector_ids}})) if connector_ids else []
+        s.set(connectors=len(agent_connectors))
+    key = agent_graph_key(selected_agent, agent_connectors)
+    cached = agent_graph_cache.get(cache_id, key=key)
+    if cached:
+        return cached
+    return agent_graph_cache.put(cache_id, _build_agent_graph(selected_agent, agent_connectors, key))
+
+async def _llm_route(question: str, agents: List[dict]) -> Optional[dict]:
+    agent_descriptions = "\n".join(
+        [f"- {agent['name']}: {agent['description']}" for agent in agents]
+    )
+    router_prompt = [
+        SystemMessage(
+            content="Route the user's question to the most appropriate agent.\n"
+                    f"Available Agents:\n{agent_descriptions}"
+        ),
+        HumanMessage(content=question),
+    ]
+    router_llm = chat_model(model="gpt-4o-mini", temperature=0)
+    return match_agent_name((await router_llm.ainvoke(router_prompt)).content, agents)
+
+async def _route_question(question: str, agents: List[dict]) -> Optional[dict]:
+    """Route by embedding similarity, asking the LLM router only when the match is ambiguous."""
+    if ROUTER_MODE != "embedding":
+        return await _llm_route(question, agents)
+    try:
+        decision = await agent_router.route(question, agents)
+    except Exception as e:
+        warn("router.llm_fallback", f"Embedding router failed, falling back to the LLM router: {e}")
+        return await _llm_route(question, agents)
+    if decision.confident:
+        return decision.agent
+    # Only the close candidates are worth an LLM call.
+    candidates = [a for a in (decision.agent, decision.runner_up) if a is not None]
+    return await _llm_route(question, candidates)
+
+@traceable
+async def get_agent_graph(
+    question: str,
+    organization_id: ObjectId,
+    chat_history: Optional[Union[ConversationHistory, List[dict]]] = None,
+    agent_id: Optional[str] = None,
+) -> Tuple:
+    """Return a LangGraph ReAct agent graph + metadata for execution."""
+    if isinstance(question, dict):
+        action = question.get("action")
+        if action in ("list_agents", "list_connectors"):
+            listing = registry.list_agents if action == "list_agents" else registry.list_connectors
+            page = await run_db(
+                listing, organization_id,
+                prefix=question.get("prefix", ""),
+                page=question.get("page", 0),
+                limit=question.get("limit", REGISTRY_PAGE_SIZE),
+            )
+            return None, [{action.split("_", 1)[1]: page}], None, None
+        try:
+            return None, await run_db(_apply_settings_action, question, organization_id), None, None
+        finally:
+            registry.invalidate()
+
+    question = question.strip()
+    # A summary of a history built here would be discarded with it, so only a caller's ConversationHistory is summarized.
+    ephemeral = not isinstance(chat_history, ConversationHistory)
+    if ephemeral:
+        chat_history = ConversationHistory(chat_history or [])
+
+    # --- Step 1: Select agent (either explicit ID or via router) ---
+    cached = agent_graph_cache.get(str(agent_id)) if agent_id else None
+    if cached and cached.org != organization_id:
+        cached = None
+    if cached:
+        selected_agent = None
+    elif agent_id:
+        with span("agent.lookup") as s:
+            selected_agent = await run_db(agents_db.find_one, {"_id": ObjectId(agent_id), "org": organization_id})
+            s.set(agent_id=agent_id, found=selected_agent is not None)
+    else:
+        with span("agent.lookup") as s:
+            agents = await run_db(lambda: list(agents_db.find({"org": organization_id})))
+            s.set(agents=len(agents))
+        with span("agent.routing") as s:
+            selected_agent = await _route_question(question, agents) if agents else None
+            s.set(agent=selected_agent["name"] if selected_agent else None)
+
+    # --- Step 2 & 3: Collect tools and create graph (cached per agent configuration) ---
+    if not cached:
+        with span("agent.graph"):
+            cached = await run_db(_cached_agent_graph, selected_agent)
+    graph = cached.graph
+    if cached.response_cache:
+        # Replays a stored answer to a similar question, or records this one's answer.
+        graph = await response_cache.wrap(cached, question, len(chat_history))
+    system_prompt = cached.system_prompt
+    final_agent_id, final_agent_name = cached.agent_id, cached.agent_name
 
     # --- Step 4: Build message history ---
     messages = [SystemMessage(content=system_prompt)]
-    for entry in chat_history:
-        messages.append(HumanMessage(content=entry["user"]))
-        messages.append(AIMessage(content=entry["assistant"]))
+    with span("agent.history_window"):
+        window = chat_history.window(
+            cached.model,
+            history_budget(cached.model, cached.history_token_budget),
+            summarize=cached.summarize_history and not ephemeral,
+        )
+    if ephemeral and window.dropped:
+        warn(
+            "history.turns_dropped",
+            f"Dropped {window.dropped} older turns that do not fit the history budget; "
+            "pass a ConversationHistory to have them summarized",
+        )
+    messages.extend(window.messages())
     messages.append(HumanMessage(content=question))
 
     return graph, messages, final_agent_name, str(final_agent_id) if final_agent_id else None
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Measure recall@k and latency of the IVF index against the exact search.
+
+    python -m benchmarks.ann_recall
+"""
+import tempfile
+import time
+
+import numpy as np
+
+import tools.pdf_ann as pdf_ann
+from tools.similarity import build_embedding_matrix, search
+
+TOP_K = 3
+DIMENSIONS = 256
+CHUNK_COUNT = 100_000
+CLUSTERS = 400
+QUERY_COUNT = 200
+NPROBES = (1, 4, 8, 16, 32, 64)
+
+
+def make_document(count: int, dimensions: int, seed: int = 0):
+    # Clustered data, like real document embeddings, rather than uniform noise.
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((CLUSTERS, dimensions), dtype=np.float32)
+    vectors = centres[rng.integers(0, CLUSTERS, count)] + 1.5 * rng.standard_normal((count, dimensions), dtype=np.float32)
+    chunks = [{"text": f"chunk {i}", "embedding": vector.tolist()} for i, vector in enumerate(vectors)]
+    queries = vectors[rng.integers(0, count, QUERY_COUNT)] + 0.3 * rng.standard_normal((QUERY_COUNT, dimensions), dtype=np.float32)
+    return {"version": 1, "chunks": chunks}, queries
+
+
+def main():
+    document, queries = make_document(CHUNK_COUNT, DIMENSIONS)
+    matrix, _ = build_embedding_matrix(document["chunks"])
+
+    start = time.perf_counter()
+    exact = [{row for row, _ in search(matrix, query, TOP_K, -1.0)} for query in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        pdf_ann.ANN_INDEX_DIR = index_dir
+        start = time.perf_counter()
+        pdf_ann.build_index("benchmark", document, matrix, np.arange(matrix.shape[0]))
+        print(f"Built index over {CHUNK_COUNT} chunks in {time.perf_counter() - start:.1f}s")
+        index = pdf_ann.load_index("benchmark", document)
+
+        print(f"{'nprobe':>7} {'recall@' + str(TOP_K):>10} {'ms/query':>10}   (exact: {exact_ms:.2f} ms/query)")
+        for nprobe in NPROBES:
+            start = time.perf_counter()
+            approximate = [{position for position, _ in index.search(query, TOP_K, -1.0, nprobe=nprobe)} for query in queries]
+            ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            recall = np.mean([len(a & e) / len(e) for a, e in zip(approximate, exact)])
+            print(f"{nprobe:>7} {recall:>10.3f} {ann_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Show that concurrent sessions no longer serialize on MongoDB round trips.
+
+The agents and connectors collections are replaced by in-memory fakes that
+sleep for a fixed latency per call. The graph cache is warmed and its TTL set
+to zero, so every turn re-reads the agent and its connectors but no graph is
+rebuilt and the timings are database I/O only. The same sessions are then run with the blocking
+calls made inline on the event loop (the previous behaviour) and through
+db.run_db.
+
+    python -m benchmarks.db_concurrency
+"""
+import asyncio
+import contextlib
+import io
+import os
+import time
+from typing import Any, Dict, List
+
+from bson import ObjectId
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import agent  # noqa: E402
+import db  # noqa: E402
+from graph_cache import agent_graph_cache  # noqa: E402
+
+LATENCY = 0.05
+SESSION_COUNTS = (1, 8, 32)
+
+
+class SlowCollection:
+    """Just enough of a pymongo collection for get_agent_graph, with a fixed delay per call."""
+
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self.documents = {document["_id"]: document for document in documents}
+
+    def find_one(self, query: Dict[str, Any], *args, **kwargs):
+        time.sleep(LATENCY)
+        return self.documents.get(query["_id"])
+
+    def find(self, query: Dict[str, Any], *args, **kwargs):
+        time.sleep(LATENCY)
+        ids = query.get("_id", {}).get("$in")
+        return [d for key, d in self.documents.items() if ids is None or key in ids]
+
+
+async def _inline(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+async def run_sessions(count: int, agent_ids: List[str]) -> float:
+    start = time.perf_counter()
+    # get_agent_graph reports the selected agent and its tools on stdout.
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(
+            agent.get_agent_graph(f"question {i}", None, [], agent_ids[i % len(agent_ids)])
+            for i in range(count)
+        ))
+    return time.perf_counter() - start
+
+
+def main():
+    connector = {"_id": ObjectId(), "name": "docs", "connector_type": "source_uri", "settings": {"url": "http://localhost/"}}
+    agents = [
+        {"_id": ObjectId(), "name": f"agent {i}", "description": "Benchmark agent.", "model": "gpt-4o-mini", "connector_ids": [connector["_id"]]}
+        for i in range(max(SESSION_COUNTS))
+    ]
+    agent.agents_db = SlowCollection(agents)
+    agent.connectors_db = SlowCollection([connector])
+    agent_graph_cache.ttl = 0
+    agent_ids = [str(a["_id"]) for a in agents]
+    asyncio.run(run_sessions(len(agent_ids), agent_ids))
+
+    print(f"Each session makes 2 database calls of {LATENCY * 1000:.0f}ms.")
+    print(f"{'sessions':>8} {'inline (s)':>11} {'run_db (s)':>11}")
+    run_db = agent.run_db
+    for count in SESSION_COUNTS:
+        agent.run_db = _inline
+        inline = asyncio.run(run_sessions(count, agent_ids))
+        agent.run_db = run_db
+        pooled = asyncio.run(run_sessions(count, agent_ids))
+        print(f"{count:>8} {inline:>11.3f} {pooled:>11.3f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+In-process stand-ins for the external services, so benchmarks run without
+OpenAI, MongoDB or the web: a chat model that streams a canned reply with a
+configurable delay, a deterministic embedder, an in-memory collection that
+covers the pymongo calls this repo makes, and a local HTTP server for
+fixture pages.
+"""
+import asyncio
+import copy
+import json
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from bson import ObjectId
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from tools.text_index import tokenize
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Streams reply word by word: first_token_delay before the first chunk and
+    token_delay between chunks. A reply that carries tool_calls is streamed
+    as a tool-call chunk first.
+    """
+
+    replies: List[AIMessage]
+    first_token_delay: float = 0.2
+    token_delay: float = 0.01
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next_reply(self) -> AIMessage:
+        reply = self.replies[self.calls % len(self.replies)]
+        self.calls += 1
+        return reply
+
+    def _chunks(self, reply: AIMessage) -> Iterable[AIMessageChunk]:
+        if reply.tool_calls:
+            yield AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(reply.tool_calls)
+            ])
+        words = reply.content.split(" ") if reply.content else []
+        for i, word in enumerate(words):
+            yield AIMessageChunk(content=word if i == len(words) - 1 else word + " ")
+        yield AIMessageChunk(
+            content="",
+            response_metadata={"finish_reason": "tool_calls" if reply.tool_calls else "stop"},
+            usage_metadata={"input_tokens": 0, "output_tokens": len(words), "total_tokens": len(words)},
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.first_token_delay)
+        return ChatResult(generations=[ChatGeneration(message=self._next_reply())])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_delay)
+        for chunk in self._chunks(self._next_reply()):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+            time.sleep(self.token_delay)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_delay)
+        for chunk in self._chunks(self._next_reply()):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+            await asyncio.sleep(self.token_delay)
+
+
+def fake_chat_factory(reply: str = "This is a canned answer from the fake model.", **delays):
+    """Drop-in for ChatOpenAI(...) that ignores the model arguments."""
+    def factory(*args, **kwargs) -> FakeChatModel:
+        return FakeChatModel(replies=[AIMessage(content=reply)], **delays)
+    return factory
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Bag-of-trigrams embedder: deterministic, offline, and similar texts get
+    similar vectors. latency is added to every call, as an API round trip would be.
+    """
+
+    def __init__(self, size: int = 1024, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+        self.calls = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in tokenize(text):
+            padded = f"#{token}#"
+            for start in range(max(1, len(padded) - 2)):
+                vector[zlib.crc32(padded[start:start + 3].encode()) % self.size] += 1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+@contextmanager
+def serve_pages(pages: Dict[str, bytes]) -> Iterator[str]:
+    """Serve pages (path -> HTML body) on a local port; yields the base URL."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = pages.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+class _Result:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+_MISSING = object()
+
+
+def _get(document: Dict[str, Any], key: str) -> Any:
+    """The value at a dotted path, or _MISSING."""
+    value: Any = document
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _parent(document: Dict[str, Any], key: str):
+    """The dict holding the last part of a dotted path, created as needed, and that part."""
+    *parents, last = key.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    return document, last
+
+
+def _matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        value = _get(document, key)
+        exists = value is not _MISSING
+        if not exists:
+            value = None
+        if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+            for operator, operand in condition.items():
+                if operator == "$in" and not (value in operand or (isinstance(value, list) and set(value) & set(operand))):
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$exists" and exists != operand:
+                    return False
+                if operator in ("$gte", "$lt") and (value is None or (operator == "$gte") != (value >= operand)):
+                    return False
+        elif isinstance(value, list) and not isinstance(condition, list):
+            if condition not in value:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(document: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # Project before copying so that reading a few fields of a large document stays cheap.
+    if projection:
+        included = {key for key, spec in projection.items() if not isinstance(spec, dict) and spec}
+        if included:
+            keep = included | {key for key, spec in projection.items() if isinstance(spec, dict)}
+            if projection.get("_id", 1):
+                keep.add("_id")
+            document = {key: value for key, value in document.items() if key in keep}
+        else:
+            document = {key: value for key, value in document.items() if projection.get(key, 1) != 0}
+        for key, spec in projection.items():
+            if isinstance(spec, dict) and "$slice" in spec and isinstance(document.get(key), list):
+                window = spec["$slice"]
+                items = document[key]
+                document[key] = items[window[0]:window[0] + window[1]] if isinstance(window, list) else items[window:]
+    return copy.deepcopy(document)
+
+
+class _Cursor(list):
+    """The result of find: a list that also takes pymongo's cursor modifiers."""
+
+    def sort(self, key, direction: int = 1) -> "_Cursor":
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            super().sort(key=lambda d: d.get(field), reverse=order < 0)
+        return self
+
+    def limit(self, count: int) -> "_Cursor":
+        return _Cursor(self[:count]) if count else self
+
+    def skip(self, count: int) -> "_Cursor":
+        return _Cursor(self[count:])
+
+
+class InMemoryCollection:
+    """
+    Thread-safe in-memory collection with optional per-call latency. index
+    names one field whose equality matches skip the scan, as a MongoDB index
+    would; that field must not change after insert.
+    """
+
+    def __init__(self, documents: Iterable[Dict[str, Any]] = (), latency: float = 0.0, index: Optional[str] = None):
+        self.documents: Dict[Any, Dict[str, Any]] = {}
+        self.latency = latency
+        self.index = index
+        self._by_key: Dict[Any, Dict[Any, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        for document in documents:
+            self.insert_one(document)
+
+    def _candidates(self, query: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+        value = query.get(self.index) if self.index else None
+        if value is None or isinstance(value, (dict, list)):
+            return self.documents.values()
+        return self._by_key.get(value, {}).values()
+
+    def _wait(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None):
+        self._wait()
+        with self._lock:
+            if query and isinstance(query.get("_id"), ObjectId):
+                # Point lookups go straight to the document, as MongoDB's _id index would.
+                document = self.documents.get(query["_id"])
+                return _Cursor([_project(document, projection)] if document is not None and _matches(document, query) else [])
+            return _Cursor(_project(d, projection) for d in self._candidates(query or {}) if _matches(d, query or {}))
+
+    def find_one(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None):
+        found = self.find(query, projection)
+        return found[0] if found else None
+
+    def count_documents(self, query: Dict[str, Any]) -> int:
+        return len(self.find(query))
+
+    def insert_one(self, document: Dict[str, Any]):
+        document = copy.deepcopy(document)
+        document.setdefault("_id", ObjectId())
+        with self._lock:
+            self.documents[document["_id"]] = document
+            if self.index and self.index in document:
+                self._by_key.setdefault(document[self.index], {})[document["_id"]] = document
+        return _Result(inserted_id=document["_id"])
+
+    def insert_many(self, documents: Iterable[Dict[str, Any]], ordered: bool = True):
+        return _Result(inserted_ids=[self.insert_one(d).inserted_id for d in documents])
+
+    def _apply(self, document: Dict[str, Any], update: Dict[str, Any]) -> None:
+        for key, value in update.get("$set", {}).items():
+            parent, last = _parent(document, key)
+            parent[last] = copy.deepcopy(value)
+        for key in update.get("$unset", {}):
+            parent, last = _parent(document, key)
+            parent.pop(last, None)
+        for key, value in update.get("$inc", {}).items():
+            parent, last = _parent(document, key)
+            parent[last] = parent.get(last, 0) + value
+        for key, value in update.get("$push", {}).items():
+            items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+            document.setdefault(key, []).extend(copy.deepcopy(items))
+        for key, value in update.get("$addToSet", {}).items():
+            items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+            for item in items:
+                if item not in document.setdefault(key, []):
+                    document[key].append(copy.deepcopy(item))
+        for key, value in update.get("$pull", {}).items():
+            document[key] = [item for item in document.get(key, []) if item != value]
+
+    def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        self._wait()
+        with self._lock:
+            document = next((d for d in self.documents.values() if _matches(d, query)), None)
+            if document is None:
+                if not upsert:
+                    return _Result(matched_count=0, modified_count=0, upserted_id=None)
+                document = {k: v for k, v in query.items() if not isinstance(v, dict)}
+                document.setdefault("_id", ObjectId())
+                document.update(copy.deepcopy(update.get("$setOnInsert", {})))
+                self.documents[document["_id"]] = document
+                self._apply(document, update)
+                return _Result(matched_count=0, modified_count=0, upserted_id=document["_id"])
+            self._apply(document, update)
+            return _Result(matched_count=1, modified_count=1, upserted_id=None)
+
+    def update_many(self, query: Dict[str, Any], update: Dict[str, Any]):
+        self._wait()
+        with self._lock:
+            matched = [d for d in self.documents.values() if _matches(d, query)]
+            for document in matched:
+                self._apply(document, update)
+        return _Result(matched_count=len(matched), modified_count=len(matched))
+
+    def bulk_write(self, operations, ordered: bool = True):
+        for operation in operations:
+            self.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+        return _Result(bulk_api_result={})
+
+    def _remove(self, document: Dict[str, Any]) -> None:
+        del self.documents[document["_id"]]
+        if self.index and self.index in document:
+            self._by_key.get(document[self.index], {}).pop(document["_id"], None)
+
+    def delete_one(self, query: Dict[str, Any]):
+        self._wait()
+        with self._lock:
+            document = next((d for d in self.documents.values() if _matches(d, query)), None)
+            if document is not None:
+                self._remove(document)
+        return _Result(deleted_count=int(document is not None))
+
+    def delete_many(self, query: Dict[str, Any]):
+        self._wait()
+        with self._lock:
+            doomed = [d for d in self._candidates(query) if _matches(d, query)]
+            for document in doomed:
+                self._remove(document)
+        return _Result(deleted_count=len(doomed))
+
+    def create_index(self, *args, **kwargs) -> str:
+        return "index"
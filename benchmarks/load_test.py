@@ -0,0 +1,125 @@
+"""
+Load test for the HTTP service with a fake LLM and in-memory collections.
+
+Starts server:app under uvicorn on a local port, then fires POST /chat
+requests at increasing concurrency. It reports p50/p99 end-to-end latency,
+p50 time to first token, throughput and how many requests admission
+control rejected.
+
+    python -m benchmarks.load_test [--concurrency 1 16 64 256] [--max-inflight 64]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import time
+from typing import List, Optional, Tuple
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+import agent  # noqa: E402
+import server  # noqa: E402
+from benchmarks.fakes import InMemoryCollection, fake_chat_factory  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(port: int, max_inflight: int, first_token_delay: float, token_delay: float) -> None:
+    """Server process: swap in the fakes, then run the app."""
+    agent.chat_model = fake_chat_factory(first_token_delay=first_token_delay, token_delay=token_delay)
+    agent.agents_db = server.registry.agents_db = InMemoryCollection()
+    agent.connectors_db = server.registry.connectors_db = InMemoryCollection()
+    server.session_store.sessions_db = InMemoryCollection()
+    server.admission = server.AdmissionControl(max_inflight, server.ADMISSION_TIMEOUT)
+    uvicorn.run(server.app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+def start_server(port: int, *args) -> multiprocessing.Process:
+    # A separate process keeps the client's event loop from competing with the server's for the GIL.
+    process = multiprocessing.Process(target=serve, args=(port, *args), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("server did not start")
+
+
+async def one_request(client: httpx.AsyncClient, index: int) -> Tuple[int, float, Optional[float]]:
+    start = time.perf_counter()
+    first_token = None
+    try:
+        async with client.stream("POST", "/chat", json={"question": f"question {index}"}) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return response.status_code, time.perf_counter() - start, None
+            async for line in response.aiter_lines():
+                if line == "event: token" and first_token is None:
+                    first_token = time.perf_counter() - start
+    except httpx.TransportError:
+        return 0, time.perf_counter() - start, None
+    return 200, time.perf_counter() - start, first_token
+
+
+async def run_level(base_url: str, concurrency: int, requests: int):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(i):
+            async with semaphore:
+                return await one_request(client, i)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i) for i in range(requests)))
+        return results, time.perf_counter() - start
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--max-inflight", type=int, default=server.MAX_INFLIGHT_LLM)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    port = _free_port()
+    process = start_server(port, args.max_inflight, args.first_token_delay, args.token_delay)
+    print(f"fake LLM: {args.first_token_delay * 1000:.0f}ms to first token, {args.token_delay * 1000:.0f}ms per token; "
+          f"admission limit {args.max_inflight}")
+    print(f"{'concurrency':>11} {'requests':>8} {'p50 ms':>8} {'p99 ms':>8} {'ttft p50':>9} {'req/s':>7} {'503s':>5} {'errors':>6}")
+    for concurrency in args.concurrency:
+        requests = max(20, 4 * concurrency)
+        results, elapsed = asyncio.run(run_level(f"http://127.0.0.1:{port}", concurrency, requests))
+        ok = [r for r in results if r[0] == 200]
+        latencies = [1000 * r[1] for r in ok] or [float("nan")]
+        ttfts = [1000 * r[2] for r in ok if r[2] is not None]
+        print(
+            f"{concurrency:>11} {requests:>8} {percentile(latencies, 0.5):>8.0f} {percentile(latencies, 0.99):>8.0f} "
+            f"{statistics.median(ttfts) if ttfts else float('nan'):>9.0f} {len(ok) / elapsed:>7.1f} "
+            f"{sum(r[0] == 503 for r in results):>5} {sum(r[0] == 0 for r in results):>6}"
+        )
+    process.terminate()
+    process.join()
+
+
+if __name__ == "__main__":
+    main()
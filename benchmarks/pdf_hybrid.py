@@ -0,0 +1,121 @@
+"""
+Vector against hybrid retrieval in the PDF tool: what reaches the prompt, and
+what it costs per query.
+
+The document is a synthetic manual of random sentences, embedded with
+benchmarks.fakes.HashingEmbeddings, and chunked in overlapping windows:
+every other chunk is the one before it shifted by one sentence. Some chunks
+cite a part number. Two kinds of query are asked: "identifier" asks for a
+part number in a short question, which embeds far from the chunk that cites
+it; "passage" quotes a sentence of a chunk. A query is found when the part
+number or the sentence is in the tool's answer. "duplicates" counts answers
+that carry both windows of a pair; "tokens" is the median answer size.
+"warm ms" is the median query with the document and its BM25 index cached;
+"index ms" is the one-time cost of building the index.
+
+    python -m benchmarks.pdf_hybrid [--chunks 2000] [--queries 50]
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from typing import Callable, List, Tuple
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import tools.pdf_source as pdf_source  # noqa: E402
+from benchmarks.fakes import HashingEmbeddings, InMemoryCollection  # noqa: E402
+from benchmarks.suite import EMBEDDING_SIZE  # noqa: E402
+from history import count_tokens  # noqa: E402
+from tools.pdf_cache import document_cache  # noqa: E402
+from tools.pdf_lexical import CONTEXT_ENCODING, lexical_cache  # noqa: E402
+from tools.pdf_source import get_pdf_source_tool  # noqa: E402
+from tools.pdf_store import encode_embedding  # noqa: E402
+
+SYLLABLES = [consonant + vowel for consonant in "bcdfghklmnprstvz" for vowel in "aeiou"]
+
+
+def _sentence(rng: random.Random, vocabulary: List[str]) -> str:
+    return " ".join(rng.choice(vocabulary) for _ in range(12)).capitalize() + "."
+
+
+def make_manual(knowledge_db, chunks_db, count: int, embedder: HashingEmbeddings, rng: random.Random) -> Tuple[str, List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """
+    A chunked document of overlapping windows: chunk 2i+1 is chunk 2i shifted
+    by one sentence. Returns its id and (question, expected substring) pairs
+    for both query kinds.
+    """
+    vocabulary = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(5000)]
+    document_id = knowledge_db.insert_one({
+        "name": "manual.pdf", "layout": "chunked", "embedding_dtype": "float32",
+        "version": 1, "updated_at": "2024-01-01T00:00:00+00:00", "chunk_count": count,
+    }).inserted_id
+    texts: List[str] = []
+    identifiers, passages = [], []
+    while len(texts) < count:
+        sentences = [_sentence(rng, vocabulary) for _ in range(6)]
+        if rng.random() < 0.25:
+            part = f"PN-{rng.randrange(10_000, 100_000)}"
+            sentences[2] = f"Use replacement part {part} for this assembly."
+            identifiers.append((f"which assembly uses part {part}", part))
+        else:
+            passages.append((sentences[2], sentences[2]))
+        texts += [" ".join(sentences[:5]), " ".join(sentences[1:])]
+    texts = texts[:count]
+    vectors = embedder.embed_documents(texts)
+    chunks_db.insert_many([
+        {"document_id": document_id, "ordinal": ordinal, "text": text, "embedding": encode_embedding(vector)}
+        for ordinal, (text, vector) in enumerate(zip(texts, vectors))
+    ])
+    pairs = len(texts) // 2
+    return str(document_id), identifiers[:pairs], passages[:pairs]
+
+
+def _median_ms(fn: Callable[[], object], repeat: int, before: Callable[[], None] = lambda: None) -> float:
+    samples = []
+    for _ in range(repeat):
+        before()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return 1000 * statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--db-latency", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    embedder = HashingEmbeddings(size=EMBEDDING_SIZE)
+    knowledge_db, chunks_db = InMemoryCollection(), InMemoryCollection(index="document_id")
+    document_id, identifiers, passages = make_manual(knowledge_db, chunks_db, args.chunks, embedder, rng)
+    knowledge_db.latency = chunks_db.latency = args.db_latency
+    pdf_source.knowledge_db, pdf_source.chunks_db, pdf_source.embedding_model = knowledge_db, chunks_db, embedder
+
+    windows = [chunk["text"] for chunk in chunks_db.find({}, {"ordinal": 1, "text": 1}).sort("ordinal")]
+    overlapping = list(zip(windows[0::2], windows[1::2]))
+
+    print(f"{args.chunks} chunks, {1000 * args.db_latency:.0f}ms per database call")
+    print(f"{'mode':>7} {'queries':>11} {'found':>7} {'duplicates':>11} {'tokens':>7} {'warm ms':>8} {'index ms':>9}")
+    for mode in ("vector", "hybrid"):
+        tool = get_pdf_source_tool({"document_id": document_id, "retrieval": mode}, "source_pdf")
+        tool.func(query="warm up")
+        for kind, queries in (("identifier", identifiers), ("passage", passages)):
+            queries = queries[:args.queries]
+            answers = [tool.func(query=question) for question, _ in queries]
+            found = sum(expected in answer for (_, expected), answer in zip(queries, answers))
+            duplicates = sum(any(first in answer and second in answer for first, second in overlapping) for answer in answers)
+            tokens = statistics.median(count_tokens(answer, CONTEXT_ENCODING) for answer in answers)
+            warm_ms = _median_ms(lambda: [tool.func(query=question) for question, _ in queries], args.repeat) / len(queries)
+            index_ms = _median_ms(lambda: tool.func(query=queries[0][0]), args.repeat, lexical_cache.clear) - warm_ms if mode == "hybrid" else 0.0
+            print(f"{mode:>7} {kind:>11} {found:>3}/{len(queries):<3} {duplicates:>11} {tokens:>7.0f} {warm_ms:>8.2f} {index_ms:>9.1f}")
+    document_cache.clear()
+
+
+if __name__ == "__main__":
+    main()
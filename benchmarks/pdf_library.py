@@ -0,0 +1,93 @@
+"""
+One library-mode PDF tool call over N documents, against the N single-document
+tool calls an agent needed before, as the library grows.
+
+Each document is a chunked document from benchmarks.suite.make_document, held
+in the fake collections with a per-call latency and chunks indexed by
+document_id, as in MongoDB; the embedder has an API round trip's latency. "library" is one call of a connector with
+document_ids: one query for every document's metadata, one query embedding,
+and the documents scored concurrently, then merged. "single x N" is one call
+per document, run as the agent's ToolNode would run them: concurrently, at
+most --tool-concurrency at a time. "cold" starts with an empty document
+cache; "warm" is the steady state.
+
+    python -m benchmarks.pdf_library [--documents 1 4 16 64] [--chunks 2000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import tools.pdf_source as pdf_source  # noqa: E402
+from benchmarks.fakes import HashingEmbeddings, InMemoryCollection  # noqa: E402
+from benchmarks.suite import EMBEDDING_SIZE, NEEDLE, QUESTION, make_document  # noqa: E402
+from tools.execution import limit_tools  # noqa: E402
+from tools.pdf_cache import document_cache  # noqa: E402
+from tools.pdf_source import get_pdf_source_tool  # noqa: E402
+
+
+def _median_ms(run: Callable[[], Awaitable[object]], repeat: int, before: Callable[[], None] = lambda: None) -> float:
+    samples = []
+    for _ in range(repeat):
+        before()
+        start = time.perf_counter()
+        asyncio.run(run())
+        samples.append(time.perf_counter() - start)
+    return 1000 * statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--db-latency", type=float, default=0.002)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--tool-concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    embedder = HashingEmbeddings(size=EMBEDDING_SIZE, latency=args.embed_latency)
+    knowledge_db, chunks_db = InMemoryCollection(), InMemoryCollection(index="document_id")
+    rng = np.random.default_rng(0)
+    document_ids: List[str] = []
+    for i in range(max(args.documents)):
+        document_id = make_document(knowledge_db, chunks_db, args.chunks, embedder, rng)
+        knowledge_db.update_one({"_id": document_id}, {"$set": {"name": f"manual-{i}.pdf"}})
+        document_ids.append(str(document_id))
+    knowledge_db.latency = chunks_db.latency = args.db_latency
+    pdf_source.knowledge_db, pdf_source.chunks_db, pdf_source.embedding_model = knowledge_db, chunks_db, embedder
+
+    print(f"{args.chunks} chunks per document, {1000 * args.db_latency:.0f}ms per database call, "
+          f"{1000 * args.embed_latency:.0f}ms per embedding, tool concurrency {args.tool_concurrency}")
+    print(f"{'documents':>9} {'cache':>5} {'library ms':>11} {'single x N ms':>14} {'speedup':>8}")
+    for count in args.documents:
+        ids = document_ids[:count]
+        library = get_pdf_source_tool({"document_ids": ids}, "source_pdf_library")
+        singles = limit_tools(
+            [get_pdf_source_tool({"document_id": document_id}, f"source_pdf_{i}") for i, document_id in enumerate(ids)],
+            args.tool_concurrency,
+        )
+
+        answer = asyncio.run(library.coroutine(query=QUESTION))
+        assert NEEDLE in answer and "[Source: manual-0.pdf]" in answer, answer[:300]
+
+        async def run_library():
+            return await library.coroutine(query=QUESTION)
+
+        async def run_singles():
+            return await asyncio.gather(*(tool.coroutine(query=QUESTION) for tool in singles))
+
+        for cache, before, repeat in (("cold", document_cache.clear, max(1, args.repeat // 2)), ("warm", lambda: None, args.repeat)):
+            library_ms = _median_ms(run_library, repeat, before)
+            singles_ms = _median_ms(run_singles, repeat, before)
+            print(f"{count:>9} {cache:>5} {library_ms:>11.1f} {singles_ms:>14.1f} {singles_ms / library_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
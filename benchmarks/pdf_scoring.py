@@ -0,0 +1,82 @@
+"""
+Compare the original per-chunk cosine loop with the vectorized top-k search
+used by the PDF connector.
+
+    python -m benchmarks.pdf_scoring
+"""
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from tools.similarity import build_embedding_matrix, search
+
+TOP_K = 3
+SIMILARITY_THRESHOLD = 0.75
+# Kept below the 1536 dims of text-embedding-ada-002 so 100k chunks of Python
+# float lists still fit comfortably in memory.
+DIMENSIONS = 256
+CHUNK_COUNTS = (1_000, 10_000, 100_000)
+
+
+def make_chunks(count: int, dimensions: int = DIMENSIONS, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dimensions), dtype=np.float32)
+    return [{"text": f"chunk {i}", "embedding": vector.tolist()} for i, vector in enumerate(vectors)]
+
+
+def make_query(chunks: List[Dict[str, Any]], seed: int = 1) -> List[float]:
+    # Perturb a few chunk embeddings so that some scores land above the threshold.
+    rng = np.random.default_rng(seed)
+    base = np.asarray(chunks[len(chunks) // 2]["embedding"], dtype=np.float32)
+    return (base + 0.3 * rng.standard_normal(base.shape[0], dtype=np.float32)).tolist()
+
+
+def legacy_search(chunks: List[Dict[str, Any]], query_embedding: List[float]) -> List[Dict[str, Any]]:
+    def cosine_similarity(vec1, vec2):
+        vec1 = np.array(vec1)
+        vec2 = np.array(vec2)
+        norm1 = np.linalg.norm(vec1)
+        norm2 = np.linalg.norm(vec2)
+        if norm1 == 0 or norm2 == 0:
+            return 0.0
+        return np.dot(vec1, vec2) / (norm1 * norm2)
+
+    all_chunks = []
+    for chunk in chunks:
+        if "text" in chunk and "embedding" in chunk:
+            all_chunks.append({"text": chunk["text"], "score": cosine_similarity(query_embedding, chunk["embedding"])})
+    sorted_chunks = sorted(all_chunks, key=lambda x: x["score"], reverse=True)
+    return [chunk for chunk in sorted_chunks if chunk["score"] >= SIMILARITY_THRESHOLD][:TOP_K]
+
+
+def vectorized_search(chunks: List[Dict[str, Any]], query_embedding: List[float]) -> List[Dict[str, Any]]:
+    matrix, texts = build_embedding_matrix(chunks)
+    return [{"text": texts[row], "score": score} for row, score in search(matrix, query_embedding, TOP_K, SIMILARITY_THRESHOLD)]
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'chunks':>8} {'legacy (s)':>12} {'vectorized (s)':>15} {'score only (s)':>15} {'speedup':>8}")
+    for count in CHUNK_COUNTS:
+        chunks = make_chunks(count)
+        query = make_query(chunks)
+
+        expected = [c["text"] for c in legacy_search(chunks, query)]
+        actual = [c["text"] for c in vectorized_search(chunks, query)]
+        assert expected == actual, f"result mismatch at {count} chunks: {expected} != {actual}"
+
+        legacy = timed(legacy_search, chunks, query)
+        vectorized = timed(vectorized_search, chunks, query)
+        matrix, _ = build_embedding_matrix(chunks)
+        score_only = timed(search, matrix, query, TOP_K, SIMILARITY_THRESHOLD)
+        print(f"{count:>8} {legacy:>12.4f} {vectorized:>15.4f} {score_only:>15.4f} {legacy / vectorized:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Agent lookups the CLI makes, before and after the registry.
+
+"before" is what main.py used to do: read every agent with find({}) and scan
+in Python, for an id lookup and for a name search alike. "after" goes through
+registry.Registry: a point lookup by _id, a page of one org's agents, and a
+name-prefix search, each uncached and then served from the TTL cache.
+
+The collection is benchmarks.fakes.InMemoryCollection with a per-call
+latency. It answers _id lookups directly but scans for every other query,
+where MongoDB would use the registry's (org, name_key, _id) index, so the
+"after" listing and search times are an upper bound. The documents column is
+how many documents each call brings back.
+
+    python -m benchmarks.registry_lookup [--agents 5000] [--orgs 50] [--db-latency 0.002]
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import Any, Callable, List, Tuple
+
+from bson import ObjectId
+
+from benchmarks.fakes import InMemoryCollection
+from registry import Registry, name_key
+
+WORDS = ["billing", "pumps", "network", "payroll", "shipping", "security", "onboarding", "compliance", "analytics", "support"]
+
+
+def _timed(fn: Callable[[], Any], repeat: int, before: Callable[[], None] = lambda: None) -> Tuple[float, Any]:
+    samples, result = [], None
+    for _ in range(repeat):
+        before()
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return 1000 * statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, default=5000)
+    parser.add_argument("--orgs", type=int, default=50)
+    parser.add_argument("--db-latency", type=float, default=0.002)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    orgs = [ObjectId() for _ in range(args.orgs)]
+    agents_db = InMemoryCollection(latency=args.db_latency)
+    agents: List[dict] = []
+    for i in range(args.agents):
+        name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}"
+        agents.append({
+            "_id": ObjectId(), "name": name, "name_key": name_key(name), "org": orgs[i % args.orgs],
+            "description": " ".join(rng.choice(WORDS) for _ in range(40)), "model": "gpt-4o-mini", "connector_ids": [],
+        })
+    agents_db.insert_many(agents)
+    registry = Registry(agents_db, InMemoryCollection())
+    target = agents[len(agents) // 2]
+    org, prefix = target["org"], target["name"].split()[0]
+
+    def scan_by_id():
+        return [a for a in agents_db.find({}) if str(a["_id"]) == str(target["_id"])]
+
+    def scan_by_name():
+        return [a for a in agents_db.find({}) if prefix.lower() in a.get("name", "").lower()]
+
+    cases = [
+        ("get by id", "before", scan_by_id, None),
+        ("get by id", "after", lambda: [registry.get_agent(str(target["_id"]))], registry.invalidate),
+        ("get by id", "cached", lambda: [registry.get_agent(str(target["_id"]))], None),
+        ("list agents", "before", lambda: list(agents_db.find({})), None),
+        ("list agents", "after", lambda: registry.list_agents(org), registry.invalidate),
+        ("list agents", "cached", lambda: registry.list_agents(org), None),
+        ("name search", "before", scan_by_name, None),
+        ("name search", "after", lambda: registry.list_agents(org, prefix=prefix), registry.invalidate),
+        ("name search", "cached", lambda: registry.list_agents(org, prefix=prefix), None),
+    ]
+
+    print(f"{args.agents} agents in {args.orgs} orgs, {1000 * args.db_latency:.0f}ms per database call")
+    print(f"{'lookup':>12} {'path':>7} {'ms':>9} {'documents':>10}")
+    for lookup, path, fn, before in cases:
+        ms, result = _timed(fn, args.repeat, before or (lambda: None))
+        print(f"{lookup:>12} {path:>7} {ms:>9.2f} {len(result):>10}")
+
+
+if __name__ == "__main__":
+    main()
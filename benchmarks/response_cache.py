@@ -0,0 +1,146 @@
+"""
+Chat turns with and without the semantic response cache, on a workload of
+repeated and paraphrased questions.
+
+One agent with a PDF connector answers --turns questions drawn, skewed
+towards the popular ones, from --intents distinct questions, each asked in
+several wordings. Every turn starts a new session and is streamed to the end,
+as the server would. The model is benchmarks.fakes.FakeChatModel, which calls
+the PDF tool and then answers, with an LLM's first-token and per-token
+delays; embeddings have an API round trip's latency. "off" runs the agent
+without the cache, "on" with it. The similarity rows check the threshold
+against this embedder: wordings of one question must score at or above it,
+and different questions below it. After the run, a settings action edits the
+connector, and the next turn must miss; so must the turn after the document
+is re-ingested, which bumps its version.
+
+    python -m benchmarks.response_cache [--turns 100] [--intents 20]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from itertools import combinations
+from typing import List
+
+import numpy as np
+from bson import ObjectId
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import agent  # noqa: E402
+import tools.pdf_source as pdf_source  # noqa: E402
+from benchmarks.fakes import HashingEmbeddings, InMemoryCollection  # noqa: E402
+from benchmarks.suite import EMBEDDING_SIZE, chat_factory, make_document  # noqa: E402
+from graph_cache import agent_graph_cache  # noqa: E402
+from response_cache import response_cache  # noqa: E402
+from router import AgentRouter  # noqa: E402
+from streaming import stream_turn  # noqa: E402
+from tools.similarity import normalize_rows  # noqa: E402
+
+SUBJECTS = [
+    "pump", "valve", "filter", "motor", "pressure sensor", "control panel", "inlet seal", "impeller",
+    "bearing", "drain line", "relay", "fuse box", "outlet gauge", "coolant loop", "flow meter",
+    "intake screen", "backup battery", "vent fan", "heat exchanger", "alarm siren",
+]
+TEMPLATES = [
+    "How do I replace the {}?",
+    "how do i replace the {}",
+    "How do I replace the {} ?",
+    "How do I replace the {} please?",
+]
+
+
+def _wordings(intents: int) -> List[List[str]]:
+    return [[template.format(subject) for template in TEMPLATES] for subject in SUBJECTS[:intents]]
+
+
+async def _turn(agent_id: str, question: str) -> float:
+    start = time.perf_counter()
+    graph, messages, _, _ = await agent.get_agent_graph(question, None, [], agent_id)
+    stream = stream_turn(graph, messages)
+    async for _ in stream:
+        pass
+    assert stream.answer, "turn produced no answer"
+    return time.perf_counter() - start
+
+
+def _similarity_range(embedder: HashingEmbeddings, wordings: List[List[str]]):
+    vectors = [normalize_rows(np.asarray(embedder.embed_documents(group), dtype=np.float32)) for group in wordings]
+    same = min(float((group @ group.T).min()) for group in vectors)
+    different = max(float((a @ b.T).max()) for a, b in combinations(vectors, 2))
+    return same, different
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--intents", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--llm-first-token", type=float, default=0.3)
+    parser.add_argument("--llm-token-delay", type=float, default=0.01)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    embedder = HashingEmbeddings(size=EMBEDDING_SIZE, latency=args.embed_latency)
+    knowledge_db, chunks_db = InMemoryCollection(), InMemoryCollection(index="document_id")
+    document_id = make_document(knowledge_db, chunks_db, args.chunks, embedder, np.random.default_rng(0))
+    connector = {"_id": ObjectId(), "name": "Manual", "connector_type": "source_pdf", "settings": {"document_id": str(document_id)}}
+    agent_document = {
+        "_id": ObjectId(), "name": "Maintenance", "description": "Answers maintenance questions.",
+        "model": "gpt-4o-mini", "org": None, "connector_ids": [connector["_id"]],
+    }
+    agent.agents_db, agent.connectors_db = InMemoryCollection([agent_document]), InMemoryCollection([connector])
+    agent.agent_router = AgentRouter(embedder)
+    agent.chat_model = chat_factory("source_pdf_manual", args.llm_first_token, args.llm_token_delay)
+    pdf_source.knowledge_db, pdf_source.chunks_db, pdf_source.embedding_model = knowledge_db, chunks_db, embedder
+    response_cache.embeddings = embedder
+
+    wordings = _wordings(args.intents)
+    weights = [1 / (rank + 1) for rank in range(len(wordings))]
+    workload = [rng.choice(rng.choices(wordings, weights)[0]) for _ in range(args.turns)]
+    agent_id = str(agent_document["_id"])
+
+    print(f"{args.turns} turns over {len(wordings)} questions in {len(TEMPLATES)} wordings each, "
+          f"LLM first token {1000 * args.llm_first_token:.0f}ms, embedding {1000 * args.embed_latency:.0f}ms")
+    print(f"{'cache':>5} {'total s':>8} {'turn p50 ms':>12} {'turn p95 ms':>12} {'hit rate':>9} {'hit p50 ms':>11} {'miss p50 ms':>12}")
+    for enabled in (False, True):
+        agent.agents_db.update_one({"_id": agent_document["_id"]}, {"$set": {"response_cache": enabled}})
+        agent_graph_cache.invalidate()
+        response_cache.invalidate()
+        hits_before = response_cache.hits
+        latencies, outcomes = [], []
+        for question in workload:
+            hits = response_cache.hits
+            latencies.append(asyncio.run(_turn(agent_id, question)))
+            outcomes.append(response_cache.hits > hits)
+        hit_ms = [1000 * s for s, hit in zip(latencies, outcomes) if hit]
+        miss_ms = [1000 * s for s, hit in zip(latencies, outcomes) if not hit]
+        ordered = sorted(latencies)
+        print(f"{'on' if enabled else 'off':>5} {sum(latencies):>8.1f} {1000 * statistics.median(latencies):>12.0f} "
+              f"{1000 * ordered[int(0.95 * (len(ordered) - 1))]:>12.0f} {(response_cache.hits - hits_before) / len(workload):>9.0%} "
+              f"{statistics.median(hit_ms) if hit_ms else 0:>11.1f} {statistics.median(miss_ms) if miss_ms else 0:>12.0f}")
+
+    same, different = _similarity_range(embedder, wordings)
+    print(f"threshold {response_cache.threshold:.2f}: lowest similarity between wordings of one question {same:.3f}, "
+          f"highest between different questions {different:.3f}")
+
+    asyncio.run(agent.get_agent_graph({"action": "edit_connector", "connector_id": str(connector["_id"]), "settings": {**connector["settings"], "timeout": 20}}, None))
+    misses = response_cache.misses
+    asyncio.run(_turn(agent_id, workload[0]))
+    assert response_cache.misses == misses + 1, "a turn after a connector edit was served from the cache"
+    print("after a connector edit: miss, as expected")
+
+    asyncio.run(_turn(agent_id, workload[0]))
+    knowledge_db.update_one({"_id": document_id}, {"$inc": {"version": 1}})
+    misses = response_cache.misses
+    asyncio.run(_turn(agent_id, workload[0]))
+    assert response_cache.misses == misses + 1, "a turn after the document was re-ingested was served from the cache"
+    print(f"after a re-ingest: miss, as expected; stats {response_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measure routing accuracy and latency of the embedding router against the
+labelled questions in benchmarks/fixtures/router_labels.json.
+
+    python -m benchmarks.router_accuracy [--embedder {openai,hashing}]
+
+"openai" uses the same embeddings as production. "hashing" is an offline
+bag-of-trigrams embedder that needs no API key; it only shows that the
+pipeline works, since its accuracy says little about the real model.
+Questions the router is not confident about would go to the LLM router and
+are reported separately rather than sent.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+
+from bson import ObjectId
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from benchmarks.fakes import HashingEmbeddings  # noqa: E402
+from router import AgentRouter  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "router_labels.json")
+
+
+async def evaluate(router: AgentRouter, agents, questions):
+    cold = await router.route(questions[0]["question"], agents)
+    decisions = [await router.route(item["question"], agents) for item in questions]
+    correct = [d.agent["name"] == item["agent"] for d, item in zip(decisions, questions)]
+    confident = [d.confident for d in decisions]
+    confident_correct = [c for c, sure in zip(correct, confident) if sure]
+    latencies = sorted(1000 * d.seconds for d in decisions)
+
+    print(f"questions:                 {len(questions)} across {len(agents)} agents")
+    print(f"top-1 accuracy:            {sum(correct) / len(correct):.3f}")
+    print(f"routed without LLM:        {sum(confident)}/{len(confident)}")
+    if confident_correct:
+        print(f"accuracy when confident:   {sum(confident_correct) / len(confident_correct):.3f}")
+    print(f"first route (cold) ms:     {1000 * cold.seconds:.2f}")
+    print(f"warm route ms p50 / p95:   {statistics.median(latencies):.2f} / {latencies[int(0.95 * (len(latencies) - 1))]:.2f}")
+    for decision, item, ok in zip(decisions, questions, correct):
+        if not ok:
+            flag = "" if decision.confident else " (LLM fallback)"
+            print(f"  miss: {item['question']!r} -> {decision.agent['name']}, expected {item['agent']}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embedder", choices=["openai", "hashing"], default="openai")
+    args = parser.parse_args()
+
+    with open(FIXTURE) as f:
+        fixture = json.load(f)
+    agents = [{"_id": ObjectId(), **agent} for agent in fixture["agents"]]
+
+    if args.embedder == "hashing":
+        router = AgentRouter(HashingEmbeddings())
+    else:
+        from router import agent_router as router
+    asyncio.run(evaluate(router, agents, fixture["questions"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Crash-consistency check for the write-behind session store.
+
+Several sessions append turns while the storage randomly fails writes. Some
+writes fail before they are applied and some after, so the store cannot tell
+whether they landed. At a random point the process "dies": its storage
+handle stops working and its buffer is abandoned. A fresh store then reloads
+every session and must find a gap-free, duplicate-free prefix of what was
+appended, and must be able to carry on from it.
+
+    python -m benchmarks.session_crash [rounds]
+"""
+import copy
+import logging
+import random
+import sys
+import threading
+from typing import Any, Dict, List
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect
+
+from sessions import SessionStore
+
+
+class FlakySessions:
+    """In-memory stand-in for the sessions collection covering the operations SessionStore uses."""
+
+    def __init__(self, documents: Dict[Any, Dict[str, Any]], rng: random.Random, failure_rate: float):
+        self.documents = documents
+        self.rng = rng
+        self.failure_rate = failure_rate
+        self.dead = False
+        self.lock = threading.Lock()
+
+    def _check(self):
+        if self.dead:
+            raise AutoReconnect("process crashed")
+
+    def find_one(self, query, projection=None):
+        with self.lock:
+            self._check()
+            document = self.documents.get(query["_id"])
+            if document is None:
+                return None
+            document = copy.deepcopy(document)
+            turns_projection = (projection or {}).get("turns")
+            if isinstance(turns_projection, dict):
+                window = turns_projection["$slice"]
+                turns = document.get("turns", [])
+                document["turns"] = turns[window[0]:window[0] + window[1]] if isinstance(window, list) else turns[window:]
+            elif projection and "turns" not in projection:
+                document.pop("turns", None)
+            return document
+
+    def find(self, query, projection=None):
+        with self.lock:
+            self._check()
+            # Failing the read-back after a write leaves the store unsure whether that write landed.
+            if self.rng.random() < self.failure_rate / 2:
+                raise AutoReconnect("failed to read back")
+            return [
+                {"_id": key, "turn_count": d.get("turn_count", 0)}
+                for key, d in self.documents.items() if key in query["_id"]["$in"]
+            ]
+
+    def _apply(self, operation):
+        query, update, upsert = operation._filter, operation._doc, operation._upsert
+        document = self.documents.get(query["_id"])
+        if document is None:
+            if not upsert:
+                return
+            document = {"_id": query["_id"], "turn_count": query["turn_count"], **update.get("$setOnInsert", {})}
+            self.documents[query["_id"]] = document
+        elif document.get("turn_count", 0) != query["turn_count"]:
+            if upsert:
+                raise AutoReconnect("duplicate key on upsert")
+            return
+        document.setdefault("turns", []).extend(copy.deepcopy(update["$push"]["turns"]["$each"]))
+        document["turn_count"] = document.get("turn_count", 0) + update["$inc"]["turn_count"]
+        document.update(update["$set"])
+
+    def bulk_write(self, operations, ordered=True):
+        with self.lock:
+            self._check()
+            for operation in operations:
+                roll = self.rng.random()
+                if roll < self.failure_rate / 2:
+                    raise AutoReconnect("failed before applying")
+                self._apply(operation)
+                if roll < self.failure_rate:
+                    raise AutoReconnect("failed after applying")
+
+
+def run_round(seed: int) -> None:
+    rng = random.Random(seed)
+    documents: Dict[Any, Dict[str, Any]] = {}
+    storage = FlakySessions(documents, rng, failure_rate=0.3)
+    store = SessionStore(storage, flush_interval=0.001, flush_turns=rng.randint(1, 8), max_sessions=rng.randint(1, 5))
+
+    appended: Dict[str, List[str]] = {store.create(): [] for _ in range(rng.randint(1, 5))}
+    for step in range(rng.randint(1, 200)):
+        session_id = rng.choice(list(appended))
+        text = f"{session_id}:{step}"
+        store.append(session_id, {"user": text, "assistant": text.upper()}, org="org")
+        appended[session_id].append(text)
+        if rng.random() < 0.1:
+            store.flush()
+
+    # Crash: the old store can no longer reach the database and its buffer is lost.
+    with storage.lock:
+        storage.dead = True
+    with store._lock:
+        store._closed = True
+        store._wake.notify()
+
+    survivor = SessionStore(FlakySessions(documents, rng, failure_rate=0.0), flush_interval=0.001)
+    resumed = []
+    for session_id, texts in appended.items():
+        record = survivor.load(session_id)
+        if record is None:
+            assert ObjectId(session_id) not in documents
+            continue
+        stored = documents[ObjectId(session_id)]
+        stored_texts = [turn["user"] for turn in stored["turns"]]
+        assert stored_texts == texts[:len(stored_texts)], f"seed {seed}: stored turns are not a prefix"
+        assert stored["turn_count"] == len(stored_texts) == record.turn_count, f"seed {seed}: turn_count disagrees with turns"
+        # The resumed session continues exactly where the stored prefix ended.
+        survivor.append(session_id, {"user": "resumed", "assistant": "RESUMED"})
+        resumed.append(session_id)
+    survivor.close()
+
+    for session_id in resumed:
+        stored = documents[ObjectId(session_id)]
+        users = [turn["user"] for turn in stored["turns"]]
+        assert users[-1] == "resumed" and users[:-1] == appended[session_id][:len(users) - 1], f"seed {seed}: resume broke order"
+        assert stored["turn_count"] == len(users), f"seed {seed}: turn_count drifted after resume"
+
+
+def main(argv: List[str]) -> int:
+    rounds = int(argv[0]) if argv else 200
+    # The store reports every failed flush; the failures are the point here.
+    logging.getLogger("llmtoolfactory").setLevel(logging.ERROR)
+    for seed in range(rounds):
+        run_round(seed)
+    print(f"{rounds} crash rounds: stored sessions were always a gap-free prefix and resumed cleanly.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
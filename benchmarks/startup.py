@@ -0,0 +1,132 @@
+"""
+Cold start cost of the entry points: import time, and time to the first
+response of a settings command and of a chat turn.
+
+Every sample is a fresh interpreter. "import" is the time to import the
+entry point with nothing else loaded. "first call" is the first request
+after that, with MongoDB and OpenAI replaced by the fakes in
+benchmarks.fakes: list_agents for main, and a routed turn streamed to the end
+for agent, against an agent with one PDF and one URI connector. The fakes are
+imported before that clock starts, so the modules they need (numpy,
+langchain_core's chat model) count as already loaded; the real code's own
+lazy imports, such as langgraph and the connector modules, are timed. "first
+response" is the sum of the two medians. The last columns list which heavy
+dependencies the import and the call loaded.
+
+    python -m benchmarks.startup [--repeat 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+HEAVY_MODULES = ("langchain_openai", "openai", "langgraph", "numpy", "httpx", "bs4", "fastapi")
+
+CASES = [
+    ("main", "list_agents"),
+    ("agent", "chat"),
+    ("server", None),
+]
+
+
+def _loaded() -> List[str]:
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def _seed():
+    """Agents and connectors without an org, as the CLI creates them."""
+    from bson import ObjectId
+
+    from registry import name_key
+
+    pdf = {"_id": ObjectId(), "name": "Manual", "name_key": name_key("Manual"), "org": None, "connector_type": "source_pdf", "settings": {"document_id": str(ObjectId())}}
+    uri = {"_id": ObjectId(), "name": "Status", "name_key": name_key("Status"), "org": None, "connector_type": "source_uri", "settings": {"url": "http://127.0.0.1:9/"}}
+    agents = [
+        {"_id": ObjectId(), "name": f"Agent {i}", "name_key": name_key(f"Agent {i}"), "description": f"Answers questions about topic {i}.",
+         "model": "gpt-4o-mini", "org": None, "connector_ids": [pdf["_id"], uri["_id"]]}
+        for i in range(3)
+    ]
+    return agents, [pdf, uri]
+
+
+def child(module: str, action: str) -> Dict[str, Any]:
+    """One sample; runs in a fresh interpreter and returns milliseconds and newly loaded modules."""
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    if action == "import":
+        start = time.perf_counter()
+        __import__(module)
+        return {"ms": 1000 * (time.perf_counter() - start), "loaded": _loaded()}
+
+    from benchmarks.fakes import HashingEmbeddings, InMemoryCollection, fake_chat_factory
+
+    entry = __import__(module)
+    import agent
+    from registry import registry
+    from router import AgentRouter
+    from streaming import stream_turn
+
+    agents, connectors = _seed()
+    agent.agents_db, agent.connectors_db = InMemoryCollection(), InMemoryCollection()
+    registry.agents_db, registry.connectors_db = agent.agents_db, agent.connectors_db
+    agent.agents_db.insert_many(agents)
+    agent.connectors_db.insert_many(connectors)
+    agent.chat_model = fake_chat_factory()
+    agent.agent_router = AgentRouter(HashingEmbeddings(size=64), margin=0.0, min_score=-1.0)
+
+    async def list_agents() -> None:
+        assert len(await entry.list_agents()) == len(agents)
+
+    async def chat() -> None:
+        graph, messages, _, _ = await agent.get_agent_graph("what is topic 1 about?", None)
+        stream = stream_turn(graph, messages)
+        async for _ in stream:
+            pass
+        assert stream.answer, "turn produced no answer"
+
+    before = set(_loaded())
+    start = time.perf_counter()
+    asyncio.run(list_agents() if action == "list_agents" else chat())
+    return {"ms": 1000 * (time.perf_counter() - start), "loaded": [name for name in _loaded() if name not in before]}
+
+
+def sample(module: str, action: str) -> Dict[str, Any]:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", module, action],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", nargs=2, metavar=("MODULE", "ACTION"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(*args.child)))
+        return
+
+    print(f"median of {args.repeat} fresh interpreters")
+    print(f"{'entry point':>12} {'import ms':>10} {'first call':>12} {'ms':>6} {'first response ms':>18}  loaded by import; by call")
+    for module, action in CASES:
+        imports = [sample(module, "import") for _ in range(args.repeat)]
+        import_ms = statistics.median(s["ms"] for s in imports)
+        row = f"{module:>12} {import_ms:>10.0f}"
+        loaded = ", ".join(imports[-1]["loaded"]) or "-"
+        if action:
+            calls = [sample(module, action) for _ in range(args.repeat)]
+            call_ms = statistics.median(s["ms"] for s in calls)
+            row += f" {action:>12} {call_ms:>6.0f} {import_ms + call_ms:>18.0f}"
+            loaded += "; " + (", ".join(calls[-1]["loaded"]) or "-")
+        else:
+            row += f" {'':>12} {'':>6} {'':>18}"
+        print(f"{row}  {loaded}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Offline benchmark suite for the hot paths: routing, graph build, tool
+execution and end-to-end turns, at several scenario sizes.
+
+OpenAI, MongoDB and the web are replaced by the stand-ins in benchmarks.fakes,
+so runs are repeatable and need no API key, database or network. The fake
+services can be given a latency to model round trips; by default they answer
+at once, so the numbers are this repo's own overhead.
+
+Results are written as JSON. Pass an earlier results file as --baseline to
+flag every stage whose median got slower by more than --tolerance; the exit
+status is 1 if any did.
+
+    python -m benchmarks.suite [--scenarios small medium large] [--repeat 20]
+                               [--output benchmark_results.json] [--baseline old.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from bson import ObjectId
+from langchain_core.messages import AIMessage
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import agent  # noqa: E402
+import tools.pdf_source as pdf_source  # noqa: E402
+from benchmarks.fakes import FakeChatModel, HashingEmbeddings, InMemoryCollection, serve_pages  # noqa: E402
+from graph_cache import agent_graph_key, agent_graph_cache  # noqa: E402
+from router import AgentRouter  # noqa: E402
+from streaming import stream_turn  # noqa: E402
+from telemetry import telemetry  # noqa: E402
+from tools.pdf_cache import document_cache  # noqa: E402
+from tools.pdf_store import encode_embedding  # noqa: E402
+from tools.uri_source import _page_indexes, get_uri_source_tool  # noqa: E402
+
+EMBEDDING_SIZE = 256
+QUESTION = "how do I reset the pump after error code E1234"
+NEEDLE = "Error code E1234 means the pump overheated; reset it from the service menu."
+TOPICS = ["billing", "pumps", "networking", "payroll", "shipping", "security", "onboarding", "compliance", "analytics", "support"]
+
+
+@dataclass
+class Scenario:
+    agents: int
+    chunks: int
+    page_kb: int
+
+
+SCENARIOS = {
+    "small": Scenario(agents=5, chunks=1_000, page_kb=64),
+    "medium": Scenario(agents=50, chunks=10_000, page_kb=512),
+    "large": Scenario(agents=500, chunks=50_000, page_kb=4096),
+}
+
+
+def make_agents(count: int, org: ObjectId, connector_ids: List[ObjectId], rng: random.Random) -> List[Dict[str, Any]]:
+    agents = []
+    for i in range(count):
+        topic = TOPICS[i % len(TOPICS)]
+        agents.append({
+            "_id": ObjectId(),
+            "name": f"{topic.title()} Agent {i}",
+            "description": f"Answers questions about {topic} for team {i}: "
+                           + " ".join(rng.choice(TOPICS) for _ in range(12)),
+            "model": "gpt-4o-mini",
+            "temperature": 0.2,
+            "org": org,
+            "connector_ids": connector_ids,
+        })
+    return agents
+
+
+def make_document(knowledge_db: InMemoryCollection, chunks_db: InMemoryCollection, count: int, embedder: HashingEmbeddings, rng: np.random.Generator) -> ObjectId:
+    """A chunked PDF document of random vectors, one of which matches QUESTION."""
+    document_id = knowledge_db.insert_one({
+        "name": "manual.pdf",
+        "layout": "chunked",
+        "embedding_dtype": "float32",
+        "version": 1,
+        "updated_at": "2024-01-01T00:00:00+00:00",
+        "chunk_count": count,
+    }).inserted_id
+    vectors = rng.standard_normal((count, EMBEDDING_SIZE), dtype=np.float32)
+    needle = count // 2
+    vectors[needle] = embedder.embed_query(QUESTION)
+    chunks_db.insert_many([
+        {
+            "document_id": document_id,
+            "ordinal": ordinal,
+            "text": NEEDLE if ordinal == needle else f"chunk {ordinal} of the manual",
+            "embedding": encode_embedding(vector),
+            "page": ordinal // 10,
+        }
+        for ordinal, vector in enumerate(vectors)
+    ])
+    return document_id
+
+
+def make_page(size_kb: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(20_000)]
+    paragraphs, size = [], 0
+    while size < size_kb * 1024:
+        paragraph = "<p>" + " ".join(rng.choice(vocabulary) for _ in range(150)) + "</p>"
+        paragraphs.append(paragraph)
+        size += len(paragraph)
+    paragraphs.insert(len(paragraphs) // 2, f"<p>{NEEDLE}</p>")
+    return ("<html><body>" + "".join(paragraphs) + "</body></html>").encode()
+
+
+def chat_factory(tool_name: str, first_token_delay: float, token_delay: float):
+    """Each model first calls the PDF tool, then answers, so a turn exercises the whole loop."""
+    def factory(*args, **kwargs) -> FakeChatModel:
+        return FakeChatModel(
+            replies=[
+                AIMessage(content="", tool_calls=[{"name": tool_name, "args": {"query": QUESTION}, "id": "call_1"}]),
+                AIMessage(content="Reset the pump from the service menu after it cools down."),
+            ],
+            first_token_delay=first_token_delay,
+            token_delay=token_delay,
+        )
+    return factory
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "samples": len(ordered),
+        "p50_ms": 1000 * statistics.median(ordered),
+        "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        "mean_ms": 1000 * statistics.fmean(ordered),
+        "min_ms": 1000 * ordered[0],
+    }
+
+
+def timed(fn: Callable[[], Any], repeat: int, before: Callable[[], None] = lambda: None) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        before()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_scenario(name: str, scenario: Scenario, args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(0)
+    embedder = HashingEmbeddings(size=EMBEDDING_SIZE, latency=args.embed_latency)
+    agents_db, connectors_db = InMemoryCollection(), InMemoryCollection()
+    knowledge_db, chunks_db = InMemoryCollection(), InMemoryCollection()
+    org = ObjectId()
+
+    document_id = make_document(knowledge_db, chunks_db, scenario.chunks, embedder, np.random.default_rng(0))
+    pages = {"/page.html": make_page(scenario.page_kb)}
+    results: Dict[str, Dict[str, float]] = {}
+
+    with serve_pages(pages) as base_url:
+        pdf_connector = {"_id": ObjectId(), "name": "Manual", "connector_type": "source_pdf", "settings": {"document_id": str(document_id)}}
+        uri_connector = {"_id": ObjectId(), "name": "Status Page", "connector_type": "source_uri", "settings": {"url": f"{base_url}/page.html"}}
+        connectors_db.insert_many([pdf_connector, uri_connector])
+        connectors = [pdf_connector, uri_connector]
+        agents = make_agents(scenario.agents, org, [c["_id"] for c in connectors], rng)
+        agents_db.insert_many(agents)
+
+        agent.agents_db, agent.connectors_db = agents_db, connectors_db
+        # Always confident: the fake model cannot stand in for the LLM router.
+        agent.agent_router = AgentRouter(embedder, margin=0.0, min_score=-1.0)
+        agent.chat_model = chat_factory("source_pdf_manual", args.llm_first_token, args.llm_token_delay)
+        pdf_source.knowledge_db, pdf_source.chunks_db = knowledge_db, chunks_db
+        pdf_source.embedding_model = embedder
+        agent_graph_cache.invalidate()
+        document_cache.clear()
+
+        questions = [f"{QUESTION} ({TOPICS[i % len(TOPICS)]} {i})" for i in range(args.repeat)]
+
+        # Routing: a cold router embeds every agent first; a warm one only embeds the question.
+        cold_repeat = max(1, min(args.repeat, 5))
+        results["route_cold"] = summarize(timed(
+            lambda: asyncio.run(AgentRouter(embedder).route(QUESTION, agents)), cold_repeat,
+        ))
+        warm_router = AgentRouter(embedder)
+        asyncio.run(warm_router.route(QUESTION, agents))
+        question_iter = iter(questions)
+        results["route_warm"] = summarize(timed(
+            lambda: asyncio.run(warm_router.route(next(question_iter), agents)), args.repeat,
+        ))
+
+        # Graph build: compiling the ReAct graph and tools, and the cache hit that usually replaces it.
+        selected = agents[0]
+        key = agent_graph_key(selected, connectors)
+        # The first build also imports langgraph and the connector modules; benchmarks.startup times that.
+        agent._build_agent_graph(selected, connectors, key)
+        results["graph_build"] = summarize(timed(lambda: agent._build_agent_graph(selected, connectors, key), args.repeat))
+        agent._cached_agent_graph(selected)
+        results["graph_cached"] = summarize(timed(lambda: agent._cached_agent_graph(selected), args.repeat))
+
+        # Tools: cold runs load and decode the document or parse the page; warm runs reuse them.
+        pdf_tool = pdf_source.PDFToolWrapper(settings=pdf_connector["settings"], name="source_pdf_manual")
+        answer = pdf_tool(QUESTION)
+        assert NEEDLE in answer, f"{name}: PDF tool missed the needle: {answer[:200]}"
+        results["pdf_tool_cold"] = summarize(timed(lambda: pdf_tool(QUESTION), cold_repeat, before=document_cache.clear))
+        results["pdf_tool_warm"] = summarize(timed(lambda: pdf_tool(QUESTION), args.repeat))
+
+        uri_tool = get_uri_source_tool(uri_connector["settings"], "source_uri_status_page")
+        answer = uri_tool.func(QUESTION)
+        assert NEEDLE in answer, f"{name}: URI tool missed the needle: {answer[:200]}"
+        results["uri_tool_cold"] = summarize(timed(lambda: uri_tool.func(QUESTION), cold_repeat, before=_page_indexes.clear))
+        results["uri_tool_warm"] = summarize(timed(lambda: uri_tool.func(QUESTION), args.repeat))
+
+        # End to end: route, fetch the cached graph, call the PDF tool and stream the answer.
+        first_tokens: List[float] = []
+
+        async def turn(question: str) -> None:
+            graph, messages, _, _ = await agent.get_agent_graph(question, org)
+            stream = stream_turn(graph, messages)
+            async for _ in stream:
+                pass
+            assert stream.answer, f"{name}: turn produced no answer"
+            first_tokens.append(stream.metrics.time_to_first_token)
+
+        question_iter = iter(questions)
+        asyncio.run(turn(QUESTION))
+        first_tokens.clear()
+        results["turn"] = summarize(timed(lambda: asyncio.run(turn(next(question_iter))), args.repeat))
+        results["turn_first_token"] = summarize(first_tokens)
+
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for name, stages in results["scenarios"].items():
+        for stage, current in stages.items():
+            previous = baseline.get("scenarios", {}).get(name, {}).get(stage)
+            if previous and previous["p50_ms"] > 0 and current["p50_ms"] > tolerance * previous["p50_ms"]:
+                regressions.append(
+                    f"{name}/{stage}: p50 {previous['p50_ms']:.2f}ms -> {current['p50_ms']:.2f}ms "
+                    f"({current['p50_ms'] / previous['p50_ms']:.2f}x)"
+                )
+    return regressions
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--llm-first-token", type=float, default=0.0, help="fake model delay before its first chunk, seconds")
+    parser.add_argument("--llm-token-delay", type=float, default=0.0, help="fake model delay between chunks, seconds")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="fake embedder delay per call, seconds")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="allowed p50 slowdown factor before a stage is flagged")
+    parser.add_argument("--telemetry", action="store_true", help="also record per-stage spans and store their histograms")
+    args = parser.parse_args(argv)
+    if args.telemetry:
+        telemetry.configure(["memory"])
+
+    results = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        },
+        "scenarios": {},
+    }
+    print(f"{'scenario':>8} {'stage':>16} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9}")
+    for name in args.scenarios:
+        scenario = SCENARIOS[name]
+        results["meta"].setdefault("sizes", {})[name] = asdict(scenario)
+        # The agent and tools print as they work; keep that out of the report.
+        telemetry.reset()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stages = run_scenario(name, scenario, args)
+        results["scenarios"][name] = stages
+        if args.telemetry:
+            results.setdefault("telemetry", {})[name] = telemetry.stats()["stages"]
+        for stage, summary in stages.items():
+            print(f"{name:>8} {stage:>16} {summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} {summary['mean_ms']:>9.2f}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no stage slower than {args.tolerance:.2f}x the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
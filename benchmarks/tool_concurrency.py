@@ -0,0 +1,105 @@
+"""
+Wall time of one agent step that requests several tool calls, and how long
+the event loop stalls meanwhile.
+
+The step is run through LangGraph's ToolNode, as the ReAct agent does, with
+PDF and URI tools over fake services that have latency: 20ms per database
+call, 50ms per embedding and locally served pages. Modes compare the
+tools' sync path (run on executor threads) with the native coroutines under
+different per-agent concurrency limits, plus a timeout that cuts a slow call
+short. "cold" starts with empty document and page caches, so decoding and
+parsing dominate; "warm" is the steady state, where the calls mostly wait on
+the fake services.
+
+    python -m benchmarks.tool_concurrency [--calls 8]
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import List, Tuple
+
+import numpy as np
+from langchain_core.messages import AIMessage
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import tools.pdf_source as pdf_source  # noqa: E402
+from benchmarks.fakes import HashingEmbeddings, InMemoryCollection, serve_pages  # noqa: E402
+from benchmarks.suite import EMBEDDING_SIZE, make_document, make_page  # noqa: E402
+from langgraph.prebuilt import ToolNode  # noqa: E402
+from tools.execution import limit_tools  # noqa: E402
+from tools.http_client import aclose_client, response_cache  # noqa: E402
+from tools.pdf_cache import document_cache  # noqa: E402
+from tools.pdf_source import get_pdf_source_tool  # noqa: E402
+from tools.uri_source import _page_indexes, get_uri_source_tool  # noqa: E402
+
+
+async def _lag_monitor(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run_step(tools, calls: List[Tuple[str, str]]) -> Tuple[float, float, int]:
+    """Seconds for the step, worst event-loop stall in seconds, and how many calls timed out."""
+    node = ToolNode(tools)
+    message = AIMessage(content="", tool_calls=[
+        {"name": name, "args": {"query": query}, "id": f"call_{i}"} for i, (name, query) in enumerate(calls)
+    ])
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_lag_monitor(stop))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    result = await node.ainvoke({"messages": [message]})
+    elapsed = time.perf_counter() - start
+    stop.set()
+    # The shared HTTP client belongs to this loop; each step runs on a fresh one.
+    await aclose_client()
+    timed_out = sum("did not finish" in m.content for m in result["messages"])
+    return elapsed, await monitor, timed_out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=8)
+    parser.add_argument("--page-kb", type=int, default=512)
+    args = parser.parse_args()
+
+    embedder = HashingEmbeddings(size=EMBEDDING_SIZE, latency=0.05)
+    knowledge_db, chunks_db = InMemoryCollection(latency=0.02), InMemoryCollection(latency=0.02)
+    document_id = make_document(knowledge_db, chunks_db, 5_000, embedder, np.random.default_rng(0))
+    pdf_source.knowledge_db, pdf_source.chunks_db, pdf_source.embedding_model = knowledge_db, chunks_db, embedder
+
+    half = args.calls // 2
+    pages = {f"/page{i}.html": make_page(args.page_kb, seed=i) for i in range(args.calls - half)}
+    with serve_pages(pages) as base_url:
+        base_tools = [get_pdf_source_tool({"document_id": str(document_id)}, "source_pdf_manual")]
+        base_tools += [get_uri_source_tool({"url": f"{base_url}{path}"}, f"source_uri_page{i}") for i, path in enumerate(pages)]
+        calls = [("source_pdf_manual", f"pump error {i}") for i in range(half)]
+        calls += [(f"source_uri_page{i}", "pump error code") for i in range(len(pages))]
+
+        modes = {
+            "sync tools on threads": [t.model_copy(update={"coroutine": None}) for t in base_tools],
+            "async, limit 1": limit_tools(base_tools, 1),
+            "async, limit 4": limit_tools(base_tools, 4),
+            f"async, limit {args.calls}": limit_tools(base_tools, args.calls),
+            f"async, limit {args.calls}, 0.1s timeout": limit_tools(base_tools, args.calls, {t.name: 0.1 for t in base_tools}),
+        }
+
+        print(f"{args.calls} tool calls in one step ({half} PDF, {len(pages)} URI pages of {args.page_kb}KB)")
+        print(f"{'mode':>36} {'cache':>5} {'step ms':>9} {'max loop stall ms':>18} {'timeouts':>9}")
+        for mode, tools in modes.items():
+            document_cache.clear()
+            _page_indexes.clear()
+            response_cache.clear()
+            for cache in ("cold", "warm"):
+                elapsed, stall, timed_out = asyncio.run(run_step(tools, calls))
+                print(f"{mode:>36} {cache:>5} {1000 * elapsed:>9.0f} {1000 * stall:>18.1f} {timed_out:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare peak memory and latency of the buffered uri_search path (full body,
+BeautifulSoup tree, BM25 index) with the streaming extractor on multi-MB pages.
+
+    python -m benchmarks.uri_streaming
+"""
+import random
+import time
+import tracemalloc
+
+from tools.html_stream import StreamingPassageExtractor
+from tools.uri_source import STREAM_CHUNK_BYTES, _extract_snippet, _page_indexes
+
+PAGE_SIZES_MB = (2, 8, 32)
+QUERY = "pump error code E1234 reset"
+NEEDLE = "<p>Error code E1234 means the pump overheated; reset it from the service menu.</p>"
+
+
+def make_page(size_mb: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(20_000)]
+    paragraphs, size = [], 0
+    while size < size_mb * 1024 * 1024:
+        paragraph = "<p>" + " ".join(rng.choice(vocabulary) for _ in range(150)) + "</p>"
+        paragraphs.append(paragraph)
+        size += len(paragraph)
+    # Put matches at the start and the end so early stopping and full scans both have work to do.
+    for position in (10, 20, 30, len(paragraphs) - 1):
+        paragraphs.insert(position, NEEDLE)
+    return ("<html><body>" + "".join(paragraphs) + "</body></html>").encode()
+
+
+def measure(fn):
+    _page_indexes.clear()
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def streamed(body: bytes, max_bytes: int, early_stop: bool):
+    extractor = StreamingPassageExtractor(QUERY)
+    for start in range(0, len(body), STREAM_CHUNK_BYTES):
+        extractor.feed_bytes(body[start:start + STREAM_CHUNK_BYTES])
+        if extractor.bytes_read >= max_bytes or (early_stop and extractor.satisfied):
+            break
+    extractor.close()
+    return extractor.passages()
+
+
+def main():
+    print(f"{'page':>6} {'mode':>22} {'seconds':>9} {'peak MiB':>9}")
+    for size_mb in PAGE_SIZES_MB:
+        body = make_page(size_mb)
+        html = body.decode()
+        runs = {
+            "buffered": lambda: _extract_snippet("bench", html, QUERY),
+            "streamed (full page)": lambda: streamed(body, len(body), early_stop=False),
+            "streamed (early stop)": lambda: streamed(body, len(body), early_stop=True),
+        }
+        for mode, fn in runs.items():
+            elapsed, peak = measure(fn)
+            print(f"{size_mb:>4}MB {mode:>22} {elapsed:>9.3f} {peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
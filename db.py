@@ -0,0 +1,106 @@
+"""
+Shared MongoDB access for the agent runtime and the connectors.
+
+One pymongo client is created on first use and shared by every collection
+handle, so the whole process draws from a single connection pool. pymongo is
+synchronous; coroutines reach it through run_db, which runs the call on a
+bounded thread pool instead of blocking the event loop.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+T = TypeVar("T")
+
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_DATABASE = os.environ.get("MONGO_DATABASE", "llmtf")
+
+_client: Optional[MongoClient] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _client_options() -> dict:
+    return {
+        "maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", 50)),
+        "minPoolSize": int(os.environ.get("MONGO_MIN_POOL_SIZE", 0)),
+        "maxIdleTimeMS": int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", 60_000)),
+        "waitQueueTimeoutMS": int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10_000)),
+        "serverSelectionTimeoutMS": int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5_000)),
+        "connectTimeoutMS": int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 5_000)),
+        "socketTimeoutMS": int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", 30_000)),
+    }
+
+
+def get_client() -> MongoClient:
+    global _client
+    with _lock:
+        if _client is None:
+            _client = MongoClient(MONGO_URI, **_client_options())
+        return _client
+
+
+def get_database() -> Database:
+    return get_client()[MONGO_DATABASE]
+
+
+class LazyCollection:
+    """
+    Module-level collection handle that resolves against the shared client on
+    first use, so importing a module never opens a connection.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @property
+    def collection(self) -> Collection:
+        return get_database()[self.name]
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self.collection, attribute)
+
+    def __repr__(self) -> str:
+        return f"LazyCollection({MONGO_DATABASE}.{self.name})"
+
+
+def collection(name: str) -> LazyCollection:
+    return LazyCollection(name)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            # One worker per pooled connection is enough to keep the pool busy.
+            workers = int(os.environ.get("MONGO_EXECUTOR_WORKERS", os.environ.get("MONGO_MAX_POOL_SIZE", 50)))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mongo")
+        return _executor
+
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking database call on the shared worker pool and await its result."""
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context along so telemetry spans opened in fn nest under the caller's.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), partial(context.run, fn, *args, **kwargs))
+
+
+def close() -> None:
+    """Shut down the worker pool and close the shared client; both are recreated on next use."""
+    global _client, _executor
+    with _lock:
+        client, _client = _client, None
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+    if client is not None:
+        client.close()
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+
+@dataclass
+class CachedAgentGraph:
+    key: str
+    graph: Any
+    tools: List[Any]
+    system_prompt: str
+    agent_id: Optional[Any]
+    agent_name: str
+    # Organization that owns the agent; a cache hit for another organization's request must not be served.
+    org: Any = None
+    connector_ids: FrozenSet[str] = frozenset()
+    model: str = "gpt-4o-mini"
+    history_token_budget: Optional[int] = None
+    summarize_history: bool = True
+    response_cache: bool = False
+    # (data_version function, connector settings) for connectors whose data can change without a settings action.
+    data_sources: List[Tuple[Callable[[Dict[str, Any]], Hashable], Dict[str, Any]]] = field(default_factory=list)
+    created_at: float = field(default_factory=time.monotonic)
+
+    def data_version(self) -> Hashable:
+        """Current version of the data behind the agent's connectors; blocking, so call it through run_db."""
+        return tuple(version(settings) for version, settings in self.data_sources)
+
+
+def agent_graph_key(agent: Dict[str, Any], connectors: List[Dict[str, Any]]) -> str:
+    """Fingerprint of everything a compiled agent graph is built from."""
+    payload = {
+        "name": agent.get("name"),
+        "org": agent.get("org"),
+        "model": agent.get("model"),
+        "temperature": agent.get("temperature", 0.7),
+        "description": agent.get("description"),
+        "history_token_budget": agent.get("history_token_budget"),
+        "summarize_history": agent.get("summarize_history", True),
+        "tool_concurrency": agent.get("tool_concurrency"),
+        "response_cache": agent.get("response_cache", False),
+        "tools": [getattr(t, "name", t) for t in agent.get("tools", [])],
+        "connectors": sorted(
+            [str(c.get("_id")), c.get("connector_type"), c.get("name"), c.get("settings")]
+            for c in connectors
+        ),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class AgentGraphCache:
+    """
+    Size-bounded LRU of compiled agent graphs keyed by agent id.
+
+    Entries are served without touching the database for ttl seconds. After
+    that, the caller re-reads the agent and its connectors and passes the
+    fresh key; an identical key revives the entry without rebuilding.
+    Settings actions invalidate entries explicitly.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedAgentGraph]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, agent_id: str, key: Optional[str] = None) -> Optional[CachedAgentGraph]:
+        """
+        Without a key, return the entry only while it is fresh. With a key,
+        return any entry built from that same key and restart its TTL.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(agent_id)
+            if entry is not None and key is not None and entry.key == key:
+                entry.created_at = now
+                self.revalidations += 1
+            elif entry is not None and key is None and entry.created_at + self.ttl >= now:
+                self.hits += 1
+            else:
+                if key is not None:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(agent_id)
+            return entry
+
+    def put(self, agent_id: str, entry: CachedAgentGraph) -> CachedAgentGraph:
+        with self._lock:
+            self._entries[agent_id] = entry
+            self._entries.move_to_end(agent_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, agent_id: Optional[str] = None, connector_id: Optional[str] = None) -> None:
+        """Drop the entry for an agent, every entry using a connector, or everything if neither is given."""
+        with self._lock:
+            if agent_id is None and connector_id is None:
+                stale = list(self._entries)
+            else:
+                stale = [
+                    cached_id for cached_id, entry in self._entries.items()
+                    if cached_id == agent_id or (connector_id is not None and connector_id in entry.connector_ids)
+                ]
+            for cached_id in stale:
+                del self._entries[cached_id]
+            self.invalidations += len(stale)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+agent_graph_cache = AgentGraphCache(
+    max_entries=int(os.environ.get("AGENT_GRAPH_CACHE_SIZE", 128)),
+    ttl=float(os.environ.get("AGENT_GRAPH_CACHE_TTL", 300)),
+)
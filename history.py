@@ -0,0 +1,274 @@
+"""
+Token-budgeted chat history with a rolling summary of older turns.
+
+Each turn's token count is computed once, when it is appended. A prompt
+includes the most recent turns that fit the agent's history budget, plus a
+summary of everything before them. The summary is refreshed by a background
+task. Until that task finishes, the previous summary is used and the turns
+it has not yet absorbed are left out, so no turn ever waits on a summarization call.
+If the first summarization fails, the latest of the older turns are kept
+verbatim, as much as fits the summary's share of the budget, in its place.
+"""
+import asyncio
+import os
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from telemetry import warn
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken ships with langchain-openai
+    tiktoken = None
+
+# Tokens of history (summary plus recent turns) sent with each question.
+MODEL_HISTORY_BUDGETS = {
+    "gpt-3.5-turbo": 2_000,
+    "gpt-4": 3_000,
+    "gpt-4o": 8_000,
+    "gpt-4o-mini": 8_000,
+    "gpt-4-turbo": 8_000,
+    "gpt-5": 8_000,
+}
+DEFAULT_HISTORY_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", 4_000))
+SUMMARY_MODEL = os.environ.get("HISTORY_SUMMARY_MODEL", "gpt-4o-mini")
+# Role markers and separators the chat format adds around each message.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+Summarizer = Callable[[str, List[Dict[str, Any]], int], Awaitable[str]]
+
+
+def history_budget(model: Optional[str], override: Optional[int] = None) -> int:
+    if override:
+        return int(override)
+    if "HISTORY_TOKEN_BUDGET" in os.environ:
+        return DEFAULT_HISTORY_BUDGET
+    return MODEL_HISTORY_BUDGETS.get(model or "", DEFAULT_HISTORY_BUDGET)
+
+
+@lru_cache(maxsize=None)
+def _encoding_name(model: str) -> str:
+    if tiktoken is None:
+        return "approximate"
+    try:
+        return tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        return "o200k_base"
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str):
+    """The tiktoken encoding, or None when it cannot be loaded (its BPE file is downloaded on first use)."""
+    if name == "approximate":
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        warn("history.tokenizer_unavailable", f"Could not load the {name} tokenizer, approximating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, encoding_name: str) -> int:
+    encoding = _encoding(encoding_name)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class HistoryMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.prompt_tokens = 0
+        self.full_history_tokens = 0
+        self.summaries = 0
+        self.summary_failures = 0
+
+    def record(self, full_tokens: int, used_tokens: int) -> None:
+        with self._lock:
+            self.turns += 1
+            self.full_history_tokens += full_tokens
+            self.prompt_tokens += used_tokens
+
+    def record_summary(self, succeeded: bool) -> None:
+        with self._lock:
+            if succeeded:
+                self.summaries += 1
+            else:
+                self.summary_failures += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            saved = self.full_history_tokens - self.prompt_tokens
+            return {
+                "turns": self.turns,
+                "history_tokens_sent": self.prompt_tokens,
+                "history_tokens_full": self.full_history_tokens,
+                "tokens_saved": saved,
+                "saved_ratio": saved / self.full_history_tokens if self.full_history_tokens else 0.0,
+                "summaries": self.summaries,
+                "summary_failures": self.summary_failures,
+            }
+
+
+history_metrics = HistoryMetrics()
+
+
+async def summarize_with_llm(summary: str, entries: List[Dict[str, Any]], max_tokens: int) -> str:
+    from langchain_openai import ChatOpenAI
+
+    transcript = "\n".join(f"User: {e['user']}\nAssistant: {e['assistant']}" for e in entries)
+    prompt = [
+        SystemMessage(
+            content="You maintain a running summary of a conversation. Merge the new turns into the "
+                    "existing summary. Keep names, facts, decisions, preferences and open questions; "
+                    f"drop small talk. Stay under {max_tokens} tokens and reply with the summary only."
+        ),
+        HumanMessage(content=f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"),
+    ]
+    llm = ChatOpenAI(model=SUMMARY_MODEL, temperature=0, max_retries=3)
+    return (await llm.ainvoke(prompt)).content.strip()
+
+
+def _transcript(entries: List[Dict[str, Any]], max_tokens: int, encoding_name: str) -> str:
+    """The most recent turns, verbatim, that fit in max_tokens; the end of the last turn if none fits whole."""
+    lines: List[str] = []
+    used = 0
+    for entry in reversed(entries):
+        line = f"User: {entry['user']}\nAssistant: {entry['assistant']}"
+        tokens = count_tokens(line, encoding_name)
+        if used + tokens > max_tokens:
+            keep = len(line) * max_tokens // tokens
+            if not lines and keep:
+                lines.append("..." + line[-keep:])
+            break
+        used += tokens
+        lines.append(line)
+    return "\n".join(reversed(lines))
+
+
+@dataclass
+class HistoryWindow:
+    summary: str
+    entries: List[Dict[str, Any]]
+    tokens: int
+    full_tokens: int
+    dropped: int
+
+    def messages(self) -> List[BaseMessage]:
+        messages: List[BaseMessage] = []
+        if self.summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"))
+        for entry in self.entries:
+            messages.append(HumanMessage(content=entry["user"]))
+            messages.append(AIMessage(content=entry["assistant"]))
+        return messages
+
+
+class ConversationHistory:
+    """
+    The turns of one chat session. Iterates and appends like the plain list of
+    {"user", "assistant"} entries it replaces.
+    """
+
+    def __init__(self, entries: Iterable[Dict[str, Any]] = (), summarizer: Summarizer = summarize_with_llm):
+        self.entries: List[Dict[str, Any]] = list(entries)
+        self.summarizer = summarizer
+        self.summary = ""
+        self.summarized_upto = 0
+        self._token_counts: Dict[str, List[int]] = {}
+        self._summary_tokens: Dict[str, int] = {}
+        self._summary_task: Optional[asyncio.Task] = None
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        self.entries.append(entry)
+        for encoding_name, counts in self._token_counts.items():
+            counts.append(self._entry_tokens(entry, encoding_name))
+
+    @staticmethod
+    def _entry_tokens(entry: Dict[str, Any], encoding_name: str) -> int:
+        return (
+            count_tokens(entry["user"], encoding_name)
+            + count_tokens(entry["assistant"], encoding_name)
+            + 2 * MESSAGE_OVERHEAD_TOKENS
+        )
+
+    def _counts(self, encoding_name: str) -> List[int]:
+        counts = self._token_counts.setdefault(encoding_name, [])
+        for entry in self.entries[len(counts):]:
+            counts.append(self._entry_tokens(entry, encoding_name))
+        return counts
+
+    def _summary_token_count(self, encoding_name: str) -> int:
+        if not self.summary:
+            return 0
+        if encoding_name not in self._summary_tokens:
+            self._summary_tokens[encoding_name] = count_tokens(self.summary, encoding_name) + MESSAGE_OVERHEAD_TOKENS
+        return self._summary_tokens[encoding_name]
+
+    def window(self, model: Optional[str], budget: int, summarize: bool = True) -> HistoryWindow:
+        """Most recent turns that fit the budget, preceded by the summary of older turns when enabled."""
+        encoding_name = _encoding_name(model or "gpt-4o-mini")
+        counts = self._counts(encoding_name)
+        summary = self.summary if summarize else ""
+        summary_tokens = self._summary_token_count(encoding_name) if summarize else 0
+
+        start, used = len(counts), summary_tokens
+        floor = self.summarized_upto if summary else 0
+        while start > floor and used + counts[start - 1] <= budget:
+            start -= 1
+            used += counts[start]
+
+        if summarize and start > self.summarized_upto:
+            self._schedule_summary(start, budget // 4, encoding_name)
+
+        full_tokens = sum(counts)
+        history_metrics.record(full_tokens, used)
+        return HistoryWindow(
+            summary=summary,
+            entries=self.entries[start:],
+            tokens=used,
+            full_tokens=full_tokens,
+            dropped=start - (self.summarized_upto if summary else 0),
+        )
+
+    def _schedule_summary(self, upto: int, max_tokens: int, encoding_name: str) -> None:
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._summary_task = loop.create_task(self._refresh_summary(upto, max_tokens, encoding_name))
+
+    async def _refresh_summary(self, upto: int, max_tokens: int, encoding_name: str) -> None:
+        entries = self.entries[self.summarized_upto:upto]
+        try:
+            summary = await self.summarizer(self.summary, entries, max_tokens)
+        except Exception as e:
+            history_metrics.record_summary(False)
+            if self.summary:
+                warn("history.summary_failed", f"History summarization failed, keeping the previous summary: {e}")
+                return
+            # Without a summary the dropped turns would be lost; keep the latest of them verbatim instead.
+            warn("history.summary_failed", f"History summarization failed, keeping the older turns as a transcript: {e}")
+            summary = _transcript(entries, max_tokens, encoding_name)
+        else:
+            history_metrics.record_summary(True)
+        self.summary, self.summarized_upto = summary, upto
+        self._summary_tokens.clear()
+
+    async def wait_for_summary(self) -> None:
+        """Let a pending summary refresh finish, e.g. before the session is persisted."""
+        if self._summary_task is not None:
+            await asyncio.gather(self._summary_task, return_exceptions=True)
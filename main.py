@@ -1,5 +1,12 @@
 import asyncio
 from agent import get_agent_graph
+from bson import ObjectId
+from db import run_db
+from history import ConversationHistory
+from registry import REGISTRY_PAGE_SIZE, ensure_indexes, registry
+from sessions import session_store
+from streaming import stream_turn
+from telemetry import configure_from_env
 from dotenv import load_dotenv, find_dotenv
 import os
 
@@ -10,45 +17,87 @@ _SESSION = {
     "history": [],
 }
 
-async def list_agents():
+def _with_id(document):
+    return {**document, "id": str(document.get("_id"))} if document else None
+
+async def list_agents(prefix="", page=0):
     graph, messages, agent_name, agent_id = await get_agent_graph(
-        question={"action": "list_agents"},
+        question={"action": "list_agents", "prefix": prefix, "page": page},
         organization_id=None,
         chat_history=[],
         agent_id=None
     )
-    meta = messages[0]
-    agents = meta.get("agents", [])
-    for agent in agents:
-        if not agent.get("id") and agent.get("_id") is not None:
-            agent["id"] = str(agent.get("_id"))
-    return agents
+    return [_with_id(agent) for agent in messages[0].get("agents", [])]
 
-async def list_connectors():
+async def list_connectors(prefix="", page=0):
     graph, messages, agent_name, agent_id = await get_agent_graph(
-        question={"action": "list_connectors"},
+        question={"action": "list_connectors", "prefix": prefix, "page": page},
         organization_id=None,
         chat_history=[],
         agent_id=None
     )
-    meta = messages[0]
-    connectors = meta.get("connectors", [])
-    return connectors
+    return [_with_id(connector) for connector in messages[0].get("connectors", [])]
+
+def _own(document):
+    """The document if it belongs to the CLI's organization (none), as the settings actions are scoped."""
+    return document if document and document.get("org") is None else None
 
 async def get_agent_by_id(agent_id):
-    agents = await list_agents()
-    for agent in agents:
-        if str(agent.get("id")) == str(agent_id):
-            return agent
-    return None
+    return _with_id(_own(await run_db(registry.get_agent, agent_id)))
 
 async def get_connector_by_id(connector_id):
-    connectors = await list_connectors()
-    for connector in connectors:
-        if str(connector.get("id")) == str(connector_id):
-            return connector
+    return _with_id(_own(await run_db(registry.get_connector, connector_id)))
+
+async def apply_action(question):
+    """Run a settings action on an existing agent or connector; True if it matched one."""
+    _, messages, _, _ = await get_agent_graph(
+        question=question,
+        organization_id=None,
+        chat_history=[],
+        agent_id=None
+    )
+    return bool(messages[0].get("matched"))
+
+async def print_pages(fetch, describe):
+    """Print a listing a page at a time, asking before fetching the next page."""
+    page = 0
+    while True:
+        items = await fetch(page=page)
+        for item in items:
+            print(describe(item))
+        if len(items) < REGISTRY_PAGE_SIZE or input("Show more? (y/N): ").strip().lower() != "y":
+            return
+        page += 1
+
+def choose(items, kind):
+    """Pick one of several matches by number; None after printing why not."""
+    if not items:
+        print(f"No matching {kind}s found.")
+        return None
+    if len(items) == 1:
+        print(f"Selected {kind}: {items[0].get('name')} (ID: {items[0].get('id')})")
+        return items[0]
+    print(f"Multiple {kind}s match:")
+    for idx, item in enumerate(items, 1):
+        print(f"{idx}. {item.get('name')} (ID: {item.get('id')})")
+    sel = input(f"Select {kind} number: ").strip()
+    try:
+        sel_idx = int(sel) - 1
+    except ValueError:
+        print("Invalid input.")
+        return None
+    if 0 <= sel_idx < len(items):
+        return items[sel_idx]
+    print("Invalid selection.")
     return None
 
+async def find_connector(connector_input):
+    """A connector by ID, or by name prefix when the input is not one."""
+    connector = await get_connector_by_id(connector_input)
+    if connector is None:
+        connector = choose(await list_connectors(prefix=connector_input), "connector")
+    return str(connector["id"]) if connector else None
+
 async def settings_menu():
     while True:
         print("\n--- Settings Menu ---")
@@ -65,10 +114,8 @@ async def settings_menu():
         print("0. Back")
         choice = input("Select option: ").strip()
         if choice == "1":
-            agents = await list_agents()
             print("\nAgents:")
-            for a in agents:
-                print(f"  ID: {a.get('id')}, Name: {a.get('name')}, Connectors: {a.get('connectors', [])}")
+            await print_pages(list_agents, lambda a: f"  ID: {a.get('id')}, Name: {a.get('name')}, Connectors: {[str(c) for c in a.get('connector_ids', [])]}")
             await asyncio.sleep(2.5)
         elif choice == "2":
             name = input("Enter new agent name: ").strip()
@@ -89,29 +136,17 @@ async def settings_menu():
                 continue
             new_name = input(f"Enter new name for agent '{agent.get('name')}' (leave blank to keep): ").strip()
             if new_name:
-                _, _, _, _ = await get_agent_graph(
-                    question={"action": "edit_agent", "agent_id": agent_id, "name": new_name},
-                    organization_id=None,
-                    chat_history=[],
-                    agent_id=None
-                )
-                print("Agent updated.")
+                updated = await apply_action({"action": "edit_agent", "agent_id": agent_id, "name": new_name})
+                print("Agent updated." if updated else "Agent not found.")
             await asyncio.sleep(2.5)
         elif choice == "4":
             agent_id = input("Enter agent ID to delete: ").strip()
-            _, _, _, _ = await get_agent_graph(
-                question={"action": "delete_agent", "agent_id": agent_id},
-                organization_id=None,
-                chat_history=[],
-                agent_id=None
-            )
-            print("Agent deleted.")
+            deleted = await apply_action({"action": "delete_agent", "agent_id": agent_id})
+            print("Agent deleted." if deleted else "Agent not found.")
             await asyncio.sleep(2.5)
         elif choice == "5":
-            connectors = await list_connectors()
             print("\nConnectors:")
-            for c in connectors:
-                print(f"  ID: {c.get('id')}, Name: {c.get('name')}, Type: {c.get('type')}")
+            await print_pages(list_connectors, lambda c: f"  ID: {c.get('id')}, Name: {c.get('name')}, Type: {c.get('connector_type')}")
             await asyncio.sleep(2.5)
         elif choice == "6":
             name = input("Enter new connector name: ").strip()
@@ -128,109 +163,33 @@ async def settings_menu():
             connector_id = input("Enter connector ID to edit: ").strip()
             new_name = input("Enter new name (leave blank to keep): ").strip()
             new_type = input("Enter new type (leave blank to keep): ").strip()
-            _, _, _, _ = await get_agent_graph(
-                question={"action": "edit_connector", "connector_id": connector_id, "name": new_name or None, "type": new_type or None},
-                organization_id=None,
-                chat_history=[],
-                agent_id=None
-            )
-            print("Connector updated.")
+            updated = await apply_action({"action": "edit_connector", "connector_id": connector_id, "name": new_name or None, "type": new_type or None})
+            print("Connector updated." if updated else "Connector not found.")
             await asyncio.sleep(2.5)
         elif choice == "8":
             connector_id = input("Enter connector ID to delete: ").strip()
-            _, _, _, _ = await get_agent_graph(
-                question={"action": "delete_connector", "connector_id": connector_id},
-                organization_id=None,
-                chat_history=[],
-                agent_id=None
-            )
-            print("Connector deleted.")
+            deleted = await apply_action({"action": "delete_connector", "connector_id": connector_id})
+            print("Connector deleted." if deleted else "Connector not found.")
             await asyncio.sleep(2.5)
         elif choice == "9":
             agent_id = input("Enter agent ID: ").strip()
-            connector_input = input("Enter connector ID or name substring to link: ").strip()
-            connectors = await list_connectors()
-            connector_id = None
-            for c in connectors:
-                if str(c.get("id")) == connector_input:
-                    connector_id = str(c.get("id"))
-                    break
+            connector_input = input("Enter connector ID or name prefix to link: ").strip()
+            connector_id = await find_connector(connector_input)
             if connector_id is None:
-                matching_connectors = [c for c in connectors if connector_input.lower() in c.get("name", "").lower()]
-                if not matching_connectors:
-                    print("No matching connectors found.")
-                    await asyncio.sleep(2.5)
-                    continue
-                elif len(matching_connectors) == 1:
-                    connector_id = str(matching_connectors[0].get("id"))
-                    print(f"Selected connector: {matching_connectors[0].get('name')} (ID: {connector_id})")
-                else:
-                    print("Multiple connectors match:")
-                    for idx, c in enumerate(matching_connectors, 1):
-                        print(f"{idx}. {c.get('name')} (ID: {c.get('id')})")
-                    sel = input("Select connector number: ").strip()
-                    try:
-                        sel_idx = int(sel) - 1
-                        if 0 <= sel_idx < len(matching_connectors):
-                            connector_id = str(matching_connectors[sel_idx].get("id"))
-                        else:
-                            print("Invalid selection.")
-                            await asyncio.sleep(2.5)
-                            continue
-                    except ValueError:
-                        print("Invalid input.")
-                        await asyncio.sleep(2.5)
-                        continue
-            _, _, _, _ = await get_agent_graph(
-                question={"action": "link_connector", "agent_id": agent_id, "connector_id": connector_id},
-                organization_id=None,
-                chat_history=[],
-                agent_id=None
-            )
-            print("Connector linked to agent.")
+                await asyncio.sleep(2.5)
+                continue
+            linked = await apply_action({"action": "link_connector", "agent_id": agent_id, "connector_id": connector_id})
+            print("Connector linked to agent." if linked else "Agent or connector not found.")
             await asyncio.sleep(2.5)
         elif choice == "10":
             agent_id = input("Enter agent ID: ").strip()
-            connector_input = input("Enter connector ID or name substring to unlink: ").strip()
-            connectors = await list_connectors()
-            connector_id = None
-            for c in connectors:
-                if str(c.get("id")) == connector_input:
-                    connector_id = str(c.get("id"))
-                    break
+            connector_input = input("Enter connector ID or name prefix to unlink: ").strip()
+            connector_id = await find_connector(connector_input)
             if connector_id is None:
-                matching_connectors = [c for c in connectors if connector_input.lower() in c.get("name", "").lower()]
-                if not matching_connectors:
-                    print("No matching connectors found.")
-                    await asyncio.sleep(2.5)
-                    continue
-                elif len(matching_connectors) == 1:
-                    connector_id = str(matching_connectors[0].get("id"))
-                    print(f"Selected connector: {matching_connectors[0].get('name')} (ID: {connector_id})")
-                else:
-                    print("Multiple connectors match:")
-                    for idx, c in enumerate(matching_connectors, 1):
-                        print(f"{idx}. {c.get('name')} (ID: {c.get('id')})")
-                    sel = input("Select connector number: ").strip()
-                    try:
-                        sel_idx = int(sel) - 1
-                        if 0 <= sel_idx < len(matching_connectors):
-                            connector_id = str(matching_connectors[sel_idx].get("id"))
-                        else:
-                            print("Invalid selection.")
-                            await asyncio.sleep(2.5)
-                            continue
-                    except ValueError:
-                        print("Invalid input.")
-                        await asyncio.sleep(2.5)
-                        continue
-            _, _, _, _ = await get_agent_graph(
-                question={"action": "unlink_connector", "agent_id": agent_id, "connector_id": connector_id},
-                organization_id=None,
-                chat_history=[],
-                agent_id=None
-            )
-            print("Connector unlinked from agent.")
+                await asyncio.sleep(2.5)
+                continue
+            unlinked = await apply_action({"action": "unlink_connector", "agent_id": agent_id, "connector_id": connector_id})
+            print("Connector unlinked from agent." if unlinked else "Agent or connector not found.")
             await asyncio.sleep(2.5)
         elif choice == "0":
             break
@@ -246,6 +205,7 @@ def print_main_menu(selected_agent_id):
     print("  select        - Select agent")
     print("  revoke        - Unselect agent")
     print("  history       - Show chat history")
+    print("  resume        - Resume a saved session")
     print("  exit/quit     - Exit")
     if selected_agent_id:
         print(f"Current agent: {selected_agent_id}")
@@ -260,41 +220,26 @@ async def select_agent():
     print("\nAvailable agents:")
     for a in agents:
         print(f"  ID: {a.get('id')}, Name: {a.get('name')}")
-    agent_input = input("Enter agent ID or name substring to select: ").strip()
-    for a in agents:
-        if str(a.get("id")) == agent_input:
-            print(f"Agent {agent_input} selected.")
-            return agent_input
-    matching_agents = [a for a in agents if agent_input.lower() in a.get("name", "").lower()]
-    if not matching_agents:
-        print("Agent not found.")
-        return None
-    elif len(matching_agents) == 1:
-        agent_id = str(matching_agents[0].get("id"))
-        print(f"Selected agent: {matching_agents[0].get('name')} (ID: {agent_id})")
-        return agent_id
-    else:
-        print("Multiple agents match:")
-        for idx, a in enumerate(matching_agents, 1):
-            print(f"{idx}. {a.get('name')} (ID: {a.get('id')})")
-        sel = input("Select agent number: ").strip()
-        try:
-            sel_idx = int(sel) - 1
-            if 0 <= sel_idx < len(matching_agents):
-                agent_id = str(matching_agents[sel_idx].get("id"))
-                return agent_id
-            else:
-                print("Invalid selection.")
-                return None
-        except ValueError:
-            print("Invalid input.")
-            return None
+    if len(agents) == REGISTRY_PAGE_SIZE:
+        print(f"  (first {REGISTRY_PAGE_SIZE} shown; enter a name prefix to find others)")
+    agent_input = input("Enter agent ID or name prefix to select: ").strip()
+    if await get_agent_by_id(agent_input):
+        print(f"Agent {agent_input} selected.")
+        return agent_input
+    agent = choose(await list_agents(prefix=agent_input), "agent")
+    return str(agent["id"]) if agent else None
+
+def _format_metrics(metrics) -> str:
+    ttft = f"{metrics.time_to_first_token:.2f}s" if metrics.time_to_first_token is not None else "n/a"
+    rate = f"{metrics.tokens_per_second:.1f} tok/s" if metrics.tokens_per_second is not None else "n/a"
+    return f"[first token {ttft} | {rate} | {metrics.latency:.2f}s total]"
 
 async def chat_session():
-    session_id = None
+    session_id = session_store.create()
     agent_id = _SESSION.get("selected_agent_id")
-    chat_history = []
+    chat_history = ConversationHistory()
     print_main_menu(agent_id)
+    print(f"Session: {session_id}")
     while True:
         user_input = input("You: ").strip()
         if not user_input:
@@ -323,6 +268,19 @@ async def chat_session():
             _SESSION["selected_agent_id"] = None
             print("Agent selection revoked.")
             continue
+        elif cmd == "resume":
+            resume_id = input("Enter session ID: ").strip()
+            record = await run_db(session_store.load, resume_id) if ObjectId.is_valid(resume_id) else None
+            if not record:
+                print("Session not found.")
+                continue
+            session_id = record.session_id
+            chat_history = ConversationHistory(record.turns)
+            if record.agent_id:
+                agent_id = record.agent_id
+                _SESSION["selected_agent_id"] = agent_id
+            print(f"Resumed session {session_id} with its last {len(record.turns)} of {record.turn_count} turns.")
+            continue
         elif cmd == "menu":
             print_main_menu(agent_id)
             continue
@@ -340,20 +298,28 @@ async def chat_session():
             _SESSION["selected_agent_id"] = agent_id
 
         print(f"[Agent: {agent_name}] ", end="", flush=True)
-        answer = ""
-        async for step in graph.astream({"messages": messages}, stream_mode="values"):
-            last_msg = step["messages"][-1]
-            if hasattr(last_msg, "tool_calls"):
-                print(f"\n[Tool Calls]: {last_msg.tool_calls}")
-            content = getattr(last_msg, "content", None)
-            if content:
-                answer += content
-                print(content, end="", flush=True)
+        turn = stream_turn(graph, messages)
+        async for event in turn:
+            if event.type == "token":
+                print(event.content, end="", flush=True)
+            elif event.type == "tool_call":
+                print(f"\n[Tool Call] {event.name}({event.args})", flush=True)
+            elif event.type == "tool_result":
+                print(f"[Tool Result] {event.name}: {event.content[:200]}", flush=True)
+        answer = turn.answer
         print("\n")
-        chat_history.append({"user": user_input, "assistant": answer})
+        print(_format_metrics(turn.metrics))
+        entry = {"user": user_input, "assistant": answer, "agent_id": agent_id_actual, "agent_name": agent_name}
+        chat_history.append(entry)
+        session_store.append(session_id, entry)
 
 def main():
-    asyncio.run(chat_session())
+    configure_from_env()
+    ensure_indexes()
+    try:
+        asyncio.run(chat_session())
+    finally:
+        session_store.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+Indexed reads of agents and connectors for the settings menu and the API.
+
+Lookups go by _id, listings are scoped to one org, sorted by name and read a
+page at a time with a projection, and name search is a prefix match on
+name_key, the casefolded name, so every query is served by an index instead
+of a scan of the whole collection. name_key is written by the settings
+actions; ensure_indexes() creates the indexes and backfills name_key on
+documents written before it existed.
+
+Results are cached in memory for REGISTRY_CACHE_TTL seconds. Settings
+actions call invalidate(), so this process sees its own writes at once;
+other processes see them once the TTL runs out.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+
+from db import collection
+from telemetry import warn
+
+REGISTRY_CACHE_TTL = float(os.environ.get("REGISTRY_CACHE_TTL", 5))
+REGISTRY_CACHE_SIZE = int(os.environ.get("REGISTRY_CACHE_SIZE", 1024))
+REGISTRY_PAGE_SIZE = int(os.environ.get("REGISTRY_PAGE_SIZE", 50))
+
+AGENT_LIST_PROJECTION = {"name": 1, "name_key": 1, "description": 1, "model": 1, "org": 1, "connector_ids": 1, "updated_at": 1}
+CONNECTOR_LIST_PROJECTION = {"name": 1, "name_key": 1, "connector_type": 1, "org": 1}
+NAME_ORDER = [("name_key", ASCENDING), ("_id", ASCENDING)]
+
+Id = Union[str, ObjectId]
+
+
+def name_key(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def _object_id(value: Id) -> Optional[ObjectId]:
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(value) if ObjectId.is_valid(value) else None
+
+
+def _prefix_query(prefix: str) -> Dict[str, str]:
+    """Range on name_key that an index can serve: every key starting with prefix."""
+    key = name_key(prefix)
+    if not key:
+        return {}
+    return {"$gte": key, "$lt": key[:-1] + chr(ord(key[-1]) + 1)}
+
+
+class Registry:
+    def __init__(self, agents_db, connectors_db, ttl: float = REGISTRY_CACHE_TTL, max_entries: int = REGISTRY_CACHE_SIZE):
+        self.agents_db = agents_db
+        self.connectors_db = connectors_db
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by invalidate(), so a load that raced with a write is not cached.
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def ensure_indexes(self) -> None:
+        """Create the indexes the registry and routing rely on; safe to run at every startup."""
+        for db in (self.agents_db, self.connectors_db):
+            db.create_index([("org", ASCENDING), *NAME_ORDER])
+            missing = list(db.find({"name_key": {"$exists": False}}, {"name": 1}))
+            if missing:
+                db.bulk_write([UpdateOne({"_id": d["_id"]}, {"$set": {"name_key": name_key(d.get("name", ""))}}) for d in missing], ordered=False)
+        # delete_connector pulls the connector from every agent that links it.
+        self.agents_db.create_index("connector_ids")
+
+    def _cached(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] > now:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+        value = load()
+        with self._lock:
+            if generation != self._generation:
+                return value
+            self._cache[key] = (value, now + self.ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return value
+
+    def _get(self, kind: str, db, document_id: Id) -> Optional[Dict[str, Any]]:
+        key = _object_id(document_id)
+        if key is None:
+            return None
+        return self._cached((kind, key), lambda: db.find_one({"_id": key}))
+
+    def _list(self, kind: str, db, projection: Dict[str, int], org: Optional[ObjectId], prefix: str, page: int, limit: int) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {"org": org}
+        if prefix:
+            query["name_key"] = _prefix_query(prefix)
+
+        def load() -> List[Dict[str, Any]]:
+            return list(db.find(query, projection).sort(NAME_ORDER).skip(page * limit).limit(limit))
+
+        return self._cached((kind, org, name_key(prefix), page, limit), load)
+
+    def get_agent(self, agent_id: Id) -> Optional[Dict[str, Any]]:
+        return self._get("agent", self.agents_db, agent_id)
+
+    def get_connector(self, connector_id: Id) -> Optional[Dict[str, Any]]:
+        return self._get("connector", self.connectors_db, connector_id)
+
+    def list_agents(self, org: Optional[ObjectId], prefix: str = "", page: int = 0, limit: int = REGISTRY_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """One page of an org's agents sorted by name, optionally only names starting with prefix."""
+        return self._list("agents", self.agents_db, AGENT_LIST_PROJECTION, org, prefix, page, limit)
+
+    def list_connectors(self, org: Optional[ObjectId], prefix: str = "", page: int = 0, limit: int = REGISTRY_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """One page of an org's connectors sorted by name, optionally only names starting with prefix."""
+        return self._list("connectors", self.connectors_db, CONNECTOR_LIST_PROJECTION, org, prefix, page, limit)
+
+    def invalidate(self) -> None:
+        """Drop every cached result; any write can change a listing, so point entries are not kept either."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._cache)
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "entries": len(self._cache),
+            }
+
+
+def ensure_indexes() -> None:
+    """Startup hook; a database that is down only costs a warning here."""
+    try:
+        registry.ensure_indexes()
+    except PyMongoError as e:
+        warn("registry.index_failed", f"Could not create registry indexes: {e}")
+
+
+registry = Registry(collection("agents"), collection("connectors"))
@@ -0,0 +1,272 @@
+"""
+Semantic cache of agent answers for repeated and paraphrased questions.
+
+Agents opt in with their response_cache setting. A question's embedding is
+compared with the questions the agent has already answered under its current
+version: the graph cache key of its settings and its connectors' settings,
+plus the data version of connectors that declare one, such as the version
+stamps of a PDF connector's documents. At RESPONSE_CACHE_THRESHOLD cosine
+similarity or above, the stored answer is streamed back instead of running
+the agent, its tools and the LLM. When the data version or the question's
+embedding cannot be read, the turn runs without the cache.
+On a miss the agent's graph is wrapped, and its final answer is stored once
+the turn streams to the end, unless the turn stopped on a tool call or a tool
+returned an error.
+
+Entries expire after RESPONSE_CACHE_TTL seconds. Settings actions drop the
+entries of the agents and connectors they touch. A re-ingested, migrated or
+quantized PDF changes the data version, which costs one knowledge_db query
+per lookup; changes that no version sees, such as an edited web page, are
+bounded by the TTL. An answer may depend on the
+conversation before it, so the cache is only used while a session has at most
+RESPONSE_CACHE_MAX_HISTORY earlier turns.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, FrozenSet, Hashable, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessageChunk, ToolMessage
+
+from db import run_db
+from graph_cache import CachedAgentGraph
+from router import agent_router
+from streaming import message_text
+from telemetry import span, warn
+from tools.similarity import normalize_query
+
+RESPONSE_CACHE_THRESHOLD = float(os.environ.get("RESPONSE_CACHE_THRESHOLD", 0.95))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 900))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 256))
+RESPONSE_CACHE_AGENTS = int(os.environ.get("RESPONSE_CACHE_AGENTS", 256))
+RESPONSE_CACHE_MAX_HISTORY = int(os.environ.get("RESPONSE_CACHE_MAX_HISTORY", 0))
+
+# A stored answer is replayed a word at a time, with the whitespace after each word.
+REPLAY_PIECE = re.compile(r"\S+\s*|\s+")
+
+
+@dataclass
+class _AgentAnswers:
+    """One agent's answers under one version, oldest first, so expired entries are a prefix."""
+    version: Hashable
+    connector_ids: FrozenSet[str]
+    vectors: np.ndarray
+    answers: List[str] = field(default_factory=list)
+    expires_at: List[float] = field(default_factory=list)
+
+    def expire(self, now: float) -> int:
+        stale = next((i for i, expires_at in enumerate(self.expires_at) if expires_at > now), len(self.expires_at))
+        self.drop(stale)
+        return stale
+
+    def drop(self, count: int) -> None:
+        if count:
+            self.vectors = self.vectors[count:]
+            del self.answers[:count], self.expires_at[:count]
+
+
+class ReplayGraph:
+    """Stands in for a compiled agent graph on a hit: streams the stored answer as one AI message."""
+
+    def __init__(self, answer: str):
+        self.answer = answer
+
+    async def astream(self, inputs: Any, config: Optional[Dict[str, Any]] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        pieces = REPLAY_PIECE.findall(self.answer)
+        for i, piece in enumerate(pieces):
+            metadata = {"finish_reason": "stop"} if i == len(pieces) - 1 else {}
+            yield AIMessageChunk(content=piece, id="response-cache", response_metadata=metadata), {"response_cache": True}
+
+
+class RecordingGraph:
+    """Passes a compiled graph's message stream through and stores the final answer when the stream completes."""
+
+    def __init__(self, graph: Any, cache: "ResponseCache", cached: CachedAgentGraph, version: Hashable, vector: np.ndarray):
+        self.graph = graph
+        self._cache = cache
+        self._cached = cached
+        self._version = version
+        self._vector = vector
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.graph, name)
+
+    async def astream(self, inputs: Any, config: Optional[Dict[str, Any]] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        start = time.perf_counter()
+        recording = kwargs.get("stream_mode") == "messages"
+        texts: Dict[Optional[str], List[str]] = {}
+        tool_calls, last_id, failed = set(), None, False
+        stream = self.graph.astream(inputs, config=config, **kwargs)
+        try:
+            async for item in stream:
+                if recording:
+                    message = item[0]
+                    if isinstance(message, AIMessageChunk):
+                        last_id = message.id
+                        texts.setdefault(message.id, []).append(message_text(message.content))
+                        if message.tool_call_chunks:
+                            tool_calls.add(message.id)
+                    elif isinstance(message, ToolMessage):
+                        last_id = None
+                        failed = failed or message_text(message.content).startswith("Error:")
+                yield item
+        finally:
+            await stream.aclose()
+        answer = "".join(texts.get(last_id, []))
+        if recording and last_id not in tool_calls and answer.strip() and not failed:
+            self._cache.store(self._cached, self._version, self._vector, answer, time.perf_counter() - start)
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = RESPONSE_CACHE_THRESHOLD,
+        ttl: float = RESPONSE_CACHE_TTL,
+        max_entries: int = RESPONSE_CACHE_SIZE,
+        max_agents: int = RESPONSE_CACHE_AGENTS,
+        max_history: int = RESPONSE_CACHE_MAX_HISTORY,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_agents = max_agents
+        self.max_history = max_history
+        self._agents: "OrderedDict[str, _AgentAnswers]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.failures = 0
+        self.stores = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lookup_seconds = 0.0
+        self._miss_turn_seconds = 0.0
+
+    async def wrap(self, cached: CachedAgentGraph, question: str, history_turns: int) -> Any:
+        """
+        The graph to run for this question: a replay of a stored answer on a
+        hit, else the agent's own graph, recording its answer on a miss.
+        """
+        if history_turns > self.max_history:
+            with self._lock:
+                self.skipped += 1
+            return cached.graph
+
+        start = time.perf_counter()
+        with span("agent.response_cache") as s:
+            try:
+                version = (cached.key, await run_db(cached.data_version)) if cached.data_sources else cached.key
+            except Exception as e:
+                warn("response_cache.version_failed", f"Could not read the data version of the agent's connectors, skipping the response cache: {e}")
+                with self._lock:
+                    self.failures += 1
+                return cached.graph
+            try:
+                vector = normalize_query(await self.embeddings.aembed_query(question))
+            except Exception as e:
+                warn("response_cache.embedding_failed", f"Could not embed the question, skipping the response cache: {e}")
+                with self._lock:
+                    self.failures += 1
+                return cached.graph
+            answer = self._find(cached, version, vector)
+            s.set(hit=answer is not None)
+        with self._lock:
+            self._lookup_seconds += time.perf_counter() - start
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if answer is None:
+            return RecordingGraph(cached.graph, self, cached, version, vector)
+        return ReplayGraph(answer)
+
+    def _answers(self, cached: CachedAgentGraph, version: Hashable, now: float) -> Optional[_AgentAnswers]:
+        """The agent's entries for version, dropping them if its configuration or data changed; call with the lock held."""
+        agent_id = str(cached.agent_id)
+        entries = self._agents.get(agent_id)
+        if entries is None:
+            return None
+        if entries.version != version:
+            del self._agents[agent_id]
+            self.invalidations += len(entries.answers)
+            return None
+        self.expirations += entries.expire(now)
+        self._agents.move_to_end(agent_id)
+        return entries
+
+    def _find(self, cached: CachedAgentGraph, version: Hashable, vector: np.ndarray) -> Optional[str]:
+        with self._lock:
+            entries = self._answers(cached, version, time.monotonic())
+            if entries is None or not entries.answers:
+                return None
+            scores = entries.vectors @ vector
+            best = int(np.argmax(scores))
+            return entries.answers[best] if scores[best] >= self.threshold else None
+
+    def store(self, cached: CachedAgentGraph, version: Hashable, vector: np.ndarray, answer: str, turn_seconds: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._miss_turn_seconds += turn_seconds
+            entries = self._answers(cached, version, now)
+            if entries is None:
+                entries = _AgentAnswers(version, cached.connector_ids, np.empty((0, vector.shape[0]), dtype=np.float32))
+                self._agents[str(cached.agent_id)] = entries
+            entries.vectors = np.vstack([entries.vectors, vector.astype(np.float32)[None, :]])
+            entries.answers.append(answer)
+            entries.expires_at.append(now + self.ttl)
+            self.stores += 1
+
+            overflow = len(entries.answers) - self.max_entries
+            if overflow > 0:
+                entries.drop(overflow)
+                self.evictions += overflow
+            while len(self._agents) > self.max_agents:
+                _, evicted = self._agents.popitem(last=False)
+                self.evictions += len(evicted.answers)
+
+    def invalidate(self, agent_id: Optional[str] = None, connector_id: Optional[str] = None) -> None:
+        """Drop the answers of an agent, of every agent using a connector, or everything if neither is given."""
+        with self._lock:
+            if agent_id is None and connector_id is None:
+                stale = list(self._agents)
+            else:
+                stale = [
+                    cached_id for cached_id, entries in self._agents.items()
+                    if cached_id == agent_id or (connector_id is not None and connector_id in entries.connector_ids)
+                ]
+            for cached_id in stale:
+                self.invalidations += len(self._agents.pop(cached_id).answers)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            average_miss_turn_seconds = self._miss_turn_seconds / self.stores if self.stores else 0.0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "skipped_for_history": self.skipped,
+                "skipped_for_errors": self.failures,
+                "stores": self.stores,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "agents": len(self._agents),
+                "entries": sum(len(entries.answers) for entries in self._agents.values()),
+                "average_lookup_ms": 1000 * self._lookup_seconds / lookups if lookups else 0.0,
+                "average_miss_turn_seconds": average_miss_turn_seconds,
+                "latency_saved_seconds": self.hits * average_miss_turn_seconds,
+            }
+
+
+# The router embeds routed questions with the same client, so those lookups hit its embedding cache.
+response_cache = ResponseCache(agent_router.embeddings)
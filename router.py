@@ -0,0 +1,133 @@
+"""
+Embedding-based routing of unassigned questions to an organization's agents.
+
+Each agent's name and description is embedded once and kept in memory,
+keyed by agent id and re-embedded only when that text changes. A question is
+routed by cosine similarity against those vectors. The decision is marked
+unconfident when the best score is too low or the runner-up is within the
+margin, and the caller falls back to the LLM router for those.
+"""
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from tools.embedding_cache import lazy_openai_embeddings
+from tools.similarity import normalize_rows, search
+
+ROUTER_MODE = os.environ.get("AGENT_ROUTER_MODE", "embedding")
+ROUTER_MARGIN = float(os.environ.get("AGENT_ROUTER_MARGIN", 0.03))
+ROUTER_MIN_SCORE = float(os.environ.get("AGENT_ROUTER_MIN_SCORE", 0.2))
+
+
+def agent_text(agent: Dict[str, Any]) -> str:
+    return f"{agent['name']}: {agent.get('description', '')}"
+
+
+def _text_digest(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+@dataclass
+class RouteDecision:
+    agent: Optional[Dict[str, Any]]
+    score: float
+    runner_up: Optional[Dict[str, Any]]
+    runner_up_score: float
+    confident: bool
+    seconds: float
+
+
+class AgentRouter:
+    def __init__(self, embeddings: Embeddings, margin: float = ROUTER_MARGIN, min_score: float = ROUTER_MIN_SCORE):
+        self.embeddings = embeddings
+        self.margin = margin
+        self.min_score = min_score
+        self._vectors: Dict[str, Tuple[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.routed = 0
+        self.fallbacks = 0
+        self.embedded_agents = 0
+        self.seconds = 0.0
+
+    async def _agent_vectors(self, agents: List[Dict[str, Any]]) -> np.ndarray:
+        """Row i is the normalized vector of agents[i]; only new or edited agents are embedded."""
+        texts = [agent_text(agent) for agent in agents]
+        digests = [_text_digest(text) for text in texts]
+        with self._lock:
+            cached = [self._vectors.get(str(agent["_id"])) for agent in agents]
+        stale = [i for i, entry in enumerate(cached) if entry is None or entry[0] != digests[i]]
+
+        if stale:
+            fresh = await self.embeddings.aembed_documents([texts[i] for i in stale])
+            fresh_matrix = normalize_rows(np.asarray(fresh, dtype=np.float32))
+            with self._lock:
+                for row, i in enumerate(stale):
+                    entry = (digests[i], fresh_matrix[row])
+                    self._vectors[str(agents[i]["_id"])] = entry
+                    cached[i] = entry
+                self.embedded_agents += len(stale)
+
+        return np.stack([vector for _, vector in cached])
+
+    async def route(self, question: str, agents: List[Dict[str, Any]]) -> RouteDecision:
+        start = time.perf_counter()
+        matrix = await self._agent_vectors(agents)
+        query = await self.embeddings.aembed_query(question)
+        ranked = search(matrix, query, 2, -np.inf)
+        (best_row, best_score), *rest = ranked
+        runner_up_row, runner_up_score = rest[0] if rest else (None, -1.0)
+
+        confident = best_score >= self.min_score and best_score - runner_up_score >= self.margin
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.routed += 1
+            self.fallbacks += not confident
+            self.seconds += seconds
+        return RouteDecision(
+            agent=agents[best_row],
+            score=best_score,
+            runner_up=agents[runner_up_row] if runner_up_row is not None else None,
+            runner_up_score=runner_up_score,
+            confident=confident,
+            seconds=seconds,
+        )
+
+    def invalidate(self, agent_id: Optional[str] = None) -> None:
+        with self._lock:
+            if agent_id is None:
+                self._vectors.clear()
+            else:
+                self._vectors.pop(str(agent_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "routed": self.routed,
+                "llm_fallbacks": self.fallbacks,
+                "fallback_rate": self.fallbacks / self.routed if self.routed else 0.0,
+                "embedded_agents": self.embedded_agents,
+                "cached_agents": len(self._vectors),
+                "average_ms": 1000 * self.seconds / self.routed if self.routed else 0.0,
+            }
+
+
+def match_agent_name(reply: str, agents: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Find the agent an LLM router reply names, tolerating quotes, bullets, case and trailing text."""
+    cleaned = reply.strip().strip("-*`'\". ").casefold()
+    by_name = {agent["name"].casefold(): agent for agent in agents}
+    if cleaned in by_name:
+        return by_name[cleaned]
+    # Longest name first so "Sales Ops" wins over "Sales" in "Sales Ops: handles quotes".
+    for name in sorted(by_name, key=len, reverse=True):
+        if cleaned.startswith(name):
+            return by_name[name]
+    return None
+
+
+agent_router = AgentRouter(lazy_openai_embeddings())
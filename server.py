@@ -0,0 +1,354 @@
+"""
+Async HTTP service over get_agent_graph.
+
+    uvicorn server:app --host 0.0.0.0 --port 8000
+
+POST /chat streams the answer as Server-Sent Events: meta, token, tool_call,
+tool_result, then done (or timeout, or error). Agents and connectors are
+listed, created, edited, deleted and linked through the same settings actions
+the CLI uses.
+
+At most SERVER_MAX_INFLIGHT_LLM chat turns run at once. A request that cannot
+get a slot within SERVER_ADMISSION_TIMEOUT seconds is rejected with 503, and a
+turn that runs longer than SERVER_REQUEST_TIMEOUT seconds is stopped with a
+timeout event carrying the answer so far.
+"""
+import asyncio
+import json
+import os
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from agent import ConnectorCreate, ConnectorUpdate, Models, get_agent_graph
+from db import close as close_db, run_db
+from graph_cache import agent_graph_cache
+from history import ConversationHistory, history_metrics
+from registry import REGISTRY_PAGE_SIZE, ensure_indexes, registry
+from response_cache import response_cache
+from router import agent_router
+from sessions import session_store
+from streaming import stream_turn, streaming_metrics
+from telemetry import configure_from_env, telemetry
+from tools.http_client import aclose_client
+
+MAX_INFLIGHT_LLM = int(os.environ.get("SERVER_MAX_INFLIGHT_LLM", 64))
+ADMISSION_TIMEOUT = float(os.environ.get("SERVER_ADMISSION_TIMEOUT", 5))
+REQUEST_TIMEOUT = float(os.environ.get("SERVER_REQUEST_TIMEOUT", 120))
+HISTORY_CACHE_SIZE = int(os.environ.get("SERVER_HISTORY_CACHE_SIZE", 1024))
+
+
+class ChatRequest(BaseModel):
+    question: str = Field(min_length=1)
+    agent_id: Optional[str] = None
+    session_id: Optional[str] = None
+
+
+class AgentCreateRequest(BaseModel):
+    name: str
+    description: str = ""
+    model: Models = "gpt-4o-mini"
+    temperature: float = Field(default=0.7, ge=0.0, le=2.0)
+    history_token_budget: Optional[int] = Field(default=None, gt=0)
+    summarize_history: bool = True
+    tool_concurrency: Optional[int] = Field(default=None, gt=0)
+    response_cache: bool = False
+
+
+class AgentUpdateRequest(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    model: Optional[Models] = None
+    temperature: Optional[float] = Field(default=None, ge=0.0, le=2.0)
+    history_token_budget: Optional[int] = Field(default=None, gt=0)
+    summarize_history: Optional[bool] = None
+    tool_concurrency: Optional[int] = Field(default=None, gt=0)
+    response_cache: Optional[bool] = None
+
+
+class AdmissionControl:
+    """Caps concurrent chat turns; waiting callers give up after a timeout."""
+
+    def __init__(self, limit: int, timeout: float):
+        self.limit = limit
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self) -> Optional["AdmissionTicket"]:
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return None
+        self.in_flight += 1
+        self.admitted += 1
+        return AdmissionTicket(self)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {"limit": self.limit, "in_flight": self.in_flight, "admitted": self.admitted, "rejected": self.rejected}
+
+
+class AdmissionTicket:
+    def __init__(self, control: AdmissionControl):
+        self._control = control
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._control._release()
+
+
+admission = AdmissionControl(MAX_INFLIGHT_LLM, ADMISSION_TIMEOUT)
+# Session id -> (organization, history); a session is only served to the organization that started it.
+_histories: "OrderedDict[str, Tuple[Optional[ObjectId], ConversationHistory]]" = OrderedDict()
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    configure_from_env()
+    await run_db(ensure_indexes)
+    yield
+    await run_db(session_store.close)
+    await aclose_client()
+    close_db()
+    telemetry.close()
+
+
+app = FastAPI(title="LLM Tool Factory", lifespan=lifespan)
+
+
+def _organization(organization_id: Optional[str]) -> Optional[ObjectId]:
+    if organization_id is None:
+        return None
+    if not ObjectId.is_valid(organization_id):
+        raise HTTPException(status_code=400, detail="Invalid organization id.")
+    return ObjectId(organization_id)
+
+
+def _object_id(value: str, kind: str) -> str:
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=404, detail=f"{kind} not found.")
+    return value
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, dict):
+        return {("id" if k == "_id" else k): _jsonable(v) for k, v in value.items() if k != "tools"}
+    if isinstance(value, list):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+async def _settings_action(question: Dict[str, Any], organization_id: Optional[ObjectId]) -> Dict[str, Any]:
+    _, result, _, _ = await get_agent_graph(question=question, organization_id=organization_id)
+    return _jsonable(result[0])
+
+
+async def _scoped_action(question: Dict[str, Any], x_organization_id: Optional[str], kind: str) -> None:
+    """Run an action on an existing agent or connector; 404 when none of the organization's matched."""
+    result = await _settings_action(question, _organization(x_organization_id))
+    if not result.get("matched"):
+        raise HTTPException(status_code=404, detail=f"{kind} not found.")
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _session_history(session_id: Optional[str], organization_id: Optional[ObjectId]):
+    if session_id is None:
+        session_id = session_store.create()
+        history = ConversationHistory()
+    elif session_id in _histories:
+        org, history = _histories[session_id]
+        if org != organization_id:
+            raise HTTPException(status_code=404, detail="Session not found.")
+    else:
+        if not ObjectId.is_valid(session_id):
+            raise HTTPException(status_code=404, detail="Session not found.")
+        record = await run_db(session_store.load, session_id)
+        if record is None or record.org != organization_id:
+            raise HTTPException(status_code=404, detail="Session not found.")
+        history = ConversationHistory(record.turns)
+    _histories[session_id] = (organization_id, history)
+    _histories.move_to_end(session_id)
+    while len(_histories) > HISTORY_CACHE_SIZE:
+        _histories.popitem(last=False)
+    return session_id, history
+
+
+async def _chat_events(request: ChatRequest, organization_id: Optional[ObjectId], session_id: str, history: ConversationHistory, ticket: AdmissionTicket) -> AsyncIterator[str]:
+    deadline = time.monotonic() + REQUEST_TIMEOUT
+    turn, events = None, None
+    try:
+        graph, messages, agent_name, agent_id = await asyncio.wait_for(
+            get_agent_graph(request.question, organization_id, history, request.agent_id),
+            REQUEST_TIMEOUT,
+        )
+        yield _sse("meta", {"session_id": session_id, "agent_id": agent_id, "agent_name": agent_name})
+
+        turn = stream_turn(graph, messages)
+        events = turn.__aiter__()
+        while True:
+            try:
+                event = await asyncio.wait_for(events.__anext__(), max(0.0, deadline - time.monotonic()))
+            except StopAsyncIteration:
+                break
+            yield _sse(event.type, {k: v for k, v in vars(event).items() if v is not None and k != "type"})
+
+        entry = {"user": request.question, "assistant": turn.answer, "agent_id": agent_id, "agent_name": agent_name}
+        history.append(entry)
+        session_store.append(session_id, entry, org=organization_id)
+        yield _sse("done", {"answer": turn.answer, "metrics": turn.metrics.as_dict()})
+    except asyncio.TimeoutError:
+        yield _sse("timeout", {
+            "detail": f"The request exceeded {REQUEST_TIMEOUT:.0f}s and was stopped.",
+            "answer": turn.answer if turn else "",
+        })
+    except Exception as e:
+        yield _sse("error", {"detail": f"Error: {e}"})
+    finally:
+        # Also reached when the client disconnects mid-turn: stop the graph, its tools and the LLM stream.
+        if events is not None:
+            await events.aclose()
+        ticket.release()
+
+
+@app.post("/chat")
+async def chat(request: ChatRequest, x_organization_id: Optional[str] = Header(default=None)):
+    organization_id = _organization(x_organization_id)
+    ticket = await admission.acquire()
+    if ticket is None:
+        raise HTTPException(status_code=503, detail="Too many requests in flight.", headers={"Retry-After": "1"})
+    try:
+        session_id, history = await _session_history(request.session_id, organization_id)
+    except BaseException:
+        ticket.release()
+        raise
+    events = _chat_events(request, organization_id, session_id, history, ticket)
+    # A client that disconnects before the body starts streaming leaves the
+    # generator unstarted, so its finally never runs; release the slot when it is collected.
+    weakref.finalize(events, ticket.release)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _listing(action: str, prefix: str, page: int, limit: int) -> Dict[str, Any]:
+    return {"action": action, "prefix": prefix, "page": page, "limit": limit}
+
+
+@app.get("/agents")
+async def list_agents(
+    prefix: str = "",
+    page: int = Query(default=0, ge=0),
+    limit: int = Query(default=REGISTRY_PAGE_SIZE, ge=1, le=500),
+    x_organization_id: Optional[str] = Header(default=None),
+):
+    """One page of the organization's agents by name; prefix narrows to names starting with it."""
+    question = _listing("list_agents", prefix, page, limit)
+    return (await _settings_action(question, _organization(x_organization_id)))["agents"]
+
+
+@app.post("/agents", status_code=201)
+async def create_agent(body: AgentCreateRequest, x_organization_id: Optional[str] = Header(default=None)):
+    return await _settings_action({"action": "add_agent", **body.model_dump()}, _organization(x_organization_id))
+
+
+@app.patch("/agents/{agent_id}")
+async def update_agent(agent_id: str, body: AgentUpdateRequest, x_organization_id: Optional[str] = Header(default=None)):
+    fields = body.model_dump(exclude_none=True)
+    await _scoped_action({"action": "edit_agent", "agent_id": _object_id(agent_id, "Agent"), **fields}, x_organization_id, "Agent")
+    return {"agent_id": agent_id}
+
+
+@app.delete("/agents/{agent_id}", status_code=204)
+async def delete_agent(agent_id: str, x_organization_id: Optional[str] = Header(default=None)):
+    await _scoped_action({"action": "delete_agent", "agent_id": _object_id(agent_id, "Agent")}, x_organization_id, "Agent")
+
+
+@app.put("/agents/{agent_id}/connectors/{connector_id}", status_code=204)
+async def link_connector(agent_id: str, connector_id: str, x_organization_id: Optional[str] = Header(default=None)):
+    await _scoped_action({
+        "action": "link_connector",
+        "agent_id": _object_id(agent_id, "Agent"),
+        "connector_id": _object_id(connector_id, "Connector"),
+    }, x_organization_id, "Agent or connector")
+
+
+@app.delete("/agents/{agent_id}/connectors/{connector_id}", status_code=204)
+async def unlink_connector(agent_id: str, connector_id: str, x_organization_id: Optional[str] = Header(default=None)):
+    await _scoped_action({
+        "action": "unlink_connector",
+        "agent_id": _object_id(agent_id, "Agent"),
+        "connector_id": _object_id(connector_id, "Connector"),
+    }, x_organization_id, "Agent or connector")
+
+
+@app.get("/connectors")
+async def list_connectors(
+    prefix: str = "",
+    page: int = Query(default=0, ge=0),
+    limit: int = Query(default=REGISTRY_PAGE_SIZE, ge=1, le=500),
+    x_organization_id: Optional[str] = Header(default=None),
+):
+    question = _listing("list_connectors", prefix, page, limit)
+    return (await _settings_action(question, _organization(x_organization_id)))["connectors"]
+
+
+@app.post("/connectors", status_code=201)
+async def create_connector(body: ConnectorCreate, x_organization_id: Optional[str] = Header(default=None)):
+    question = {"action": "add_connector", "name": body.name, "type": body.connector_type, "settings": body.settings}
+    return await _settings_action(question, _organization(x_organization_id))
+
+
+@app.patch("/connectors/{connector_id}")
+async def update_connector(connector_id: str, body: ConnectorUpdate, x_organization_id: Optional[str] = Header(default=None)):
+    question = {"action": "edit_connector", "connector_id": _object_id(connector_id, "Connector"), **body.model_dump(exclude_none=True)}
+    await _scoped_action(question, x_organization_id, "Connector")
+    return {"connector_id": connector_id}
+
+
+@app.delete("/connectors/{connector_id}", status_code=204)
+async def delete_connector(connector_id: str, x_organization_id: Optional[str] = Header(default=None)):
+    await _scoped_action({"action": "delete_connector", "connector_id": _object_id(connector_id, "Connector")}, x_organization_id, "Connector")
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "admission": admission.stats(),
+        "streaming": streaming_metrics.stats(),
+        "history": history_metrics.stats(),
+        "graph_cache": agent_graph_cache.stats(),
+        "router": agent_router.stats(),
+        "registry": registry.stats(),
+        "response_cache": response_cache.stats(),
+        "sessions": session_store.stats(),
+        "telemetry": telemetry.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms in Prometheus text format; empty unless TELEMETRY_EXPORT is set."""
+    return PlainTextResponse(telemetry.render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,325 @@
+"""
+Persistent chat sessions with write-behind batching.
+
+A session is one document in llmtf.sessions holding its turns in order and a
+turn_count. Appending a turn only buffers it in memory. A background thread
+flushes the buffer as one bulk write every SESSION_FLUSH_INTERVAL seconds,
+or sooner once SESSION_FLUSH_TURNS turns are pending. close() flushes
+whatever is left and also runs at interpreter exit.
+
+Each flush of a session is conditioned on the turn_count it was built
+against, so retrying a flush whose outcome is unknown cannot duplicate
+turns. A crash loses at most the turns still in the buffer. Those are
+always the newest, so what is stored is a gap-free prefix of the
+conversation.
+
+The store tracks at most SESSION_STORE_SESSIONS sessions; past that, the
+least recently used ones with nothing to flush are dropped after a flush. A
+new session takes no space until its first turn. A turn appended to a
+session the store does not track, new or dropped, is buffered against an
+unknown turn_count: the next flush reads it, or creates the document when
+there is none.
+"""
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Union
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from db import collection
+from telemetry import warn
+
+FLUSH_INTERVAL = float(os.environ.get("SESSION_FLUSH_INTERVAL", 1.0))
+FLUSH_TURNS = int(os.environ.get("SESSION_FLUSH_TURNS", 50))
+HISTORY_TURNS = int(os.environ.get("SESSION_HISTORY_TURNS", 50))
+MAX_SESSIONS = int(os.environ.get("SESSION_STORE_SESSIONS", 10_000))
+
+SessionId = Union[str, ObjectId]
+
+
+def _session_key(session_id: SessionId) -> ObjectId:
+    return session_id if isinstance(session_id, ObjectId) else ObjectId(session_id)
+
+
+@dataclass
+class SessionRecord:
+    session_id: str
+    agent_id: Optional[str]
+    turns: List[Dict[str, Any]]
+    turn_count: int
+    org: Any = None
+
+
+@dataclass
+class _PendingSession:
+    # turn_count of the stored document that the pending turns follow; None until read back for a re-attached session.
+    base: Optional[int]
+    turns: List[Dict[str, Any]] = field(default_factory=list)
+    org: Any = None
+    created: bool = False
+
+
+class SessionStore:
+    def __init__(self, sessions_db, flush_interval: float = FLUSH_INTERVAL, flush_turns: int = FLUSH_TURNS, max_sessions: int = MAX_SESSIONS):
+        self.sessions_db = sessions_db
+        self.flush_interval = flush_interval
+        self.flush_turns = flush_turns
+        self.max_sessions = max_sessions
+        self._pending: "OrderedDict[ObjectId, _PendingSession]" = OrderedDict()
+        self._pending_turns = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.flushed_turns = 0
+        self.flush_errors = 0
+        self.evictions = 0
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="session-flusher", daemon=True)
+            self._thread.start()
+
+    def create(self) -> str:
+        """Id for a new session. Nothing is buffered until its first turn, whose flush writes the document."""
+        return str(ObjectId())
+
+    def append(self, session_id: SessionId, entry: Dict[str, Any], org: Any = None) -> None:
+        """Buffer one turn; it is persisted by the next flush. org is stored when the turn creates the session."""
+        session_key = _session_key(session_id)
+        turn = {**entry, "turn_id": ObjectId(), "created_at": datetime.now(timezone.utc).isoformat()}
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Session store is closed.")
+            pending = self._pending.get(session_key)
+            if pending is None:
+                # New, or dropped as idle since it was loaded; the next flush reads its turn_count.
+                self._pending[session_key] = pending = _PendingSession(base=None, org=org)
+            self._pending.move_to_end(session_key)
+            pending.turns.append(turn)
+            self._pending_turns += 1
+            self._ensure_thread()
+            if self._pending_turns >= self.flush_turns:
+                self._wake.notify()
+
+    def load(self, session_id: SessionId, last_n: int = HISTORY_TURNS) -> Optional[SessionRecord]:
+        """Load the newest last_n turns of a session, including turns still waiting to be flushed."""
+        session_key = _session_key(session_id)
+        projection: Dict[str, Any] = {"turn_count": 1, "agent_id": 1, "org": 1}
+        if last_n:
+            projection["turns"] = {"$slice": -last_n}
+        document = self.sessions_db.find_one({"_id": session_key}, projection)
+        with self._lock:
+            pending = self._pending.get(session_key)
+            if document is None and pending is None:
+                return None
+            stored_count = document.get("turn_count", 0) if document else 0
+            if pending is None:
+                self._pending[session_key] = pending = _PendingSession(base=stored_count)
+            self._pending.move_to_end(session_key)
+            turns = (document.get("turns", []) if document else []) + list(pending.turns)
+            turn_count = (stored_count if pending.base is None else pending.base) + len(pending.turns)
+        if last_n:
+            turns = turns[-last_n:]
+        agent_id = next((t.get("agent_id") for t in reversed(turns) if t.get("agent_id")), None)
+        if agent_id is None and document:
+            agent_id = document.get("agent_id")
+        org = document.get("org") if document else pending.org
+        return SessionRecord(session_id=str(session_key), agent_id=agent_id, turns=turns, turn_count=turn_count, org=org)
+
+    def _take_batch(self) -> Dict[ObjectId, _PendingSession]:
+        batch = {}
+        for session_key, pending in self._pending.items():
+            if pending.turns and pending.base is not None:
+                batch[session_key] = _PendingSession(base=pending.base, turns=pending.turns, org=pending.org, created=pending.created)
+                pending.base += len(pending.turns)
+                pending.turns = []
+                pending.created = False
+        self._pending_turns = sum(len(pending.turns) for pending in self._pending.values() if pending.base is None)
+        return batch
+
+    def _resolve_bases(self) -> None:
+        """
+        Read the stored turn_count of sessions appended to without one, so
+        their turns can be flushed; a session with no document is new.
+        """
+        with self._lock:
+            unknown = [session_key for session_key, pending in self._pending.items() if pending.base is None]
+        if not unknown:
+            return
+        try:
+            stored = {
+                d["_id"]: d.get("turn_count", 0)
+                for d in self.sessions_db.find({"_id": {"$in": unknown}}, {"turn_count": 1})
+            }
+        except PyMongoError as e:
+            with self._lock:
+                self.flush_errors += 1
+            warn("sessions.verify_failed", f"Could not read session turn counts, will retry: {e}")
+            return
+        with self._lock:
+            for session_key in unknown:
+                pending = self._pending.get(session_key)
+                if pending is not None and pending.base is None:
+                    pending.base = stored.get(session_key, 0)
+                    pending.created = session_key not in stored
+
+    def _evict_idle(self) -> None:
+        """Drop the least recently used sessions with nothing buffered until at most max_sessions remain."""
+        overflow = len(self._pending) - self.max_sessions
+        if overflow <= 0:
+            return
+        idle = [
+            session_key for session_key, pending in self._pending.items()
+            if not pending.turns and not pending.created and pending.base is not None
+        ][:overflow]
+        for session_key in idle:
+            del self._pending[session_key]
+        self.evictions += len(idle)
+
+    def _restore_batch(self, batch: Dict[ObjectId, _PendingSession]) -> None:
+        """Put unflushed turns back in front of anything appended since the batch was taken."""
+        for session_key, failed in batch.items():
+            pending = self._pending.setdefault(session_key, _PendingSession(base=failed.base))
+            pending.base = failed.base
+            pending.turns = failed.turns + pending.turns
+            pending.created = pending.created or failed.created
+            pending.org = pending.org if pending.org is not None else failed.org
+            self._pending_turns += len(failed.turns)
+
+    def _update(self, session_key: ObjectId, pending: _PendingSession, now: str) -> UpdateOne:
+        update: Dict[str, Any] = {
+            "$push": {"turns": {"$each": pending.turns}},
+            "$inc": {"turn_count": len(pending.turns)},
+            "$set": {"updated_at": now},
+        }
+        agent_id = next((t.get("agent_id") for t in reversed(pending.turns) if t.get("agent_id")), None)
+        if agent_id:
+            update["$set"]["agent_id"] = agent_id
+        if pending.created:
+            update["$setOnInsert"] = {"org": pending.org, "created_at": now}
+        return UpdateOne({"_id": session_key, "turn_count": pending.base}, update, upsert=pending.created)
+
+    def flush(self) -> int:
+        """Write every buffered turn in one bulk write. Returns the number of turns persisted."""
+        with self._flush_lock:
+            self._resolve_bases()
+            with self._lock:
+                batch = self._take_batch()
+            if not batch:
+                with self._lock:
+                    self._evict_idle()
+                return 0
+            now = datetime.now(timezone.utc).isoformat()
+            try:
+                self.sessions_db.bulk_write(
+                    [self._update(session_key, pending, now) for session_key, pending in batch.items()],
+                    ordered=False,
+                )
+            except BulkWriteError:
+                # Per-session outcomes are reconciled against turn_count below.
+                pass
+            except PyMongoError as e:
+                self.flush_errors += 1
+                warn("sessions.flush_failed", f"Session flush failed, will retry: {e}")
+                self._reconcile(batch)
+                return 0
+            return self._reconcile(batch)
+
+    def _landed_turn_ids(self, session_key: ObjectId, start: int, count: int) -> set:
+        document = self.sessions_db.find_one({"_id": session_key}, {"turns": {"$slice": [start, count]}})
+        return {turn.get("turn_id") for turn in (document or {}).get("turns", [])}
+
+    def _reconcile(self, batch: Dict[ObjectId, _PendingSession]) -> int:
+        """
+        Check each session's stored turn_count. Turns that landed are done;
+        the rest go back into the buffer, after whatever is now stored.
+        """
+        try:
+            stored = {
+                d["_id"]: d.get("turn_count", 0)
+                for d in self.sessions_db.find({"_id": {"$in": list(batch)}}, {"turn_count": 1})
+            }
+        except PyMongoError as e:
+            warn("sessions.verify_failed", f"Could not verify session flush, will retry: {e}")
+            with self._lock:
+                self._restore_batch(batch)
+            return 0
+
+        written, retry = 0, {}
+        for session_key, pending in batch.items():
+            count = stored.get(session_key)
+            if count == pending.base + len(pending.turns):
+                written += len(pending.turns)
+                continue
+            if count is None or count == pending.base:
+                retry[session_key] = pending
+                continue
+            # Part of this batch may have landed in an earlier flush whose outcome
+            # was unknown, and other writers may have appended; match by turn id.
+            try:
+                landed = self._landed_turn_ids(session_key, pending.base, count - pending.base)
+            except PyMongoError:
+                retry[session_key] = pending
+                continue
+            remaining = [turn for turn in pending.turns if turn["turn_id"] not in landed]
+            written += len(pending.turns) - len(remaining)
+            if remaining:
+                retry[session_key] = _PendingSession(base=count, turns=remaining, org=pending.org)
+
+        with self._lock:
+            if retry:
+                self._restore_batch(retry)
+                self.flush_errors += 1
+            self.flushes += 1
+            self.flushed_turns += written
+            self._evict_idle()
+        return written
+
+    def _run(self) -> None:
+        failed = False
+        while True:
+            with self._lock:
+                # After a failed flush, wait out the interval even if the buffer is over the threshold.
+                if not self._closed and (failed or self._pending_turns < self.flush_turns):
+                    self._wake.wait(self.flush_interval)
+                closed = self._closed
+            errors = self.flush_errors
+            self.flush()
+            failed = self.flush_errors != errors
+            if closed:
+                return
+
+    def close(self) -> None:
+        """Flush buffered turns and stop the background thread."""
+        with self._lock:
+            self._closed = True
+            self._wake.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        else:
+            self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pending_turns": self._pending_turns,
+                "sessions": len(self._pending),
+                "evictions": self.evictions,
+                "flushes": self.flushes,
+                "flushed_turns": self.flushed_turns,
+                "flush_errors": self.flush_errors,
+            }
+
+
+session_store = SessionStore(collection("sessions"))
+atexit.register(session_store.close)
@@ -0,0 +1,190 @@
+"""
+Token-level streaming of an agent turn with latency instrumentation.
+
+stream_turn runs a compiled agent graph with stream_mode="messages" and turns
+the raw message chunks into StreamEvents: text deltas, completed tool calls
+and tool results. While doing so it records time to first token, output
+tokens per second and total latency in TurnMetrics. The CLI prints these
+events; any other caller can consume the same iterator and read the final
+answer and metrics from the TurnStream once it is exhausted.
+"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from langchain_core.messages import AIMessageChunk, BaseMessage, ToolMessage
+
+from telemetry import observe
+
+METRICS_WINDOW = 1000
+
+
+@dataclass
+class StreamEvent:
+    type: str  # "token", "tool_call" or "tool_result"
+    content: str = ""
+    name: Optional[str] = None
+    args: Optional[Dict[str, Any]] = None
+    tool_call_id: Optional[str] = None
+
+
+@dataclass
+class TurnMetrics:
+    started_at: float = field(default_factory=time.perf_counter)
+    first_token_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    output_tokens: int = 0
+    tool_calls: int = 0
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        return None if self.first_token_at is None else self.first_token_at - self.started_at
+
+    @property
+    def latency(self) -> Optional[float]:
+        return None if self.finished_at is None else self.finished_at - self.started_at
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        if self.first_token_at is None or self.finished_at is None or self.finished_at <= self.first_token_at:
+            return None
+        return self.output_tokens / (self.finished_at - self.first_token_at)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "tokens_per_second": self.tokens_per_second,
+            "latency": self.latency,
+            "output_tokens": self.output_tokens,
+            "tool_calls": self.tool_calls,
+        }
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class StreamingMetrics:
+    """Rolling window of per-turn metrics for summary statistics."""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self._turns: Deque[TurnMetrics] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, metrics: TurnMetrics) -> None:
+        with self._lock:
+            self._turns.append(metrics)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            turns = list(self._turns)
+        ttft = [t.time_to_first_token for t in turns if t.time_to_first_token is not None]
+        latency = [t.latency for t in turns if t.latency is not None]
+        rates = [t.tokens_per_second for t in turns if t.tokens_per_second is not None]
+        return {
+            "turns": len(turns),
+            "ttft_p50": _percentile(ttft, 0.5),
+            "ttft_p95": _percentile(ttft, 0.95),
+            "latency_p50": _percentile(latency, 0.5),
+            "latency_p95": _percentile(latency, 0.95),
+            "tokens_per_second_avg": sum(rates) / len(rates) if rates else None,
+        }
+
+
+streaming_metrics = StreamingMetrics()
+
+
+def message_text(content: Any) -> str:
+    """Text of a message chunk; content may also be a list of typed parts."""
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+
+
+class TurnStream:
+    """
+    Async iterator of StreamEvents for one turn. The answer is the text of the
+    final AI message, assembled once from its deltas.
+    """
+
+    def __init__(self, graph: Any, messages: List[BaseMessage], config: Optional[Dict[str, Any]] = None):
+        self.graph = graph
+        self.messages = messages
+        self.config = config
+        self.metrics = TurnMetrics()
+        self.answer = ""
+        self._current: Optional[AIMessageChunk] = None
+        self._answer_parts: List[str] = []
+        self._reported_tokens = 0
+
+    def _finish_message(self) -> List[StreamEvent]:
+        """Close the AI message being streamed and emit any tool calls it made."""
+        message, self._current = self._current, None
+        if message is None:
+            return []
+        if message.usage_metadata:
+            self._reported_tokens += message.usage_metadata.get("output_tokens", 0)
+        events = []
+        for tool_call in message.tool_calls:
+            self.metrics.tool_calls += 1
+            events.append(StreamEvent(
+                type="tool_call",
+                name=tool_call["name"],
+                args=tool_call["args"],
+                tool_call_id=tool_call.get("id"),
+            ))
+        if message.tool_calls:
+            # Text before a tool call is thinking aloud, not the answer.
+            self._answer_parts = []
+        return events
+
+    async def __aiter__(self) -> AsyncIterator[StreamEvent]:
+        chunk_count = 0
+        stream = self.graph.astream({"messages": self.messages}, config=self.config, stream_mode="messages")
+        try:
+            async for message, _metadata in stream:
+                if isinstance(message, AIMessageChunk):
+                    if self._current is not None and message.id != self._current.id:
+                        for event in self._finish_message():
+                            yield event
+                    self._current = message if self._current is None else self._current + message
+                    delta = message_text(message.content)
+                    if delta:
+                        if self.metrics.first_token_at is None:
+                            self.metrics.first_token_at = time.perf_counter()
+                        chunk_count += 1
+                        self._answer_parts.append(delta)
+                        yield StreamEvent(type="token", content=delta)
+                    if message.response_metadata.get("finish_reason"):
+                        for event in self._finish_message():
+                            yield event
+                elif isinstance(message, ToolMessage):
+                    for event in self._finish_message():
+                        yield event
+                    yield StreamEvent(
+                        type="tool_result",
+                        content=message_text(message.content),
+                        name=message.name,
+                        tool_call_id=message.tool_call_id,
+                    )
+            for event in self._finish_message():
+                yield event
+        finally:
+            # Leaving the loop early does not close the graph's stream; close it so its tools and LLM call stop too.
+            await stream.aclose()
+            self.metrics.finished_at = time.perf_counter()
+            # Prefer the provider's token count; one streamed chunk is about one token otherwise.
+            self.metrics.output_tokens = self._reported_tokens or chunk_count
+            self.answer = "".join(self._answer_parts)
+            streaming_metrics.record(self.metrics)
+            observe("llm.time_to_first_token", self.metrics.time_to_first_token)
+            observe("turn.latency", self.metrics.latency)
+
+
+def stream_turn(graph: Any, messages: List[BaseMessage], config: Optional[Dict[str, Any]] = None) -> TurnStream:
+    return TurnStream(graph, messages, config)
@@ -0,0 +1,303 @@
+"""
+Lightweight spans and latency histograms for the agent pipeline.
+
+    with span("agent.routing") as s:
+        agent = await _route_question(question, agents)
+        s.set(agent=agent["name"])
+
+Every finished span adds its duration to a histogram keyed by the span name
+and its labels, and is linked to the span it ran inside, across awaits and
+run_db calls. Labels (keyword arguments to span) become Prometheus labels,
+so keep them low-cardinality, e.g. a tool name; anything else goes in set().
+
+Recoverable failures (a fallback taken, a write to retry) go through warn():
+a warning on the "llmtoolfactory" logger plus an event counter. Counters are
+kept even with no exporter configured, and show up in /stats and /metrics.
+
+TELEMETRY_EXPORT turns this on and picks where it goes, comma-separated:
+  prometheus  serve the histograms as Prometheus text on TELEMETRY_PROMETHEUS_PORT
+  jsonl       append every span as one JSON line to TELEMETRY_JSONL_PATH
+  memory      only keep the histograms, for /stats and /metrics on the server
+Left empty, span() returns a shared no-op object and nothing is recorded.
+Exporters start when an entry point calls configure_from_env() (the server's
+startup hook and the CLI's main), never on import, so importing this module
+binds no port and opens no file.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+TELEMETRY_EXPORT = os.environ.get("TELEMETRY_EXPORT", "")
+TELEMETRY_JSONL_PATH = os.environ.get("TELEMETRY_JSONL_PATH", "telemetry.jsonl")
+TELEMETRY_PROMETHEUS_PORT = int(os.environ.get("TELEMETRY_PROMETHEUS_PORT", 9464))
+METRIC_NAME = "llmtoolfactory_stage_seconds"
+EVENT_METRIC_NAME = "llmtoolfactory_events_total"
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+logger = logging.getLogger("llmtoolfactory")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("telemetry_span", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given fraction of observations."""
+        if not self.count:
+            return None
+        target, seen = fraction * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class Span:
+    __slots__ = ("_telemetry", "name", "labels", "attributes", "trace_id", "span_id", "parent_id", "started_at", "duration", "_start", "_token")
+
+    def __init__(self, telemetry: "Telemetry", name: str, labels: Labels):
+        self._telemetry = telemetry
+        self.name = name
+        self.labels = labels
+        self.attributes: Dict[str, Any] = {}
+        self.duration = 0.0
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        self.span_id = os.urandom(8).hex()
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.parent_id = parent.span_id if parent else None
+        self._token = _current_span.set(self)
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.duration = time.perf_counter() - self._start
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Exited from another context, e.g. an abandoned generator; nothing to restore.
+            pass
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self._telemetry._finish(self)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _label_text(name: str, labels: Labels, key: str = "stage") -> str:
+    def escape(value: Any) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{label}="{escape(value)}"' for label, value in [(key, name), *labels])
+
+
+class Telemetry:
+    def __init__(self):
+        self.enabled = False
+        self.exporters: List[str] = []
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._events: Dict[Tuple[str, Labels], int] = {}
+        self._lock = threading.Lock()
+        self._jsonl = None
+        self._http: Optional[ThreadingHTTPServer] = None
+        self.dropped = 0
+
+    def configure(self, exporters: Iterable[str], jsonl_path: str = TELEMETRY_JSONL_PATH, prometheus_port: int = TELEMETRY_PROMETHEUS_PORT) -> None:
+        """Replace the current exporters; an empty list turns recording off."""
+        self.close()
+        self.exporters = [e.strip() for e in exporters if e.strip()]
+        unknown = set(self.exporters) - {"prometheus", "jsonl", "memory"}
+        if unknown:
+            raise ValueError(f"Unknown telemetry exporter(s): {', '.join(sorted(unknown))}")
+        if "jsonl" in self.exporters:
+            self._jsonl = open(jsonl_path, "a", buffering=1)
+        if "prometheus" in self.exporters:
+            self._http = _serve_prometheus(self, prometheus_port)
+        self.enabled = bool(self.exporters)
+
+    def span(self, name: str, **labels: str):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, tuple(sorted(labels.items())))
+
+    def observe(self, name: str, seconds: Optional[float], **labels: str) -> None:
+        """Record a duration measured elsewhere, e.g. time to first token."""
+        if not self.enabled or seconds is None:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        self._record(key, seconds)
+        self._write({"type": "observation", "name": name, "labels": dict(key[1]), "seconds": seconds, "at": time.time()})
+
+    def count(self, name: str, **labels: str) -> None:
+        """Count one occurrence of an event; recorded whether or not an exporter is configured."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._events[key] = self._events.get(key, 0) + 1
+
+    def _record(self, key: Tuple[str, Labels], seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if self._jsonl is None:
+            return
+        line = json.dumps(record, default=str)
+        with self._lock:
+            try:
+                self._jsonl.write(line + "\n")
+            except (OSError, ValueError):
+                self.dropped += 1
+
+    def _finish(self, span: Span) -> None:
+        self._record((span.name, span.labels), span.duration)
+        self._write({
+            "type": "span",
+            "name": span.name,
+            "labels": dict(span.labels),
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "start": span.started_at,
+            "seconds": span.duration,
+            "attributes": span.attributes,
+        })
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            snapshot = [(key, list(h.counts), h.count, h.sum, h.buckets) for key, h in sorted(self._histograms.items())]
+            events = sorted(self._events.items())
+        lines = [
+            f"# HELP {METRIC_NAME} Time spent in each stage of the agent pipeline.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        for (name, labels), counts, count, total, buckets in snapshot:
+            label_text = _label_text(name, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{METRIC_NAME}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{METRIC_NAME}_sum{{{label_text}}} {total}")
+            lines.append(f"{METRIC_NAME}_count{{{label_text}}} {count}")
+        if events:
+            lines.append(f"# HELP {EVENT_METRIC_NAME} Recoverable failures and fallbacks, by event.")
+            lines.append(f"# TYPE {EVENT_METRIC_NAME} counter")
+            for (name, labels), count in events:
+                lines.append(f"{EVENT_METRIC_NAME}{{{_label_text(name, labels, key='event')}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            stages = {
+                name + (f"[{','.join(f'{k}={v}' for k, v in labels)}]" if labels else ""): {
+                    "count": h.count,
+                    "mean": h.sum / h.count if h.count else None,
+                    "p50_le": h.quantile(0.5),
+                    "p95_le": h.quantile(0.95),
+                }
+                for (name, labels), h in histograms
+            }
+            events = {
+                name + (f"[{','.join(f'{k}={v}' for k, v in labels)}]" if labels else ""): count
+                for (name, labels), count in sorted(self._events.items())
+            }
+        return {"enabled": self.enabled, "exporters": self.exporters, "dropped": self.dropped, "stages": stages, "events": events}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._events.clear()
+
+    def close(self) -> None:
+        self.enabled = False
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+        with self._lock:
+            jsonl, self._jsonl = self._jsonl, None
+        if jsonl is not None:
+            jsonl.close()
+
+
+def _serve_prometheus(telemetry: Telemetry, port: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = telemetry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=httpd.serve_forever, name="telemetry-prometheus", daemon=True).start()
+    return httpd
+
+
+telemetry = Telemetry()
+atexit.register(telemetry.close)
+
+
+def configure_from_env() -> None:
+    """Start the exporters listed in TELEMETRY_EXPORT; called once by each entry point."""
+    telemetry.configure(TELEMETRY_EXPORT.split(","))
+
+
+def warn(event: str, message: str, **labels: str) -> None:
+    """Log a recoverable failure and count it under event."""
+    telemetry.count(event, **labels)
+    logger.warning(message)
+
+
+span = telemetry.span
+observe = telemetry.observe
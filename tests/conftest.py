@@ -0,0 +1,26 @@
+"""
+Shared fixtures. The fakes in benchmarks/fakes.py stand in for OpenAI and
+MongoDB, so the suite runs offline.
+"""
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import pytest  # noqa: E402
+from bson import ObjectId  # noqa: E402
+
+import agent  # noqa: E402
+from benchmarks.fakes import InMemoryCollection, fake_chat_factory  # noqa: E402
+from graph_cache import agent_graph_cache  # noqa: E402
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    """One agent without connectors, stored in in-memory collections and answered by the fake chat model."""
+    document = {"_id": ObjectId(), "name": "Helper", "description": "Answers questions.", "model": "gpt-4o-mini", "org": None, "connector_ids": []}
+    monkeypatch.setattr(agent, "agents_db", InMemoryCollection([document]))
+    monkeypatch.setattr(agent, "connectors_db", InMemoryCollection())
+    monkeypatch.setattr(agent, "chat_model", fake_chat_factory(first_token_delay=0, token_delay=0))
+    agent_graph_cache.invalidate()
+    yield document
+    agent_graph_cache.invalidate()
@@ -0,0 +1,54 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import pytest
+
+import db
+
+LATENCY = 0.05
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_overlap_on_the_worker_pool():
+    loop_thread = threading.get_ident()
+    threads = set()
+
+    def blocking_call():
+        threads.add(threading.get_ident())
+        time.sleep(LATENCY)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(db.run_db(blocking_call) for _ in range(16)))
+    elapsed = time.perf_counter() - start
+
+    assert loop_thread not in threads
+    # Serialized, 16 calls would take 16 * LATENCY; allow a few rounds of overlap.
+    assert elapsed < 4 * LATENCY
+
+
+@pytest.mark.asyncio
+async def test_event_loop_keeps_running_during_a_call():
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+    ticker = asyncio.create_task(tick())
+    await db.run_db(time.sleep, 0.1)
+    ticker.cancel()
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_calls_see_the_callers_context_and_survive_close():
+    request = contextvars.ContextVar("request")
+    request.set("turn-1")
+
+    assert await db.run_db(request.get) == "turn-1"
+    db.close()
+    assert await db.run_db(request.get) == "turn-1"
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+import router
+import tools.pdf_source as pdf_source
+from benchmarks.fakes import HashingEmbeddings
+from tools.embedding_cache import CachedEmbeddings, lazy_openai_embeddings
+
+
+class ThreadRecordingStore:
+    """Wraps the SQLite tier and records the thread each call runs on."""
+
+    def __init__(self, store):
+        self.store = store
+        self.threads = []
+
+    def get(self, *args):
+        self.threads.append(threading.get_ident())
+        return self.store.get(*args)
+
+    def put(self, *args):
+        self.threads.append(threading.get_ident())
+        return self.store.put(*args)
+
+
+def test_a_modified_vector_does_not_change_the_cached_one():
+    cache = CachedEmbeddings(HashingEmbeddings())
+
+    first = cache.embed_query("How do I reset the pump?")
+    expected = list(first)
+    first[0] += 1.0
+    second = cache.embed_query("how do i reset the  pump?")
+    second[1] += 1.0
+
+    assert cache.embed_query("How do I reset the pump?") == expected
+    assert cache.stats()["memory_hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_async_lookups_use_the_disk_tier_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    writer = CachedEmbeddings(HashingEmbeddings(), disk_path=path)
+    writer._disk = ThreadRecordingStore(writer._disk)
+    vector = await writer.aembed_query("Where is the inlet seal?")
+
+    reader = CachedEmbeddings(HashingEmbeddings(), disk_path=path)
+    reader._disk = ThreadRecordingStore(reader._disk)
+    assert await reader.aembed_query("where is the inlet seal?") == vector
+    (await reader.aembed_query("Where is the inlet seal?"))[0] += 1.0
+
+    assert await reader.aembed_query("Where is the inlet seal?") == vector
+    assert reader.stats()["disk_hits"] == 1 and reader.stats()["memory_hits"] == 2
+    loop_thread = threading.get_ident()
+    assert writer._disk.threads and reader._disk.threads
+    assert loop_thread not in writer._disk.threads + reader._disk.threads
+
+
+def test_callers_share_one_lazily_built_cache():
+    shared = lazy_openai_embeddings()
+    assert shared is lazy_openai_embeddings()
+    assert router.agent_router.embeddings is shared
+    assert pdf_source.embedding_model is shared
@@ -0,0 +1,67 @@
+import pytest
+
+import agent
+from history import ConversationHistory, _transcript, count_tokens, history_metrics
+
+
+def _turns(count: int):
+    return [{"user": f"question {i} " + "word " * 40, "assistant": f"answer {i} " + "word " * 40} for i in range(count)]
+
+
+def _recording_summarizer(calls):
+    async def summarize(summary, entries, max_tokens):
+        calls.append(len(entries))
+        return f"{summary} summary of {len(entries)} turns".strip()
+    return summarize
+
+
+@pytest.mark.asyncio
+async def test_summary_survives_into_the_next_turn(fake_agent):
+    agent.agents_db.update_one({"_id": fake_agent["_id"]}, {"$set": {"history_token_budget": 400}})
+    calls = []
+    history = ConversationHistory(_turns(10), summarizer=_recording_summarizer(calls))
+
+    _, messages, _, _ = await agent.get_agent_graph("first", None, history, str(fake_agent["_id"]))
+    await history.wait_for_summary()
+    assert calls and history.summary
+    assert not any("Summary of the earlier conversation" in m.content for m in messages)
+
+    history.append({"user": "first", "assistant": "reply"})
+    _, messages, _, _ = await agent.get_agent_graph("second", None, history, str(fake_agent["_id"]))
+    assert "Summary of the earlier conversation" in messages[1].content
+    assert history.summary in messages[1].content
+
+
+@pytest.mark.asyncio
+async def test_plain_list_history_is_not_summarized(fake_agent):
+    agent.agents_db.update_one({"_id": fake_agent["_id"]}, {"$set": {"history_token_budget": 400}})
+    summaries = history_metrics.summaries + history_metrics.summary_failures
+
+    _, messages, _, _ = await agent.get_agent_graph("first", None, _turns(10), str(fake_agent["_id"]))
+
+    assert history_metrics.summaries + history_metrics.summary_failures == summaries
+    assert 1 < len(messages) < 2 + 2 * 10
+
+
+@pytest.mark.asyncio
+async def test_failed_first_summary_keeps_the_latest_dropped_turns():
+    async def failing(summary, entries, max_tokens):
+        raise RuntimeError("model unavailable")
+
+    history = ConversationHistory(_turns(10), summarizer=failing)
+    window = history.window("gpt-4o-mini", 400)
+    await history.wait_for_summary()
+
+    assert history.summarized_upto == len(history) - len(window.entries)
+    assert history.summary.endswith(history.entries[history.summarized_upto - 1]["assistant"])
+    window = history.window("gpt-4o-mini", 400)
+    await history.wait_for_summary()
+    assert window.summary == history.summary and window.tokens <= 400
+
+
+def test_transcript_fallback_never_exceeds_its_budget():
+    entries = [{"user": "question " * 50, "assistant": "answer " * 2000}]
+
+    assert _transcript(entries, 0, "o200k_base") == ""
+    tail = _transcript(entries, 100, "o200k_base")
+    assert tail.startswith("...answer") and count_tokens(tail, "o200k_base") <= 110
@@ -0,0 +1,34 @@
+import numpy as np
+
+import tools.pdf_ann as pdf_ann
+from benchmarks.ann_recall import make_document
+from tools.similarity import build_embedding_matrix, search
+
+TOP_K = 3
+# Measured 0.98 on this fixture at the default nprobe.
+RECALL_FLOOR = 0.95
+
+
+def test_recall_at_k_against_exact_search(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_ann, "ANN_INDEX_DIR", str(tmp_path))
+    document, queries = make_document(20_000, 256)
+    matrix, _ = build_embedding_matrix(document["chunks"])
+
+    pdf_ann.build_index("recall", document, matrix, np.arange(matrix.shape[0]))
+    index = pdf_ann.load_index("recall", document)
+
+    exact = [{row for row, _ in search(matrix, query, TOP_K, -1.0)} for query in queries]
+    approximate = [{position for position, _ in index.search(query, TOP_K, -1.0)} for query in queries]
+    recall = np.mean([len(a & e) / len(e) for a, e in zip(approximate, exact)])
+    assert recall >= RECALL_FLOOR, f"recall@{TOP_K} {recall:.3f} at nprobe {pdf_ann.DEFAULT_NPROBE}"
+
+
+def test_index_for_another_version_is_not_loaded(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_ann, "ANN_INDEX_DIR", str(tmp_path))
+    document, _ = make_document(2_000, 16)
+    matrix, _ = build_embedding_matrix(document["chunks"])
+
+    pdf_ann.build_index("stale", document, matrix, np.arange(matrix.shape[0]))
+
+    assert pdf_ann.load_index("stale", document) is not None
+    assert pdf_ann.load_index("stale", {**document, "version": 2}) is None
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+from bson import ObjectId
+
+import tools.pdf_source as pdf_source
+from benchmarks.fakes import HashingEmbeddings, InMemoryCollection
+from benchmarks.pdf_hybrid import make_manual
+from benchmarks.suite import EMBEDDING_SIZE
+from tools.pdf_cache import document_cache
+from tools.pdf_lexical import lexical_cache
+from tools.pdf_source import get_pdf_source_tool
+
+
+@pytest.fixture
+def manuals(monkeypatch):
+    """Two documents of overlapping chunk windows, tagged "manuals", as (document id, identifier questions) pairs."""
+    embedder = HashingEmbeddings(size=EMBEDDING_SIZE)
+    knowledge_db, chunks_db = InMemoryCollection(), InMemoryCollection(index="document_id")
+    rng = random.Random(0)
+    documents = [make_manual(knowledge_db, chunks_db, 400, embedder, rng)[:2] for _ in range(2)]
+    knowledge_db.update_many({}, {"$set": {"tags": ["manuals"]}})
+    for name, value in (("knowledge_db", knowledge_db), ("chunks_db", chunks_db), ("embedding_model", embedder)):
+        monkeypatch.setattr(pdf_source, name, value)
+    document_cache.clear()
+    lexical_cache.clear()
+    yield documents
+    document_cache.clear()
+    lexical_cache.clear()
+
+
+def _window_pairs(document_id):
+    """Each chunk and the copy of it shifted by one sentence."""
+    chunks = pdf_source.chunks_db.find({"document_id": ObjectId(document_id)}, {"ordinal": 1, "text": 1}).sort("ordinal")
+    windows = [chunk["text"] for chunk in chunks]
+    return list(zip(windows[0::2], windows[1::2]))
+
+
+def _duplicates(answers, pairs):
+    return sum(first in answer and second in answer for answer in answers for first, second in pairs)
+
+
+def test_single_document_finds_identifiers_without_overlapping_windows(manuals):
+    document_id, identifiers = manuals[0]
+    tool = get_pdf_source_tool({"document_id": document_id, "retrieval": "hybrid"}, "source_pdf_manual")
+
+    answers = [tool.func(query=question) for question, _ in identifiers]
+
+    assert [part for _, part in identifiers] == [part for (_, part), answer in zip(identifiers, answers) if part in answer]
+    assert _duplicates(answers, _window_pairs(document_id)) == 0
+
+
+@pytest.mark.asyncio
+async def test_library_applies_hybrid_retrieval_across_documents(manuals):
+    tool = get_pdf_source_tool({"tag": "manuals", "retrieval": "hybrid"}, "source_pdf_manuals")
+    identifiers = [pair for _, document_identifiers in manuals for pair in document_identifiers]
+    pairs = [pair for document_id, _ in manuals for pair in _window_pairs(document_id)]
+
+    answers = [await tool.coroutine(query=question) for question, _ in identifiers]
+
+    assert [part for _, part in identifiers] == [part for (_, part), answer in zip(identifiers, answers) if part in answer]
+    assert _duplicates(answers, pairs) == 0
+    assert tool.func(query=identifiers[0][0]) == answers[0]
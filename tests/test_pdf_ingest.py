@@ -0,0 +1,125 @@
+from types import SimpleNamespace
+
+import pytest
+
+import tools.pdf_ingest as pdf_ingest
+from benchmarks.fakes import HashingEmbeddings, InMemoryCollection
+
+PAGES = 40
+BATCH_SIZE = 4
+CONCURRENCY = 2
+
+
+class StubPage:
+    def __init__(self, number, reads):
+        self.number = number
+        self.reads = reads
+
+    def extract_text(self):
+        self.reads.append(self.number)
+        return " ".join(f"page{self.number}word{i}" for i in range(300))
+
+
+class StubReader:
+    """Stands in for pypdf's PdfReader; records the order pages are read in."""
+
+    reads = []
+
+    def __init__(self, path):
+        self.pages = [StubPage(number, StubReader.reads) for number in range(PAGES)]
+
+
+class FailingEmbeddings(HashingEmbeddings):
+    def __init__(self, fail_on_call, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_on_call = fail_on_call
+
+    def embed_documents(self, texts):
+        if self.calls + 1 == self.fail_on_call:
+            raise ConnectionError("embedding API went away")
+        return super().embed_documents(texts)
+
+
+class RecordingChunks(InMemoryCollection):
+    def __init__(self):
+        super().__init__(index="document_id")
+        self.inserts = []
+
+    def insert_many(self, documents, ordered=True):
+        documents = list(documents)
+        self.inserts.append(len(documents))
+        return super().insert_many(documents, ordered)
+
+
+@pytest.fixture
+def pdf(monkeypatch, tmp_path):
+    StubReader.reads = []
+    monkeypatch.setattr(pdf_ingest, "PdfReader", StubReader)
+    path = tmp_path / "manual.pdf"
+    path.write_bytes(b"%PDF-1.4 stub")
+    return str(path)
+
+
+def _ingest(path, embedder, knowledge_db, chunks_db):
+    return pdf_ingest.ingest_pdf(
+        path, embedder, knowledge_db, chunks_db,
+        batch_size=BATCH_SIZE, concurrency=CONCURRENCY, chunk_size=500, chunk_overlap=100, progress=False,
+    )
+
+
+def _chunks(chunks_db):
+    return [(chunk["ordinal"], chunk["page"], chunk["text"]) for chunk in chunks_db.find({}).sort("ordinal")]
+
+
+def test_interrupted_ingest_resumes_without_duplicate_or_missing_chunks(pdf):
+    expected_db = InMemoryCollection(index="document_id")
+    _ingest(pdf, HashingEmbeddings(size=64), InMemoryCollection(), expected_db)
+
+    knowledge_db, chunks_db = InMemoryCollection(), RecordingChunks()
+    with pytest.raises(ConnectionError):
+        _ingest(pdf, FailingEmbeddings(fail_on_call=20, size=64), knowledge_db, chunks_db)
+    interrupted = knowledge_db.find_one({})["ingest"]
+    assert interrupted["status"] == "in_progress" and 0 < interrupted["pages_done"] < PAGES
+
+    stats = _ingest(pdf, HashingEmbeddings(size=64), knowledge_db, chunks_db)
+
+    assert stats.resumed_from_page == interrupted["pages_done"]
+    assert _chunks(chunks_db) == _chunks(expected_db)
+    document = knowledge_db.find_one({})
+    assert document["ingest"]["status"] == "complete"
+    assert document["chunk_count"] == len(_chunks(expected_db))
+    assert max(chunks_db.inserts) <= BATCH_SIZE
+
+
+def test_pages_are_read_only_a_few_batches_ahead_of_the_writes(pdf, monkeypatch):
+    chunks_db = RecordingChunks()
+    stored_at_read = {}
+    original = StubPage.extract_text
+
+    def extract_text(page):
+        stored_at_read[page.number] = len(chunks_db.documents)
+        return original(page)
+
+    monkeypatch.setattr(StubPage, "extract_text", extract_text)
+    _ingest(pdf, HashingEmbeddings(size=64), InMemoryCollection(), chunks_db)
+
+    pages = [page for _, page, _ in _chunks(chunks_db)]
+    assert sorted(set(pages)) == list(range(PAGES))
+    # Besides the batch being filled, at most CONCURRENCY batches are embedded or waiting to be written.
+    for number, stored in stored_at_read.items():
+        assert sum(page < number for page in pages) - stored <= (CONCURRENCY + 1) * BATCH_SIZE
+
+
+def test_ann_build_is_skipped_for_a_document_without_chunks(monkeypatch, tmp_path, capsys):
+    class EmptyReader:
+        def __init__(self, path):
+            self.pages = [SimpleNamespace(extract_text=lambda: "")]
+
+    monkeypatch.setattr(pdf_ingest, "PdfReader", EmptyReader)
+    database = SimpleNamespace(embeddings=InMemoryCollection(), chunks=InMemoryCollection(index="document_id"))
+    monkeypatch.setattr(pdf_ingest, "get_database", lambda: database)
+    path = tmp_path / "blank.pdf"
+    path.write_bytes(b"%PDF-1.4 blank")
+
+    assert pdf_ingest.main([str(path), "--embedder", "fake", "--ann"]) == 0
+    assert "no ANN index was built" in capsys.readouterr().out
@@ -0,0 +1,115 @@
+import random
+
+import numpy as np
+import pytest
+
+import tools.pdf_source as pdf_source
+import tools.pdf_store as pdf_store
+from benchmarks.ann_recall import make_document
+from benchmarks.fakes import HashingEmbeddings, InMemoryCollection
+from benchmarks.pdf_hybrid import SYLLABLES
+from tools.pdf_source import get_pdf_source_tool
+from tools.pdf_store import measure_recall, migrate_document
+from tools.similarity import build_embedding_matrix, quantize_int8
+
+QUERIES = ["replace the pump seal", "drain the coolant loop", "reset the control panel"]
+
+
+def _matrix():
+    document, _ = make_document(5_000, 256)
+    return build_embedding_matrix(document["chunks"])[0]
+
+
+def test_int8_recall_holds_without_the_self_match():
+    exact = _matrix()
+    quantized, scales = quantize_int8(exact)
+
+    assert measure_recall(exact, quantized, scales, k=3) >= 0.95
+    assert measure_recall(exact, exact, None, k=3) == 1.0
+
+
+def test_quantization_that_only_keeps_each_chunk_nearest_itself_scores_low():
+    exact = _matrix()
+    noise = np.random.default_rng(1).standard_normal(exact.shape).astype(np.float32)
+    # Every row is still closest to its own chunk, but its neighbours are scrambled.
+    scrambled = exact + 3 * noise / np.linalg.norm(noise, axis=1, keepdims=True)
+
+    # Counting the query's own chunk would put recall@3 at 1/3 or more.
+    assert measure_recall(exact, scrambled, None, k=3) < 0.2
+
+
+
+class FailingChunks(InMemoryCollection):
+    """Fails the insert after fail_after successful ones, as a lost connection would; None never fails."""
+
+    def __init__(self, fail_after):
+        super().__init__(index="document_id")
+        self.fail_after = fail_after
+
+    def insert_many(self, documents, ordered=True):
+        if self.fail_after is not None:
+            if self.fail_after == 0:
+                raise ConnectionError("connection lost")
+            self.fail_after -= 1
+        return super().insert_many(documents, ordered)
+
+
+@pytest.fixture
+def legacy_pdf(monkeypatch):
+    """A document in the legacy shape, its chunks inline, and the PDF tool reading it."""
+    rng = random.Random(0)
+    vocabulary = ["".join(rng.choice(SYLLABLES) for _ in range(3)) for _ in range(500)]
+    texts = [" ".join(rng.choice(vocabulary) for _ in range(20)) for _ in range(120)] + QUERIES
+    embedder = HashingEmbeddings(size=256)
+    chunks = [{"text": text, "embedding": vector, "page": i // 10} for i, (text, vector) in enumerate(zip(texts, embedder.embed_documents(texts)))]
+    knowledge_db = InMemoryCollection()
+    document_id = knowledge_db.insert_one({"name": "manual.pdf", "version": 1, "updated_at": "2024-01-01T00:00:00+00:00", "chunks": chunks}).inserted_id
+    monkeypatch.setattr(pdf_store, "MIGRATION_BATCH_SIZE", 50)
+    for name, value in (("knowledge_db", knowledge_db), ("embedding_model", embedder)):
+        monkeypatch.setattr(pdf_source, name, value)
+    tool = get_pdf_source_tool({"document_id": str(document_id)}, "source_pdf")
+    return knowledge_db, document_id, chunks, tool
+
+
+def _stored(chunks_db):
+    return [(chunk["ordinal"], chunk["text"], chunk.get("page")) for chunk in chunks_db.find({}).sort("ordinal")]
+
+
+def test_migrated_document_answers_as_before(legacy_pdf, monkeypatch):
+    knowledge_db, document_id, chunks, tool = legacy_pdf
+    before = [tool.func(query=query) for query in QUERIES]
+    chunks_db = InMemoryCollection(index="document_id")
+    monkeypatch.setattr(pdf_source, "chunks_db", chunks_db)
+
+    assert migrate_document(knowledge_db, chunks_db, document_id) == len(chunks)
+
+    document = knowledge_db.find_one({"_id": document_id})
+    assert document["layout"] == "chunked" and "chunks" not in document
+    assert document["chunk_count"] == len(chunks) and document["version"] == 2
+    assert _stored(chunks_db) == [(i, chunk["text"], chunk["page"]) for i, chunk in enumerate(chunks)]
+    assert [tool.func(query=query) for query in QUERIES] == before
+
+    # Migrating again is a no-op.
+    assert migrate_document(knowledge_db, chunks_db, document_id) == 0
+    assert _stored(chunks_db) == [(i, chunk["text"], chunk["page"]) for i, chunk in enumerate(chunks)]
+
+
+def test_interrupted_migration_keeps_the_inline_chunks_until_it_is_rerun(legacy_pdf, monkeypatch):
+    knowledge_db, document_id, chunks, tool = legacy_pdf
+    before = [tool.func(query=query) for query in QUERIES]
+    chunks_db = FailingChunks(fail_after=1)
+    monkeypatch.setattr(pdf_source, "chunks_db", chunks_db)
+
+    with pytest.raises(ConnectionError):
+        migrate_document(knowledge_db, chunks_db, document_id)
+
+    # Half the chunks are in the collection, but the document still reads from its inline ones.
+    assert len(_stored(chunks_db)) == 50
+    document = knowledge_db.find_one({"_id": document_id})
+    assert document.get("layout") != "chunked" and len(document["chunks"]) == len(chunks)
+    assert [tool.func(query=query) for query in QUERIES] == before
+
+    chunks_db.fail_after = None
+    assert migrate_document(knowledge_db, chunks_db, document_id) == len(chunks)
+    assert _stored(chunks_db) == [(i, chunk["text"], chunk["page"]) for i, chunk in enumerate(chunks)]
+    assert [tool.func(query=query) for query in QUERIES] == before
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from bson import ObjectId
+
+import agent
+import tools.pdf_source as pdf_source
+from benchmarks.fakes import HashingEmbeddings, InMemoryCollection
+from benchmarks.suite import EMBEDDING_SIZE, chat_factory, make_document
+from graph_cache import agent_graph_cache
+from response_cache import response_cache
+from streaming import stream_turn
+
+QUESTION = "How do I replace the pump?"
+
+
+@pytest.fixture
+def cached_pdf_agent(monkeypatch):
+    """An agent with the response cache on and one PDF connector over an in-memory document."""
+    embedder = HashingEmbeddings(size=EMBEDDING_SIZE)
+    knowledge_db, chunks_db = InMemoryCollection(), InMemoryCollection(index="document_id")
+    document_id = make_document(knowledge_db, chunks_db, 50, embedder, np.random.default_rng(0))
+    connector = {"_id": ObjectId(), "name": "Manual", "connector_type": "source_pdf", "settings": {"document_id": str(document_id)}}
+    document = {
+        "_id": ObjectId(), "name": "Maintenance", "description": "Answers maintenance questions.", "model": "gpt-4o-mini",
+        "org": None, "connector_ids": [connector["_id"]], "response_cache": True,
+    }
+    monkeypatch.setattr(agent, "agents_db", InMemoryCollection([document]))
+    monkeypatch.setattr(agent, "connectors_db", InMemoryCollection([connector]))
+    monkeypatch.setattr(agent, "chat_model", chat_factory("source_pdf_manual", 0, 0))
+    for name, value in (("knowledge_db", knowledge_db), ("chunks_db", chunks_db), ("embedding_model", embedder)):
+        monkeypatch.setattr(pdf_source, name, value)
+    monkeypatch.setattr(response_cache, "embeddings", embedder)
+    agent_graph_cache.invalidate()
+    response_cache.invalidate()
+    yield str(document["_id"]), knowledge_db, document_id
+    agent_graph_cache.invalidate()
+    response_cache.invalidate()
+
+
+async def _hit(agent_id: str) -> bool:
+    hits = response_cache.hits
+    graph, messages, _, _ = await agent.get_agent_graph(QUESTION, None, [], agent_id)
+    stream = stream_turn(graph, messages)
+    async for _ in stream:
+        pass
+    assert stream.answer
+    return response_cache.hits > hits
+
+
+@pytest.mark.asyncio
+async def test_reingested_document_invalidates_cached_answers(cached_pdf_agent):
+    agent_id, knowledge_db, document_id = cached_pdf_agent
+
+    assert not await _hit(agent_id)
+    assert await _hit(agent_id)
+
+    knowledge_db.update_one({"_id": document_id}, {"$inc": {"version": 1}})
+    assert not await _hit(agent_id)
+    assert await _hit(agent_id)
+
+
+@pytest.mark.asyncio
+async def test_connector_edit_invalidates_cached_answers(cached_pdf_agent):
+    agent_id, _, document_id = cached_pdf_agent
+
+    assert not await _hit(agent_id)
+    connector_id = str(agent.connectors_db.find_one({})["_id"])
+    await agent.get_agent_graph({"action": "edit_connector", "connector_id": connector_id, "settings": {"document_id": str(document_id), "timeout": 20}}, None)
+    assert not await _hit(agent_id)
+
+
+class FailingEmbeddings(HashingEmbeddings):
+    async def aembed_query(self, text):
+        raise TimeoutError("embedding request timed out")
+
+
+@pytest.mark.asyncio
+async def test_embedding_failure_skips_the_cache_instead_of_failing_the_turn(cached_pdf_agent, monkeypatch):
+    agent_id, _, _ = cached_pdf_agent
+    monkeypatch.setattr(response_cache, "embeddings", FailingEmbeddings(size=EMBEDDING_SIZE))
+    before = response_cache.stats()
+
+    assert not await _hit(agent_id)
+
+    after = response_cache.stats()
+    assert after["skipped_for_errors"] == before["skipped_for_errors"] + 1
+    assert after["skipped_for_history"] == before["skipped_for_history"]
+    assert after["misses"] == before["misses"]
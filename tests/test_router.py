@@ -0,0 +1,34 @@
+import json
+
+import pytest
+from bson import ObjectId
+
+from benchmarks.fakes import HashingEmbeddings
+from benchmarks.router_accuracy import FIXTURE
+from router import AgentRouter
+
+# The offline embedder scores 0.86 top-1 and 0.90 when confident on the labelled questions.
+ACCURACY_FLOOR = 0.8
+CONFIDENT_ACCURACY_FLOOR = 0.85
+CONFIDENT_SHARE_FLOOR = 0.7
+
+
+@pytest.fixture(scope="module")
+def labelled():
+    with open(FIXTURE) as f:
+        fixture = json.load(f)
+    return [{"_id": ObjectId(), **agent} for agent in fixture["agents"]], fixture["questions"]
+
+
+@pytest.mark.asyncio
+async def test_routing_accuracy_on_the_labelled_questions(labelled):
+    agents, questions = labelled
+    router = AgentRouter(HashingEmbeddings())
+
+    decisions = [await router.route(item["question"], agents) for item in questions]
+
+    correct = [d.agent["name"] == item["agent"] for d, item in zip(decisions, questions)]
+    confident_correct = [ok for ok, d in zip(correct, decisions) if d.confident]
+    assert sum(correct) / len(correct) >= ACCURACY_FLOOR
+    assert len(confident_correct) / len(decisions) >= CONFIDENT_SHARE_FLOOR
+    assert sum(confident_correct) / len(confident_correct) >= CONFIDENT_ACCURACY_FLOOR
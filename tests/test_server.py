@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessageChunk
+
+import agent
+import server
+from benchmarks.fakes import InMemoryCollection
+from sessions import SessionStore
+
+
+class SlowGraph:
+    """Streams one token, then stalls; records whether its stream was closed."""
+
+    def __init__(self):
+        self.closed = False
+
+    async def astream(self, inputs, config=None, **kwargs):
+        try:
+            yield AIMessageChunk(content="partial", id="slow"), {}
+            await asyncio.sleep(60)
+        finally:
+            self.closed = True
+
+
+@pytest.fixture
+def slow_turn(monkeypatch):
+    graph = SlowGraph()
+
+    async def get_agent_graph(question, organization_id, history, agent_id):
+        return graph, [], "Slow", "slow-agent"
+
+    monkeypatch.setattr(server, "get_agent_graph", get_agent_graph)
+    monkeypatch.setattr(server, "REQUEST_TIMEOUT", 0.2)
+    return graph
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "session_store", SessionStore(InMemoryCollection()))
+    monkeypatch.setattr(server, "_histories", server.OrderedDict())
+    return TestClient(server.app)
+
+
+def _chat(client, organization_id, **body):
+    response = client.post("/chat", json={"question": "How do I reset it?", **body}, headers={"X-Organization-Id": str(organization_id)})
+    if response.status_code != 200:
+        return response.status_code, None
+    meta = next(line for line in response.text.splitlines() if line.startswith("data: "))
+    return response.status_code, json.loads(meta[len("data: "):])
+
+
+def test_chat_does_not_run_another_organizations_agent(client, fake_agent):
+    owner, other = ObjectId(), ObjectId()
+    agent.agents_db.update_one({"_id": fake_agent["_id"]}, {"$set": {"org": owner}})
+    agent_id = str(fake_agent["_id"])
+
+    _, meta = _chat(client, owner, agent_id=agent_id)
+    assert meta["agent_name"] == "Helper"
+    # The owner's turn left the agent's graph in the cache; it must not be served to the other organization either.
+    _, meta = _chat(client, other, agent_id=agent_id)
+    assert meta["agent_name"] == "Generalist" and meta["agent_id"] is None
+
+
+def test_chat_does_not_resume_another_organizations_session(client, fake_agent):
+    owner, other = ObjectId(), ObjectId()
+    status, meta = _chat(client, owner)
+    assert status == 200
+    session_id = meta["session_id"]
+
+    assert _chat(client, other, session_id=session_id)[0] == 404
+    server.session_store.flush()
+    server._histories.clear()
+    assert _chat(client, other, session_id=session_id)[0] == 404
+    assert _chat(client, owner, session_id=session_id)[0] == 200
+
+
+@pytest.mark.asyncio
+async def test_admission_rejects_callers_beyond_the_limit_after_the_timeout():
+    control = server.AdmissionControl(limit=2, timeout=0.05)
+    tickets = [await control.acquire(), await control.acquire()]
+
+    assert await control.acquire() is None
+    assert control.stats()["rejected"] == 1
+    tickets[0].release()
+    tickets[0].release()
+    assert await control.acquire() is not None
+    assert control.in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_turn_past_the_deadline_ends_with_a_timeout_event(slow_turn):
+    control = server.AdmissionControl(limit=1, timeout=0.05)
+    ticket = await control.acquire()
+    request = server.ChatRequest(question="anything")
+
+    events = [event async for event in server._chat_events(request, None, "session", server.ConversationHistory(), ticket)]
+
+    assert events[0].startswith("event: meta")
+    assert events[-1].startswith("event: timeout") and '"answer": "partial"' in events[-1]
+    assert slow_turn.closed
+    assert control.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_closes_the_turn(slow_turn, monkeypatch):
+    monkeypatch.setattr(server, "REQUEST_TIMEOUT", 60)
+    control = server.AdmissionControl(limit=1, timeout=0.05)
+    ticket = await control.acquire()
+    stream = server._chat_events(server.ChatRequest(question="anything"), None, "session", server.ConversationHistory(), ticket)
+
+    assert (await stream.__anext__()).startswith("event: meta")
+    assert (await stream.__anext__()).startswith("event: token")
+    await stream.aclose()
+
+    assert slow_turn.closed
+    assert control.in_flight == 0
@@ -0,0 +1,13 @@
+import logging
+
+import pytest
+
+from benchmarks.session_crash import run_round
+
+
+@pytest.mark.parametrize("seeds", [range(0, 100), range(100, 200)])
+def test_stored_sessions_are_a_gap_free_prefix_after_a_crash(seeds, caplog):
+    # Every injected write failure is reported; they are the point here.
+    caplog.set_level(logging.ERROR, logger="llmtoolfactory")
+    for seed in seeds:
+        run_round(seed)
@@ -0,0 +1,53 @@
+from benchmarks.fakes import InMemoryCollection
+from sessions import SessionStore
+
+
+def _turn(text):
+    return {"user": text, "assistant": text.upper()}
+
+
+def test_idle_sessions_are_evicted_after_a_flush():
+    store = SessionStore(InMemoryCollection(), max_sessions=2)
+    session_ids = [store.create() for _ in range(5)]
+    for session_id in session_ids:
+        store.append(session_id, _turn(f"{session_id} first"))
+
+    store.flush()
+
+    assert store.stats()["sessions"] == 2
+    assert store.stats()["evictions"] == 3
+
+
+def test_turns_appended_to_an_evicted_session_follow_the_stored_ones():
+    sessions_db = InMemoryCollection()
+    store = SessionStore(sessions_db, max_sessions=1)
+    first, second = store.create(), store.create()
+    store.append(first, _turn("one"))
+    store.append(second, _turn("other"))
+    store.flush()
+
+    store.append(first, _turn("two"))
+    store.append(first, _turn("three"))
+    assert store.load(first).turn_count == 3
+    store.flush()
+
+    record = SessionStore(sessions_db).load(first)
+    assert [turn["user"] for turn in record.turns] == ["one", "two", "three"]
+    assert record.turn_count == 3
+    assert store.stats()["pending_turns"] == 0
+
+
+def test_sessions_without_turns_take_no_space():
+    sessions_db = InMemoryCollection()
+    store = SessionStore(sessions_db, max_sessions=2)
+    session_ids = [store.create() for _ in range(10)]
+    store.flush()
+    assert store.stats()["sessions"] == 0
+
+    store.append(session_ids[0], _turn("first"), org="org")
+    store.flush()
+    record = SessionStore(sessions_db).load(session_ids[0])
+    assert [turn["user"] for turn in record.turns] == ["first"]
+    assert record.org == "org"
+    assert all(store.load(session_id) is None for session_id in session_ids[1:])
+    assert store.stats()["sessions"] <= 2
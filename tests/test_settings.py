@@ -0,0 +1,71 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import agent
+import main
+import server
+from benchmarks.fakes import InMemoryCollection
+from registry import registry
+
+
+@pytest.fixture
+def two_orgs(monkeypatch):
+    ours, theirs = ObjectId(), ObjectId()
+    agents = InMemoryCollection([
+        {"_id": ObjectId(), "name": "Ours", "org": ours, "connector_ids": []},
+        {"_id": ObjectId(), "name": "Theirs", "org": theirs, "connector_ids": []},
+    ])
+    connectors = InMemoryCollection([
+        {"_id": ObjectId(), "name": "Our docs", "org": ours, "connector_type": "source_pdf", "settings": {}},
+        {"_id": ObjectId(), "name": "Their docs", "org": theirs, "connector_type": "source_pdf", "settings": {}},
+    ])
+    monkeypatch.setattr(agent, "agents_db", agents)
+    monkeypatch.setattr(agent, "connectors_db", connectors)
+    ids = {document["name"]: str(document["_id"]) for collection in (agents, connectors) for document in collection.find({})}
+    return ours, theirs, ids
+
+
+@pytest.mark.asyncio
+async def test_actions_on_another_organizations_documents_are_not_found(two_orgs):
+    ours, theirs, ids = two_orgs
+
+    with pytest.raises(HTTPException) as raised:
+        await server.update_agent(ids["Theirs"], server.AgentUpdateRequest(name="Renamed"), str(ours))
+    assert raised.value.status_code == 404
+    with pytest.raises(HTTPException):
+        await server.delete_connector(ids["Their docs"], str(ours))
+    with pytest.raises(HTTPException):
+        await server.link_connector(ids["Ours"], ids["Their docs"], str(ours))
+
+    assert agent.agents_db.find_one({"name": "Theirs"}) is not None
+    assert agent.connectors_db.find_one({"name": "Their docs"}) is not None
+    assert agent.agents_db.find_one({"name": "Ours"})["connector_ids"] == []
+
+
+@pytest.mark.asyncio
+async def test_actions_within_the_organization_apply(two_orgs):
+    ours, _, ids = two_orgs
+
+    await server.update_agent(ids["Ours"], server.AgentUpdateRequest(name="Renamed"), str(ours))
+    await server.link_connector(ids["Ours"], ids["Our docs"], str(ours))
+
+    renamed = agent.agents_db.find_one({"name": "Renamed"})
+    assert renamed["connector_ids"] == [ObjectId(ids["Our docs"])]
+    await server.delete_connector(ids["Our docs"], str(ours))
+    assert agent.agents_db.find_one({"name": "Renamed"})["connector_ids"] == []
+
+
+@pytest.mark.asyncio
+async def test_cli_reports_agents_outside_its_organization_as_not_found(two_orgs, monkeypatch):
+    _, _, ids = two_orgs
+    monkeypatch.setattr(registry, "agents_db", agent.agents_db)
+    registry.invalidate()
+    mine = agent.agents_db.insert_one({"name": "Mine", "org": None, "connector_ids": []}).inserted_id
+
+    assert await main.get_agent_by_id(ids["Theirs"]) is None
+    assert not await main.apply_action({"action": "edit_agent", "agent_id": ids["Theirs"], "name": "Renamed"})
+    assert (await main.get_agent_by_id(str(mine)))["name"] == "Mine"
+    assert await main.apply_action({"action": "edit_agent", "agent_id": str(mine), "name": "Renamed"})
+    assert agent.agents_db.find_one({"name": "Theirs"}) is not None
+    registry.invalidate()
@@ -0,0 +1,237 @@
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from db import run_db
+
+
+def normalize_query_text(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+class _DiskStore:
+    """Persistent second tier backed by a single SQLite table."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            "model TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (model, query))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS query_embeddings_created_at ON query_embeddings (created_at)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, model: str, query: str, min_created_at: float) -> Optional[Tuple[List[float], float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, created_at FROM query_embeddings WHERE model = ? AND query = ? AND created_at >= ?",
+                (model, query, min_created_at),
+            ).fetchone()
+        if row is None:
+            return None
+        return array("d", row[0]).tolist(), row[1]
+
+    def put(self, model: str, query: str, vector: List[float], created_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (model, query, vector, created_at) VALUES (?, ?, ?, ?)",
+                (model, query, array("d", vector).tobytes(), created_at),
+            )
+            self._writes += 1
+            # Pruning scans the table, so only do it every few hundred writes.
+            if self._writes % 256 == 0:
+                self._conn.execute(
+                    "DELETE FROM query_embeddings WHERE rowid NOT IN "
+                    "(SELECT rowid FROM query_embeddings ORDER BY created_at DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Two-tier cache for query embeddings: an in-memory LRU in front of an optional
+    SQLite store. Entries are keyed by model name and normalized query text and
+    expire after ttl seconds. Document embeddings are passed straight through.
+    Vectors are kept as tuples and every caller gets its own list, so a caller
+    that modifies its embedding cannot change what the cache serves next. The
+    async methods reach the SQLite store through run_db, off the event loop.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_entries: int = 2048,
+        ttl: float = 24 * 60 * 60,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 100_000,
+    ):
+        self.embeddings = embeddings
+        self.model = str(getattr(embeddings, "model", type(embeddings).__name__))
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[Tuple[float, ...], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _DiskStore(disk_path, disk_max_entries) if disk_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._miss_seconds = 0.0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def _memory_lookup(self, query: str, now: float) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._memory.get(query)
+            if entry is not None and entry[1] + self.ttl >= now:
+                self._memory.move_to_end(query)
+                self.memory_hits += 1
+                return list(entry[0])
+        return None
+
+    def _disk_lookup(self, query: str, now: float) -> Optional[List[float]]:
+        if self._disk is None:
+            return None
+        stored = self._disk.get(self.model, query, now - self.ttl)
+        if stored is None:
+            return None
+        self._remember(query, *stored)
+        with self._lock:
+            self.disk_hits += 1
+        return stored[0]
+
+    def _record_miss(self, query: str, vector: List[float], now: float, elapsed: float) -> None:
+        self._remember(query, vector, now)
+        with self._lock:
+            self.misses += 1
+            self._miss_seconds += elapsed
+
+    def _disk_put(self, query: str, vector: List[float], now: float) -> None:
+        if self._disk is not None:
+            self._disk.put(self.model, query, vector, now)
+
+    def embed_query(self, text: str) -> List[float]:
+        query = normalize_query_text(text)
+        now = time.time()
+        vector = self._memory_lookup(query, now)
+        if vector is None:
+            vector = self._disk_lookup(query, now)
+        if vector is not None:
+            return vector
+
+        start = time.perf_counter()
+        vector = self.embeddings.embed_query(text)
+        self._record_miss(query, vector, now, time.perf_counter() - start)
+        self._disk_put(query, vector, now)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        query = normalize_query_text(text)
+        now = time.time()
+        vector = self._memory_lookup(query, now)
+        if vector is None and self._disk is not None:
+            vector = await run_db(self._disk_lookup, query, now)
+        if vector is not None:
+            return vector
+
+        start = time.perf_counter()
+        vector = await self.embeddings.aembed_query(text)
+        self._record_miss(query, vector, now, time.perf_counter() - start)
+        if self._disk is not None:
+            await run_db(self._disk_put, query, vector, now)
+        return vector
+
+    def _remember(self, query: str, vector: List[float], created_at: float) -> None:
+        with self._lock:
+            self._memory[query] = (tuple(vector), created_at)
+            self._memory.move_to_end(query)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            average_miss_seconds = self._miss_seconds / self.misses if self.misses else 0.0
+            return {
+                "model": self.model,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._memory),
+                "average_miss_seconds": average_miss_seconds,
+                "latency_saved_seconds": hits * average_miss_seconds,
+            }
+
+
+def cached_embeddings(embeddings: Embeddings) -> CachedEmbeddings:
+    """Wrap an embeddings client with the cache configured from the environment."""
+    return CachedEmbeddings(
+        embeddings,
+        max_entries=int(os.environ.get("EMBEDDING_CACHE_SIZE", 2048)),
+        ttl=float(os.environ.get("EMBEDDING_CACHE_TTL", 24 * 60 * 60)),
+        disk_path=os.environ.get("EMBEDDING_CACHE_PATH") or None,
+        disk_max_entries=int(os.environ.get("EMBEDDING_CACHE_DISK_SIZE", 100_000)),
+    )
+
+
+class LazyEmbeddings(Embeddings):
+    """Builds the wrapped embeddings on first use, so that importing a module constructs no API client."""
+
+    def __init__(self, factory: Callable[[], Embeddings]):
+        self._factory = factory
+        self._embeddings: Optional[Embeddings] = None
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = self._factory()
+        return self._embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
+
+
+def _openai_embeddings() -> CachedEmbeddings:
+    from langchain_openai import OpenAIEmbeddings
+
+    return cached_embeddings(OpenAIEmbeddings())
+
+
+# One client and one cache for the whole process, so a query embedded by the router is a hit for the PDF tool.
+_shared_openai_embeddings = LazyEmbeddings(_openai_embeddings)
+
+
+def lazy_openai_embeddings() -> LazyEmbeddings:
+    """
+    The process's shared cached OpenAI embeddings; langchain_openai is
+    imported and the client built on the first call through any caller.
+    """
+    return _shared_openai_embeddings
@@ -0,0 +1,99 @@
+"""
+Running connector tools without blocking the event loop.
+
+CPU-heavy steps (HTML parsing, similarity scoring) go through run_cpu, a
+small thread pool kept apart from the database pool so that slow queries and
+heavy pages do not starve each other. limit_tools wraps an agent's tools so
+that the calls a model requests in one step run concurrently, at most
+`concurrency` at a time per agent, and each call is cut off after its timeout
+with an error message the model can read.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from langchain_core.tools import BaseTool
+
+T = TypeVar("T")
+
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", 30))
+AGENT_TOOL_CONCURRENCY = int(os.environ.get("AGENT_TOOL_CONCURRENCY", 4))
+TOOL_CPU_WORKERS = int(os.environ.get("TOOL_CPU_WORKERS", min(4, os.cpu_count() or 1)))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TOOL_CPU_WORKERS, thread_name_prefix="tool-cpu")
+        return _executor
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run CPU-bound work on the tool worker pool and await its result."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), partial(context.run, fn, *args, **kwargs))
+
+
+class ToolLimiter:
+    """
+    Caps concurrent tool calls for one agent. A cached agent graph can outlive
+    the event loop it was first used on, so there is one semaphore per loop.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.timeouts = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+            return semaphore
+
+    async def run(self, name: str, timeout: float, call: Callable[[], Any]) -> Any:
+        async with self._semaphore():
+            self.calls += 1
+            try:
+                return await asyncio.wait_for(call(), timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                return f"Error: The tool {name} did not finish within {timeout:g} seconds."
+
+    def stats(self) -> Dict[str, int]:
+        return {"limit": self.limit, "calls": self.calls, "timeouts": self.timeouts}
+
+
+def _limited(tool: BaseTool, limiter: ToolLimiter, timeout: float) -> BaseTool:
+    coroutine = getattr(tool, "coroutine", None)
+    func = getattr(tool, "func", None)
+    if coroutine is None and func is None:
+        return tool
+
+    async def limited(*args: Any, **kwargs: Any) -> Any:
+        if coroutine is not None:
+            return await limiter.run(tool.name, timeout, lambda: coroutine(*args, **kwargs))
+        # Tools without a coroutine still must not block the loop.
+        return await limiter.run(tool.name, timeout, lambda: asyncio.to_thread(func, *args, **kwargs))
+
+    return tool.model_copy(update={"coroutine": limited})
+
+
+def limit_tools(tools: List[BaseTool], concurrency: int = AGENT_TOOL_CONCURRENCY, timeouts: Optional[Dict[str, float]] = None) -> List[BaseTool]:
+    """Copies of tools that share one concurrency limit; timeouts maps tool names to seconds."""
+    limiter = ToolLimiter(concurrency)
+    return [_limited(tool, limiter, (timeouts or {}).get(tool.name, TOOL_TIMEOUT)) for tool in tools]
@@ -0,0 +1,66 @@
+"""
+Connector tool factories, keyed by connector_type.
+
+Each connector type names the module and function that builds its tool. The
+module is imported the first time an agent with that connector is built, so
+a settings command such as list_agents never loads numpy, httpx or
+BeautifulSoup. A new connector type is one register() call:
+
+    tool_factories.register("source_sql", "tools.sql_source", "get_sql_source_tool")
+
+A connector type whose tool reads data that can change without a settings
+action also names a data_version function in its module. It takes the
+connector's settings and returns a value that changes whenever that data
+does, so caches of the agent's answers can tell when they are stale.
+"""
+import importlib
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+ToolFactory = Callable[..., Any]
+DataVersion = Callable[[Dict[str, Any]], Hashable]
+
+
+class ToolFactoryRegistry:
+    def __init__(self):
+        self._specs: Dict[str, Tuple[str, str, Optional[str]]] = {}
+        self._loaded: Dict[str, ToolFactory] = {}
+        self._lock = threading.Lock()
+
+    def register(self, connector_type: str, module: str, attribute: str, data_version: Optional[str] = None) -> None:
+        with self._lock:
+            self._specs[connector_type] = (module, attribute, data_version)
+            self._loaded.pop(connector_type, None)
+
+    def get(self, connector_type: Optional[str]) -> Optional[ToolFactory]:
+        """The factory for a connector type, importing its module on first use; None if unknown."""
+        factory = self._loaded.get(connector_type)
+        if factory is not None:
+            return factory
+        spec = self._specs.get(connector_type)
+        if spec is None:
+            return None
+        module, attribute, _ = spec
+        factory = getattr(importlib.import_module(module), attribute)
+        with self._lock:
+            self._loaded[connector_type] = factory
+        return factory
+
+    def data_version(self, connector_type: Optional[str]) -> Optional[DataVersion]:
+        """The connector type's data_version function, or None if its data only changes through settings."""
+        spec = self._specs.get(connector_type)
+        if spec is None or spec[2] is None:
+            return None
+        module, _, attribute = spec
+        return getattr(importlib.import_module(module), attribute)
+
+    def connector_types(self) -> List[str]:
+        return sorted(self._specs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"registered": self.connector_types(), "loaded": sorted(self._loaded)}
+
+
+tool_factories = ToolFactoryRegistry()
+tool_factories.register("source_pdf", "tools.pdf_source", "get_pdf_source_tool", data_version="data_version")
+tool_factories.register("source_uri", "tools.uri_source", "get_uri_source_tool")
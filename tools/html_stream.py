@@ -0,0 +1,96 @@
+"""
+Incremental HTML text extraction for very large pages.
+
+The stdlib HTMLParser tokenizer is fed the body chunk by chunk. Visible text is
+cut into overlapping word windows, and each passage is scored against the
+query terms as soon as it completes. Only the best few passages, the current
+window and the page's first 1000 characters are kept, so peak memory does not
+grow with page size.
+"""
+import codecs
+import heapq
+import math
+from collections import Counter
+from html.parser import HTMLParser
+from typing import List, Tuple
+
+from tools.text_index import tokenize
+
+SKIPPED_TAGS = frozenset({"script", "style", "noscript", "template"})
+
+
+class StreamingPassageExtractor(HTMLParser):
+    def __init__(self, query: str, top_k: int = 3, passage_words: int = 120, overlap_words: int = 20, encoding: str = "utf-8"):
+        super().__init__(convert_charrefs=True)
+        self.query_terms = frozenset(tokenize(query))
+        self.top_k = top_k
+        self.passage_words = passage_words
+        self.overlap_words = overlap_words
+        self.head = ""
+        self.bytes_read = 0
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._skip_depth = 0
+        self._words: List[str] = []
+        self._passage_count = 0
+        self._best: List[Tuple[float, int, str]] = []
+        self._complete_matches = 0
+
+    def feed_bytes(self, chunk: bytes) -> None:
+        self.bytes_read += len(chunk)
+        self.feed(self._decoder.decode(chunk))
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        words = data.split()
+        if not words:
+            return
+        if len(self.head) < 1000:
+            self.head = (self.head + " " + " ".join(words)).strip()[:1000]
+        self._words.extend(words)
+        while len(self._words) >= self.passage_words:
+            self._emit(self._words[:self.passage_words])
+            del self._words[:self.passage_words - self.overlap_words]
+
+    def close(self):
+        self.feed(self._decoder.decode(b"", final=True))
+        super().close()
+        # The last window repeats the overlap of the previous passage, so only
+        # emit it when it carries new words.
+        if len(self._words) > (self.overlap_words if self._passage_count else 0):
+            self._emit(self._words)
+        self._words = []
+
+    def _emit(self, words: List[str]) -> None:
+        passage_number = self._passage_count
+        self._passage_count += 1
+        if not self.query_terms:
+            return
+        counts = Counter(token for token in tokenize(" ".join(words)) if token in self.query_terms)
+        if not counts:
+            return
+        # Distinct query terms matched dominate; repeated mentions only break ties.
+        score = len(counts) + sum(math.log1p(tf) for tf in counts.values()) / (len(self.query_terms) * 10)
+        if len(counts) == len(self.query_terms):
+            self._complete_matches += 1
+        entry = (score, -passage_number, " ".join(words))
+        if len(self._best) < self.top_k:
+            heapq.heappush(self._best, entry)
+        elif entry > self._best[0]:
+            heapq.heapreplace(self._best, entry)
+
+    @property
+    def satisfied(self) -> bool:
+        """True once top_k passages matching every query term have been seen."""
+        return self._complete_matches >= self.top_k
+
+    def passages(self) -> List[str]:
+        return [text for _, _, text in sorted(self._best, reverse=True)]
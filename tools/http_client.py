@@ -0,0 +1,162 @@
+"""
+Process-wide async HTTP client with a small conditional-GET response cache.
+
+One pooled httpx.AsyncClient with keep-alive is shared by every connector.
+Responses are cached by URL, honouring Cache-Control (no-store, no-cache, max-age) with a
+per-call TTL fallback, and revalidated with If-None-Match / If-Modified-Since
+once stale. Concurrent requests for the same URL share a single fetch.
+"""
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import httpx
+
+DEFAULT_TIMEOUT = 15.0
+DEFAULT_TTL = float(os.environ.get("HTTP_CACHE_TTL", 300))
+MAX_CACHE_ENTRIES = int(os.environ.get("HTTP_CACHE_MAX_ENTRIES", 256))
+
+_client: Optional[httpx.AsyncClient] = None
+_client_lock = threading.Lock()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=DEFAULT_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", 100)),
+                    max_keepalive_connections=int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)),
+                    keepalive_expiry=float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30)),
+                ),
+            )
+        return _client
+
+
+async def aclose_client() -> None:
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        await client.aclose()
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+    revalidate: bool
+
+
+def _cache_directives(response: httpx.Response) -> Dict[str, Optional[str]]:
+    directives: Dict[str, Optional[str]] = {}
+    for part in response.headers.get("cache-control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+def _lifetime(directives: Dict[str, Optional[str]], ttl: float) -> float:
+    max_age = directives.get("max-age")
+    return float(max_age) if max_age and re.fullmatch(r"\d+", max_age) else ttl
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = MAX_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _store(self, url: str, response: httpx.Response, ttl: float) -> Optional[CachedResponse]:
+        directives = _cache_directives(response)
+        if "no-store" in directives:
+            self._entries.pop(url, None)
+            return None
+        entry = CachedResponse(
+            url=url,
+            text=response.text,
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            expires_at=time.monotonic() + _lifetime(directives, ttl),
+            revalidate="no-cache" in directives,
+        )
+        self._entries[url] = entry
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    async def _fetch(self, url: str, ttl: float, timeout: float) -> str:
+        cached = self._entries.get(url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        response = await get_async_client().get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached is not None:
+            self.revalidated += 1
+            cached.expires_at = time.monotonic() + _lifetime(_cache_directives(response), ttl)
+            self._entries.move_to_end(url)
+            return cached.text
+
+        response.raise_for_status()
+        self.misses += 1
+        self._store(url, response, ttl)
+        return response.text
+
+    async def get_text(self, url: str, ttl: float = DEFAULT_TTL, timeout: float = DEFAULT_TIMEOUT) -> str:
+        """Return the body of url, from cache when fresh, sharing any fetch already in flight."""
+        cached = self._entries.get(url)
+        if cached is not None and not cached.revalidate and cached.expires_at > time.monotonic():
+            self._entries.move_to_end(url)
+            self.hits += 1
+            return cached.text
+
+        in_flight = self._in_flight.get(url)
+        if in_flight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(in_flight)
+
+        future = asyncio.ensure_future(self._fetch(url, ttl, timeout))
+        self._in_flight[url] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._in_flight.pop(url, None)
+            else:
+                future.add_done_callback(lambda _: self._in_flight.pop(url, None))
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self._entries),
+        }
+
+
+response_cache = ResponseCache()
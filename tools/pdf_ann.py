@@ -0,0 +1,184 @@
+"""
+Approximate nearest-neighbour (IVF) index for large PDF knowledge bases.
+
+The index is built at ingest time with spherical k-means, written next to the
+document's version stamp under ANN_INDEX_DIR, and memory-mapped at query time.
+Vectors are stored grouped by inverted list so a probe reads contiguous rows.
+
+    python -m tools.pdf_ann <document_id>
+"""
+import json
+import os
+import shutil
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tools.pdf_cache import version_stamp
+from tools.similarity import dequantize, normalize_query, top_k
+
+ANN_INDEX_DIR = os.environ.get("ANN_INDEX_DIR", "ann_indexes")
+DEFAULT_NPROBE = 8
+KMEANS_ITERATIONS = 10
+KMEANS_MAX_TRAINING_ROWS = 50_000
+ASSIGN_BATCH_ROWS = 8192
+
+
+def _stamp_key(document: Dict[str, Any]) -> str:
+    return json.dumps(list(version_stamp(document)), default=str)
+
+
+def _index_path(document_id: str) -> str:
+    return os.path.join(ANN_INDEX_DIR, str(document_id))
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignments = np.empty(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], ASSIGN_BATCH_ROWS):
+        block = matrix[start:start + ASSIGN_BATCH_ROWS]
+        assignments[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def _train_centroids(matrix: np.ndarray, nlist: int, rng: np.random.Generator) -> np.ndarray:
+    sample_size = min(matrix.shape[0], KMEANS_MAX_TRAINING_ROWS)
+    sample = matrix[rng.choice(matrix.shape[0], sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = np.divide(sums, norms, out=np.zeros_like(sums), where=norms != 0)
+    return centroids
+
+
+def build_index(document_id: str, stamp_document: Dict[str, Any], matrix: np.ndarray, positions: np.ndarray, nlist: Optional[int] = None, seed: int = 0) -> str:
+    """
+    Build and persist the IVF index over a document's normalized embedding
+    matrix, where positions[i] is the chunk position or ordinal of row i.
+    Returns the index directory.
+    """
+    if matrix.shape[0] == 0:
+        raise ValueError(f"Document {document_id} has no embedded chunks to index.")
+
+    nlist = min(nlist or max(1, int(np.sqrt(matrix.shape[0]))), matrix.shape[0])
+    rng = np.random.default_rng(seed)
+    centroids = _train_centroids(matrix, nlist, rng)
+    assignments = _assign(matrix, centroids)
+
+    order = np.argsort(assignments, kind="stable")
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignments, minlength=nlist), out=offsets[1:])
+
+    path = _index_path(document_id)
+    staging = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(staging, exist_ok=True)
+    np.save(os.path.join(staging, "centroids.npy"), centroids)
+    np.save(os.path.join(staging, "vectors.npy"), matrix[order])
+    np.save(os.path.join(staging, "positions.npy"), np.asarray(positions, dtype=np.int64)[order])
+    np.save(os.path.join(staging, "offsets.npy"), offsets)
+    with open(os.path.join(staging, "meta.json"), "w") as f:
+        json.dump({"version": _stamp_key(stamp_document), "rows": int(matrix.shape[0]), "nlist": nlist}, f)
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(staging, path)
+    return path
+
+
+class AnnIndex:
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.centroids = np.load(os.path.join(path, "centroids.npy"))
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.positions = np.load(os.path.join(path, "positions.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+
+    @property
+    def version(self) -> str:
+        return self.meta["version"]
+
+    def search(self, query_embedding: List[float], k: int, threshold: float, nprobe: int = DEFAULT_NPROBE) -> List[Tuple[int, float]]:
+        """
+        Return up to k (chunk position, score) pairs from the nprobe closest lists.
+        A larger nprobe trades latency for recall; nprobe >= nlist is exact.
+        """
+        query = normalize_query(query_embedding)
+        nlist = self.centroids.shape[0]
+        nprobe = max(1, min(nprobe, nlist))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+
+        scores, positions = [], []
+        for probe in probes:
+            start, end = self.offsets[probe], self.offsets[probe + 1]
+            if start == end:
+                continue
+            scores.append(self.vectors[start:end] @ query)
+            positions.append(self.positions[start:end])
+        if not scores:
+            return []
+
+        scores = np.concatenate(scores)
+        positions = np.concatenate(positions)
+        # Present candidates in document order so ties resolve like the exact search.
+        order = np.argsort(positions, kind="stable")
+        scores, positions = scores[order], positions[order]
+        return [(int(positions[row]), score) for row, score in top_k(scores, k, threshold)]
+
+
+_loaded: Dict[str, AnnIndex] = {}
+_loaded_lock = threading.Lock()
+
+
+def load_index(document_id: str, stamp_document: Dict[str, Any]) -> Optional[AnnIndex]:
+    """Return the memory-mapped index for the document, or None if it is missing or stale."""
+    expected = _stamp_key(stamp_document)
+    with _loaded_lock:
+        index = _loaded.get(document_id)
+        if index is not None and index.version == expected:
+            return index
+        path = _index_path(document_id)
+        if not os.path.isfile(os.path.join(path, "meta.json")):
+            _loaded.pop(document_id, None)
+            return None
+        index = AnnIndex(path)
+        if index.version != expected:
+            _loaded.pop(document_id, None)
+            return None
+        _loaded[document_id] = index
+        return index
+
+
+def main(argv: List[str]) -> int:
+    from bson import ObjectId
+    from tools.pdf_source import chunks_db, knowledge_db
+    from tools.pdf_store import STAMP_PROJECTION, load_document
+
+    if len(argv) < 1:
+        print("Usage: python -m tools.pdf_ann <document_id> [nlist]")
+        return 2
+    document_id = argv[0]
+    document_key = ObjectId(document_id)
+    stamp_document = knowledge_db.find_one({"_id": document_key}, STAMP_PROJECTION)
+    loaded = load_document(knowledge_db, chunks_db, document_key, stamp_document) if stamp_document else None
+    if not loaded:
+        print(f"No document or text chunks were found for the document ID: {document_id}")
+        return 1
+    nlist = int(argv[1]) if len(argv) > 1 else None
+    matrix = dequantize(loaded.matrix, loaded.scales) if loaded.quantized else loaded.matrix
+    path = build_index(document_id, stamp_document, matrix, loaded.positions, nlist=nlist)
+    print(f"ANN index for {document_id} written to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,119 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class CachedDocument:
+    """
+    A decoded document: a row-normalized matrix (float32, or float16/int8 when
+    the document is quantized, with per-row scales for int8), the chunk position
+    or ordinal of every row, and the row texts when the layout stores them inline.
+    """
+    version: Hashable
+    matrix: np.ndarray
+    positions: np.ndarray
+    texts: Optional[List[str]]
+    nbytes: int
+    scales: Optional[np.ndarray] = None
+
+    @property
+    def quantized(self) -> bool:
+        return self.matrix.dtype != np.float32
+
+    @classmethod
+    def create(
+        cls,
+        stamp_document: Dict[str, Any],
+        matrix: np.ndarray,
+        positions: np.ndarray,
+        texts: Optional[List[str]] = None,
+        scales: Optional[np.ndarray] = None,
+    ) -> "CachedDocument":
+        nbytes = matrix.nbytes + positions.nbytes + sum(sys.getsizeof(text) for text in texts or [])
+        nbytes += scales.nbytes if scales is not None else 0
+        return cls(version=version_stamp(stamp_document), matrix=matrix, positions=positions, texts=texts, nbytes=nbytes, scales=scales)
+
+
+def version_stamp(document: Dict[str, Any]) -> Hashable:
+    """
+    The fields that change whenever a document's chunks are rewritten.
+    Documents that carry neither field are treated as immutable.
+    """
+    return document.get("version"), document.get("updated_at")
+
+
+class DocumentCache:
+    """
+    Memory-bounded LRU cache of decoded embedding matrices,
+    keyed by document id and revalidated against the document's version stamp.
+    """
+
+    VERSION_PROJECTION = {"version": 1, "updated_at": 1}
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedDocument]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, document_id: str, stamp_document: Dict[str, Any]) -> Optional[CachedDocument]:
+        """Return the cached entry if it is still current for the given stamp document."""
+        version = version_stamp(stamp_document)
+        with self._lock:
+            entry = self._entries.get(document_id)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(document_id)
+            self.hits += 1
+            return entry
+
+    def put(self, document_id: str, entry: CachedDocument) -> CachedDocument:
+        with self._lock:
+            self._discard(document_id)
+            if entry.nbytes > self.max_bytes:
+                return entry
+            self._entries[document_id] = entry
+            self._size += entry.nbytes
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.nbytes
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, document_id: str) -> None:
+        with self._lock:
+            self._discard(document_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _discard(self, document_id: str) -> None:
+        entry = self._entries.pop(document_id, None)
+        if entry is not None:
+            self._size -= entry.nbytes
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+document_cache = DocumentCache(max_bytes=int(os.environ.get("PDF_CACHE_MAX_BYTES", 256 * 1024 * 1024)))
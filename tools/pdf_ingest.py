@@ -0,0 +1,294 @@
+"""
+Streaming PDF ingestion for the source_pdf connector.
+
+Pages are read one at a time from pypdf, split into chunks by a generator,
+embedded in batches with a bounded number of batches in flight, and written
+in order to the chunk collection with bulk inserts (see tools/pdf_store.py).
+Progress is checkpointed per page, so an interrupted run resumes where it stopped.
+
+    python -m tools.pdf_ingest manual.pdf [--batch-size 64] [--concurrency 4] [--dtype float16] [--embedder fake]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+
+from bson import ObjectId
+from langchain_core.embeddings import Embeddings
+from pymongo.collection import Collection
+from pypdf import PdfReader
+
+from db import get_database
+from tools.pdf_store import EMBEDDING_DTYPES, STAMP_PROJECTION, encode_embedding, ensure_indexes, load_document, tag_documents
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+BATCH_SIZE = 64
+CONCURRENCY = 4
+
+
+@dataclass
+class PageChunk:
+    page: int
+    text: str
+    last_in_page: bool
+
+
+@dataclass
+class IngestStats:
+    document_id: str
+    pages: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    resumed_from_page: int = 0
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+
+def _fingerprint(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_pages(reader: PdfReader, start_page: int = 0) -> Iterator[Tuple[int, str]]:
+    for page_number in range(start_page, len(reader.pages)):
+        yield page_number, reader.pages[page_number].extract_text() or ""
+
+
+def iter_chunks(pages: Iterator[Tuple[int, str]], chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> Iterator[PageChunk]:
+    """
+    Split each page into overlapping chunks of roughly chunk_size characters,
+    breaking on whitespace. Chunks never span pages, which keeps checkpoints exact.
+    """
+    for page_number, text in pages:
+        words = text.split()
+        pending: List[PageChunk] = []
+        start = 0
+        while start < len(words):
+            end, length = start, 0
+            while end < len(words) and (length == 0 or length + len(words[end]) + 1 <= chunk_size):
+                length += len(words[end]) + 1
+                end += 1
+            pending.append(PageChunk(page=page_number, text=" ".join(words[start:end]), last_in_page=False))
+            if end >= len(words):
+                break
+            overlap, back = 0, end
+            while back > start + 1 and overlap + len(words[back - 1]) + 1 <= chunk_overlap:
+                back -= 1
+                overlap += len(words[back]) + 1
+            start = back
+
+        if not pending:
+            # Keep a marker so empty pages still advance the checkpoint.
+            yield PageChunk(page=page_number, text="", last_in_page=True)
+            continue
+        pending[-1].last_in_page = True
+        yield from pending
+
+
+def iter_batches(chunks: Iterator[PageChunk], batch_size: int) -> Iterator[List[PageChunk]]:
+    batch: List[PageChunk] = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _embed_batch(embedder: Embeddings, batch: List[PageChunk]) -> List[Dict[str, Any]]:
+    texts = [chunk.text for chunk in batch if chunk.text]
+    embeddings = iter(embedder.embed_documents(texts) if texts else [])
+    return [
+        {"text": chunk.text, "embedding": list(next(embeddings)), "page": chunk.page}
+        for chunk in batch if chunk.text
+    ]
+
+
+def _start_or_resume(knowledge_db: Collection, chunks_db: Collection, path: str, fingerprint: str, page_count: int, dtype: str) -> Tuple[ObjectId, int, int, str]:
+    existing = knowledge_db.find_one(
+        {"ingest.fingerprint": fingerprint, "ingest.status": "in_progress"},
+        {"ingest": 1, "embedding_dtype": 1},
+    )
+    if existing:
+        pages_done = existing["ingest"].get("pages_done", 0)
+        chunks_done = existing["ingest"].get("chunks_done", 0)
+        # Drop chunks written after the last checkpoint, e.g. from a partly written page.
+        chunks_db.delete_many({"document_id": existing["_id"], "ordinal": {"$gte": chunks_done}})
+        # Keep the dtype the run started with so every chunk decodes the same way.
+        return existing["_id"], pages_done, chunks_done, existing.get("embedding_dtype", "float32")
+
+    document_id = knowledge_db.insert_one({
+        "name": os.path.basename(path),
+        "layout": "chunked",
+        "embedding_dtype": dtype,
+        "version": 0,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "ingest": {
+            "fingerprint": fingerprint,
+            "status": "in_progress",
+            "page_count": page_count,
+            "pages_done": 0,
+            "chunks_done": 0,
+        },
+    }).inserted_id
+    return document_id, 0, 0, dtype
+
+
+def ingest_pdf(
+    path: str,
+    embedder: Embeddings,
+    knowledge_db: Collection,
+    chunks_db: Collection,
+    batch_size: int = BATCH_SIZE,
+    concurrency: int = CONCURRENCY,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    dtype: str = "float32",
+    progress: bool = True,
+) -> IngestStats:
+    """
+    Ingest a PDF into a knowledge document, resuming an unfinished run of the
+    same file if there is one. Memory stays bounded by concurrency * batch_size chunks.
+    """
+    reader = PdfReader(path)
+    page_count = len(reader.pages)
+    ensure_indexes(chunks_db)
+    document_id, pages_done, chunks_done, dtype = _start_or_resume(knowledge_db, chunks_db, path, _fingerprint(path), page_count, dtype)
+    stats = IngestStats(document_id=str(document_id), resumed_from_page=pages_done)
+    started = time.perf_counter()
+
+    batches = iter_batches(iter_chunks(iter_pages(reader, pages_done), chunk_size, chunk_overlap), batch_size)
+    in_flight: deque = deque()
+
+    def write(batch: List[PageChunk], documents: List[Dict[str, Any]]) -> None:
+        nonlocal pages_done, chunks_done
+        chunks_in_batch = len(documents)
+        completed = [chunk for chunk in batch if chunk.last_in_page]
+        ingest_state: Dict[str, Any] = {"updated_at": datetime.now(timezone.utc).isoformat()}
+        if completed:
+            # Checkpoint only whole pages; a trailing partial page is re-done on resume.
+            trailing = sum(1 for chunk in batch if chunk.text and chunk.page > completed[-1].page)
+            ingest_state["ingest.pages_done"] = completed[-1].page + 1
+            ingest_state["ingest.chunks_done"] = chunks_done + chunks_in_batch - trailing
+        if documents:
+            ingest_state["dimensions"] = len(documents[0]["embedding"])
+            chunks_db.insert_many([
+                {
+                    "document_id": document_id,
+                    "ordinal": chunks_done + offset,
+                    "text": document["text"],
+                    "embedding": encode_embedding(document["embedding"], dtype),
+                    "page": document["page"],
+                }
+                for offset, document in enumerate(documents)
+            ])
+        # The checkpoint moves only after the chunks it covers are stored.
+        knowledge_db.update_one({"_id": document_id}, {"$set": ingest_state})
+        chunks_done += chunks_in_batch
+        stats.chunks += chunks_in_batch
+        if completed:
+            stats.pages += completed[-1].page + 1 - pages_done
+            pages_done = completed[-1].page + 1
+        stats.seconds = time.perf_counter() - started
+        if progress:
+            print(
+                f"\rpages {pages_done}/{page_count}  chunks {chunks_done}  "
+                f"{stats.pages_per_second:.1f} pages/s  {stats.chunks_per_second:.1f} chunks/s",
+                end="", flush=True,
+            )
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for batch in batches:
+            in_flight.append((batch, executor.submit(_embed_batch, embedder, batch)))
+            if len(in_flight) >= concurrency:
+                done_batch, future = in_flight.popleft()
+                write(done_batch, future.result())
+        while in_flight:
+            done_batch, future = in_flight.popleft()
+            write(done_batch, future.result())
+
+    knowledge_db.update_one(
+        {"_id": document_id},
+        {
+            "$set": {
+                "ingest.status": "complete",
+                "chunk_count": chunks_done,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            },
+            "$inc": {"version": 1},
+        },
+    )
+    stats.seconds = time.perf_counter() - started
+    if progress:
+        print()
+    return stats
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Ingest a PDF into the source_pdf knowledge base.")
+    parser.add_argument("path")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--dtype", choices=sorted(EMBEDDING_DTYPES), default="float32")
+    parser.add_argument("--embedder", choices=["openai", "fake"], default="openai")
+    parser.add_argument("--ann", action="store_true", help="Build the ANN index once ingestion completes.")
+    parser.add_argument("--tag", action="append", default=[], help="Add the document to a tagged library; repeatable.")
+    args = parser.parse_args(argv)
+
+    if args.embedder == "fake":
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        embedder = DeterministicFakeEmbedding(size=1536)
+    else:
+        from langchain_openai import OpenAIEmbeddings
+        embedder = OpenAIEmbeddings()
+
+    database = get_database()
+    stats = ingest_pdf(
+        args.path, embedder, database.embeddings, database.chunks,
+        batch_size=args.batch_size, concurrency=args.concurrency,
+        chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+        dtype=args.dtype,
+    )
+    print(
+        f"Ingested {stats.pages} pages into {stats.chunks} chunks for document {stats.document_id} "
+        f"in {stats.seconds:.1f}s ({stats.pages_per_second:.1f} pages/s, {stats.chunks_per_second:.1f} chunks/s)"
+    )
+
+    if args.tag:
+        tag_documents(database.embeddings, [ObjectId(stats.document_id)], args.tag)
+        print(f"Tagged with {', '.join(args.tag)}")
+
+    if args.ann:
+        from tools.pdf_ann import build_index
+        document_key = ObjectId(stats.document_id)
+        stamp_document = database.embeddings.find_one({"_id": document_key}, STAMP_PROJECTION)
+        loaded = load_document(database.embeddings, database.chunks, document_key, stamp_document)
+        if loaded is None:
+            print("The document has no chunks; no ANN index was built.")
+        else:
+            path = build_index(stats.document_id, stamp_document, loaded.matrix, loaded.positions)
+            print(f"ANN index written to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
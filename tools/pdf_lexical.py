@@ -0,0 +1,107 @@
+"""
+Per-document BM25 indexes for the PDF source's hybrid retrieval mode.
+
+An index covers the same rows as the document's cached embedding matrix, so
+passage i of the index is row i of the matrix. It is built on the document's
+first hybrid query from the chunk texts, which a chunked document keeps only
+in the chunks collection, and is cached like the matrices: by document id,
+revalidated against the version stamp. The token count of every row is
+computed at the same time, so context budgeting costs nothing per query.
+
+Scores are normalized per document. A search over several documents puts
+them on one scale with library_ceiling, so a document that lacks a rare
+query term cannot reach the top score on its common terms alone.
+"""
+import os
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from history import count_tokens
+from tools.pdf_cache import DocumentCache, version_stamp
+from tools.text_index import BM25Index, tokenize
+
+CONTEXT_ENCODING = "o200k_base"
+
+
+@dataclass
+class LexicalDocument:
+    """
+    BM25 over a document's rows. A term's contribution to a row's score does
+    not depend on the query, so it is computed once per (term, row) and kept
+    as arrays: a query adds up one array per term instead of walking postings.
+    """
+    version: Hashable
+    texts: List[str]
+    tokens: np.ndarray
+    terms: Dict[str, Tuple[float, np.ndarray, np.ndarray]]
+    nbytes: int
+
+    @classmethod
+    def create(cls, stamp_document: Dict[str, Any], texts: List[str]) -> "LexicalDocument":
+        index = BM25Index(texts)
+        lengths = np.array(index.lengths, dtype=np.float32)
+        norms = index.k1 * (1 - index.b + index.b * lengths / (index.average_length or 1.0))
+        terms = {}
+        for term, postings in index.postings.items():
+            rows = np.array([row for row, _ in postings], dtype=np.int32)
+            tf = np.array([tf for _, tf in postings], dtype=np.float32)
+            idf = index.idf(term)
+            terms[term] = (idf, rows, (idf * tf * (index.k1 + 1) / (tf + norms[rows])).astype(np.float32))
+        tokens = np.array([count_tokens(text, CONTEXT_ENCODING) for text in texts], dtype=np.int32)
+        nbytes = tokens.nbytes + sum(sys.getsizeof(text) for text in texts)
+        nbytes += sum(sys.getsizeof(term) + rows.nbytes + weights.nbytes for term, (_, rows, weights) in terms.items())
+        return cls(version=version_stamp(stamp_document), texts=texts, tokens=tokens, terms=terms, nbytes=nbytes)
+
+    def idfs(self, query: str) -> Dict[str, float]:
+        """The idf of each query term that occurs in the document."""
+        return {term: self.terms[term][0] for term in set(tokenize(query)) if term in self.terms}
+
+    def scores(self, query: str, ceiling: Optional[float] = None) -> np.ndarray:
+        """
+        BM25 score of every row, divided by what a row holding each query term
+        once at average length would score, and capped at 1, so a threshold
+        means the same thing for every query and document. ceiling replaces
+        that divisor, e.g. with library_ceiling's.
+        """
+        scores = np.zeros(len(self.texts), dtype=np.float32)
+        idfs = self.idfs(query)
+        for term in idfs:
+            _, rows, weights = self.terms[term]
+            scores[rows] += weights
+        if ceiling is None:
+            ceiling = sum(idfs.values())
+        if ceiling:
+            np.minimum(scores / ceiling, 1.0, out=scores)
+        return scores
+
+
+def library_ceiling(documents: Iterable[LexicalDocument], query: str) -> float:
+    """
+    Score divisor shared by several documents: every query term that occurs in
+    any of them counts, at its highest idf. For one document it is the
+    document's own divisor.
+    """
+    best: Dict[str, float] = {}
+    for document in documents:
+        for term, idf in document.idfs(query).items():
+            best[term] = max(best.get(term, 0.0), idf)
+    return sum(best.values())
+
+
+def fuse(vector_scores: np.ndarray, lexical_scores: np.ndarray, vector_weight: float, threshold: float, lexical_threshold: float, candidates: int) -> List[Tuple[int, float]]:
+    """
+    Up to `candidates` (row, fused score) pairs, best first. A row qualifies
+    when its cosine similarity reaches threshold or its lexical score reaches
+    lexical_threshold, so an exact identifier is found even when its chunk
+    embeds far from the question. The fused score is the weighted sum of both.
+    """
+    fused = vector_weight * vector_scores + (1 - vector_weight) * lexical_scores
+    rows = np.flatnonzero((vector_scores >= threshold) | (lexical_scores >= lexical_threshold))
+    order = np.lexsort((rows, -fused[rows]))[:candidates]
+    return [(int(rows[i]), float(fused[rows[i]])) for i in order]
+
+
+lexical_cache = DocumentCache(max_bytes=int(os.environ.get("PDF_LEXICAL_CACHE_MAX_BYTES", 128 * 1024 * 1024)))
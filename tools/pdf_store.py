@@ -0,0 +1,308 @@
+"""
+Storage layouts for PDF knowledge documents.
+
+legacy:  one document in llmtf.embeddings with every chunk's text and
+         embedding inline in a "chunks" array.
+chunked: a parent document in llmtf.embeddings (layout="chunked") and one
+         document per chunk in llmtf.chunks, keyed by (document_id, ordinal),
+         with the embedding stored as packed binary.
+
+The query path reads only embeddings to score, then pulls the text of the
+winning chunks. Legacy documents can be moved over with:
+
+    python -m tools.pdf_store migrate [document_id ...]
+
+Documents can be grouped into libraries with tags; a source_pdf connector
+with a "tag" setting searches every document carrying it:
+
+    python -m tools.pdf_store tag <tag> <document_id> [document_id ...]
+
+Chunked documents can additionally be quantized for scoring. The normalized
+vector is written next to the original as "embedding_q" (float16, or int8
+with a per-chunk "scale"), and the parent's "quantization" field switches
+the query path over to it:
+
+    python -m tools.pdf_store quantize <document_id> int8 [--drop-full]
+"""
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from bson import Binary, ObjectId
+from pymongo import ASCENDING, UpdateOne
+from pymongo.collection import Collection
+
+from tools.pdf_cache import CachedDocument, DocumentCache
+from tools.similarity import build_embedding_matrix, normalize_rows, quantize_int8, search
+
+EMBEDDING_DTYPES = {"float32": np.float32, "float16": np.float16}
+QUANTIZATIONS = ("float16", "int8")
+STAMP_PROJECTION = {**DocumentCache.VERSION_PROJECTION, "layout": 1, "embedding_dtype": 1, "quantization": 1}
+MIGRATION_BATCH_SIZE = 500
+RECALL_SAMPLE_QUERIES = 200
+# Distance of a recall query from the chunk it is drawn from, relative to the chunk's unit length.
+RECALL_QUERY_NOISE = 0.5
+
+
+def is_chunked(document: Dict[str, Any]) -> bool:
+    return document.get("layout") == "chunked"
+
+
+def encode_embedding(vector: List[float], dtype: str = "float32") -> Binary:
+    return Binary(np.asarray(vector, dtype=EMBEDDING_DTYPES[dtype]).tobytes())
+
+
+def decode_embedding(data: bytes, dtype: str = "float32") -> np.ndarray:
+    return np.frombuffer(data, dtype=np.int8 if dtype == "int8" else EMBEDDING_DTYPES[dtype])
+
+
+def ensure_indexes(chunks_db: Collection) -> None:
+    chunks_db.create_index([("document_id", ASCENDING), ("ordinal", ASCENDING)], unique=True)
+
+
+def tag_documents(knowledge_db: Collection, document_keys: List[ObjectId], tags: List[str]) -> int:
+    """Add tags to documents; returns how many documents matched."""
+    knowledge_db.create_index("tags")
+    result = knowledge_db.update_many({"_id": {"$in": document_keys}}, {"$addToSet": {"tags": {"$each": tags}}})
+    return result.matched_count
+
+
+def load_document(knowledge_db: Collection, chunks_db: Collection, document_key: ObjectId, stamp_document: Dict[str, Any]) -> Optional[CachedDocument]:
+    """Decode a document's embeddings into a cache entry, or None if it has no chunks."""
+    if not is_chunked(stamp_document):
+        source_document = knowledge_db.find_one({"_id": document_key})
+        if not source_document or "chunks" not in source_document:
+            return None
+        chunks = source_document.get("chunks", [])
+        positions = np.array([i for i, chunk in enumerate(chunks) if "text" in chunk and "embedding" in chunk], dtype=np.int64)
+        matrix, texts = build_embedding_matrix(chunks)
+        return CachedDocument.create(source_document, matrix, positions, texts)
+
+    quantization = stamp_document.get("quantization")
+    if quantization:
+        field, dtype = "embedding_q", quantization
+    else:
+        field, dtype = "embedding", stamp_document.get("embedding_dtype", "float32")
+
+    ordinals, rows, scales = [], [], []
+    cursor = chunks_db.find({"document_id": document_key}, {"_id": 0, "ordinal": 1, field: 1, "scale": 1}).sort("ordinal", ASCENDING)
+    for chunk in cursor:
+        ordinals.append(chunk["ordinal"])
+        rows.append(decode_embedding(chunk[field], dtype))
+        scales.append(chunk.get("scale", 1.0))
+    if not rows:
+        return None
+
+    positions = np.array(ordinals, dtype=np.int64)
+    if quantization:
+        # Quantized rows are stored already normalized and are scored as-is.
+        row_scales = np.array(scales, dtype=np.float32) if quantization == "int8" else None
+        return CachedDocument.create(stamp_document, np.vstack(rows), positions, scales=row_scales)
+    matrix = normalize_rows(np.vstack(rows).astype(np.float32))
+    return CachedDocument.create(stamp_document, matrix, positions)
+
+
+def fetch_full_embeddings(chunks_db: Collection, document_key: ObjectId, stamp_document: Dict[str, Any], ordinals: List[int]) -> Optional[np.ndarray]:
+    """
+    Normalized full-precision embeddings of the given chunks, in order, for
+    re-scoring quantized candidates. None if the originals were dropped.
+    """
+    if not is_chunked(stamp_document) or not ordinals:
+        return None
+    dtype = stamp_document.get("embedding_dtype", "float32")
+    cursor = chunks_db.find(
+        {"document_id": document_key, "ordinal": {"$in": ordinals}},
+        {"_id": 0, "ordinal": 1, "embedding": 1},
+    )
+    vectors = {chunk["ordinal"]: chunk["embedding"] for chunk in cursor if "embedding" in chunk}
+    if len(vectors) != len(set(ordinals)):
+        return None
+    return normalize_rows(np.vstack([decode_embedding(vectors[o], dtype) for o in ordinals]).astype(np.float32))
+
+
+def fetch_texts(knowledge_db: Collection, chunks_db: Collection, document_key: ObjectId, stamp_document: Dict[str, Any], positions: List[int]) -> List[str]:
+    """Pull only the text of the chunks at the given positions (legacy) or ordinals (chunked)."""
+    if not positions:
+        return []
+
+    if is_chunked(stamp_document):
+        cursor = chunks_db.find(
+            {"document_id": document_key, "ordinal": {"$in": positions}},
+            {"_id": 0, "ordinal": 1, "text": 1},
+        )
+        texts = {chunk["ordinal"]: chunk.get("text", "") for chunk in cursor}
+        return [texts.get(position, "") for position in positions]
+
+    pipeline = [
+        {"$match": {"_id": document_key}},
+        {"$project": {"_id": 0, **{f"c{i}": {"$arrayElemAt": ["$chunks", p]} for i, p in enumerate(positions)}}},
+    ]
+    result = next(knowledge_db.aggregate(pipeline), {})
+    return [result.get(f"c{i}", {}).get("text", "") for i in range(len(positions))]
+
+
+def load_texts(chunks_db: Collection, document_key: ObjectId, ordinals: List[int]) -> List[str]:
+    """Every chunk text of a chunked document in one sequential read, ordered like the given ordinals."""
+    cursor = chunks_db.find({"document_id": document_key}, {"_id": 0, "ordinal": 1, "text": 1})
+    texts = {chunk["ordinal"]: chunk.get("text", "") for chunk in cursor}
+    return [texts.get(ordinal, "") for ordinal in ordinals]
+
+
+def migrate_document(knowledge_db: Collection, chunks_db: Collection, document_key: ObjectId, dtype: str = "float32") -> int:
+    """
+    Move a legacy document's inline chunks into the chunk collection.
+    Returns the number of chunks written; already-migrated documents are skipped.
+    """
+    document = knowledge_db.find_one({"_id": document_key})
+    if not document or is_chunked(document):
+        return 0
+
+    # Start from a clean slate so a re-run after a failed migration does not duplicate chunks.
+    chunks_db.delete_many({"document_id": document_key})
+    batch: List[Dict[str, Any]] = []
+    ordinal, dimensions = 0, None
+    for chunk in document.get("chunks", []):
+        if "text" not in chunk or "embedding" not in chunk:
+            continue
+        dimensions = dimensions or len(chunk["embedding"])
+        record = {"document_id": document_key, "ordinal": ordinal, "text": chunk["text"], "embedding": encode_embedding(chunk["embedding"], dtype)}
+        if "page" in chunk:
+            record["page"] = chunk["page"]
+        batch.append(record)
+        ordinal += 1
+        if len(batch) >= MIGRATION_BATCH_SIZE:
+            chunks_db.insert_many(batch)
+            batch = []
+    if batch:
+        chunks_db.insert_many(batch)
+
+    knowledge_db.update_one(
+        {"_id": document_key},
+        {
+            "$set": {
+                "layout": "chunked",
+                "embedding_dtype": dtype,
+                "chunk_count": ordinal,
+                "dimensions": dimensions,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            },
+            "$unset": {"chunks": ""},
+            "$inc": {"version": 1},
+        },
+    )
+    return ordinal
+
+
+def measure_recall(exact: np.ndarray, quantized: np.ndarray, scales: Optional[np.ndarray], k: int, sample_queries: int = RECALL_SAMPLE_QUERIES, seed: int = 0) -> float:
+    """
+    recall@k of scoring on the quantized matrix against exact float32 scoring.
+    Queries are sampled chunks moved RECALL_QUERY_NOISE away in a random
+    direction, and the chunk a query came from is left out of both top-k
+    lists: it is found trivially and would inflate recall.
+    """
+    rng = np.random.default_rng(seed)
+    sources = rng.choice(exact.shape[0], min(sample_queries, exact.shape[0]), replace=False)
+    noise = rng.standard_normal((len(sources), exact.shape[1])).astype(np.float32)
+    queries = exact[sources].astype(np.float32) + RECALL_QUERY_NOISE * noise / np.linalg.norm(noise, axis=1, keepdims=True)
+    recalls = []
+    for source, query in zip(sources, queries):
+        expected = [row for row, _ in search(exact, query, k + 1, -np.inf) if row != source][:k]
+        actual = [row for row, _ in search(quantized, query, k + 1, -np.inf, scales) if row != source][:k]
+        if expected:
+            recalls.append(len(set(expected) & set(actual)) / len(expected))
+    return float(np.mean(recalls)) if recalls else 1.0
+
+
+def quantize_document(knowledge_db: Collection, chunks_db: Collection, document_key: ObjectId, quantization: str, drop_full: bool = False, k: int = 3) -> Dict[str, Any]:
+    """
+    Write quantized embeddings for a chunked document, measure recall@k against
+    exact scoring, and switch the document over. Returns the recorded report.
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATIONS}.")
+    stamp_document = knowledge_db.find_one({"_id": document_key}, STAMP_PROJECTION)
+    if not stamp_document or not is_chunked(stamp_document):
+        raise ValueError(f"Document {document_key} must exist and use the chunked layout; migrate it first.")
+
+    exact = load_document(knowledge_db, chunks_db, document_key, {**stamp_document, "quantization": None})
+    if exact is None:
+        raise ValueError(f"Document {document_key} has no chunks to quantize.")
+    if quantization == "int8":
+        quantized, scales = quantize_int8(exact.matrix)
+    else:
+        quantized, scales = exact.matrix.astype(np.float16), None
+
+    for start in range(0, quantized.shape[0], MIGRATION_BATCH_SIZE):
+        chunks_db.bulk_write([
+            UpdateOne(
+                {"document_id": document_key, "ordinal": int(exact.positions[row])},
+                {"$set": {"embedding_q": Binary(quantized[row].tobytes()), "scale": float(scales[row]) if scales is not None else 1.0}},
+            )
+            for row in range(start, min(start + MIGRATION_BATCH_SIZE, quantized.shape[0]))
+        ], ordered=False)
+
+    report = {
+        "type": quantization,
+        f"recall_at_{k}": measure_recall(exact.matrix, quantized, scales, k),
+        "float32_bytes": int(exact.matrix.nbytes),
+        "quantized_bytes": int(quantized.nbytes + (scales.nbytes if scales is not None else 0)),
+        "full_precision_kept": not drop_full,
+    }
+    knowledge_db.update_one(
+        {"_id": document_key},
+        {
+            "$set": {"quantization": quantization, "quantization_report": report, "updated_at": datetime.now(timezone.utc).isoformat()},
+            "$inc": {"version": 1},
+        },
+    )
+    if drop_full:
+        chunks_db.update_many({"document_id": document_key}, {"$unset": {"embedding": ""}})
+    return report
+
+
+def main(argv: List[str]) -> int:
+    from db import get_database
+
+    if not argv or argv[0] not in ("migrate", "quantize", "tag"):
+        print("Usage: python -m tools.pdf_store migrate [document_id ...]")
+        print("       python -m tools.pdf_store quantize <document_id> {float16,int8} [--drop-full]")
+        print("       python -m tools.pdf_store tag <tag> <document_id> [document_id ...]")
+        return 2
+
+    database = get_database()
+    knowledge_db, chunks_db = database.embeddings, database.chunks
+    ensure_indexes(chunks_db)
+
+    if argv[0] == "tag":
+        if len(argv) < 3:
+            print("Usage: python -m tools.pdf_store tag <tag> <document_id> [document_id ...]")
+            return 2
+        matched = tag_documents(knowledge_db, [ObjectId(document_id) for document_id in argv[2:]], [argv[1]])
+        print(f"Tagged {matched} documents with {argv[1]!r}")
+        return 0
+
+    if argv[0] == "quantize":
+        if len(argv) < 3:
+            print("Usage: python -m tools.pdf_store quantize <document_id> {float16,int8} [--drop-full]")
+            return 2
+        report = quantize_document(knowledge_db, chunks_db, ObjectId(argv[1]), argv[2], drop_full="--drop-full" in argv[3:])
+        print(f"Quantized {argv[1]} to {report['type']}: {report['float32_bytes']} -> {report['quantized_bytes']} bytes in memory")
+        print(f"Measured recall@3 against exact scoring: {report['recall_at_3']:.3f}")
+        return 0
+
+    if len(argv) > 1:
+        document_keys = [ObjectId(document_id) for document_id in argv[1:]]
+    else:
+        document_keys = [d["_id"] for d in knowledge_db.find({"chunks": {"$exists": True}, "layout": {"$ne": "chunked"}}, {"_id": 1})]
+
+    for document_key in document_keys:
+        count = migrate_document(knowledge_db, chunks_db, document_key)
+        print(f"Migrated {document_key}: {count} chunks")
+    if document_keys:
+        print("Rebuild any ANN indexes for these documents with python -m tools.pdf_ann <document_id>.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,122 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+SCORE_BLOCK_ROWS = 16384
+
+
+def build_embedding_matrix(chunks: Iterable[Dict[str, Any]]) -> Tuple[np.ndarray, List[str]]:
+    """
+    Decode the usable chunks of a document into a row-normalized float32
+    matrix and the list of their texts (row i of the matrix belongs to texts[i]).
+    Rows with a zero norm are left as zeros so they always score 0.0.
+    """
+    texts: List[str] = []
+    vectors: List[List[float]] = []
+    for chunk in chunks:
+        if "text" in chunk and "embedding" in chunk:
+            texts.append(chunk["text"])
+            vectors.append(chunk["embedding"])
+
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32), texts
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return normalize_rows(matrix), texts
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms != 0)
+    return matrix
+
+
+def normalize_query(query_embedding: List[float]) -> np.ndarray:
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norm = np.linalg.norm(query)
+    if norm == 0:
+        return np.zeros_like(query)
+    return query / norm
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Scalar-quantize each row to int8 with its own scale, so row ~= quantized * scale."""
+    scales = (np.abs(matrix).max(axis=1) / 127).astype(np.float32) if matrix.size else np.zeros(matrix.shape[0], dtype=np.float32)
+    safe = np.where(scales == 0, 1, scales)[:, None]
+    quantized = np.clip(np.rint(matrix / safe), -127, 127).astype(np.int8)
+    return quantized, scales
+
+
+def dequantize(matrix: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    dense = matrix.astype(np.float32)
+    if scales is not None:
+        dense *= scales[:, None]
+    return dense
+
+
+def score(matrix: np.ndarray, query: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Dot every row with a normalized query. float16/int8 matrices are widened
+    block by block, so scoring never materializes a full float32 copy.
+    """
+    if matrix.dtype == np.float32:
+        scores = matrix @ query
+    else:
+        scores = np.empty(matrix.shape[0], dtype=np.float32)
+        for start in range(0, matrix.shape[0], SCORE_BLOCK_ROWS):
+            block = matrix[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + block.shape[0]] = block.astype(np.float32) @ query
+    if scales is not None:
+        scores *= scales
+    return scores
+
+
+def top_k(scores: np.ndarray, k: int, threshold: float) -> List[Tuple[int, float]]:
+    """
+    Return up to k (row, score) pairs with score >= threshold, best first.
+
+    Ties are broken by row order, which matches a stable descending sort over
+    the chunks in document order.
+    """
+    n = scores.shape[0]
+    if n == 0 or k <= 0:
+        return []
+
+    if n > k:
+        kth_score = scores[np.argpartition(scores, n - k)[n - k]]
+        # Keep every row tied with the k-th score so the row-order tie break is exact.
+        candidates = np.flatnonzero(scores >= max(kth_score, threshold))
+    else:
+        candidates = np.flatnonzero(scores >= threshold)
+
+    if candidates.size == 0:
+        return []
+
+    order = np.lexsort((candidates, -scores[candidates]))[:k]
+    return [(int(candidates[i]), float(scores[candidates[i]])) for i in order]
+
+
+def search(matrix: np.ndarray, query_embedding: List[float], k: int, threshold: float, scales: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+    """Score every row of a normalized (optionally quantized) matrix against the query in one pass."""
+    if matrix.shape[0] == 0:
+        return []
+    return top_k(score(matrix, normalize_query(query_embedding), scales), k, threshold)
+
+
+def mmr(vectors: np.ndarray, relevance: np.ndarray, diversity: float, duplicate: float) -> List[int]:
+    """
+    Maximal marginal relevance order of normalized candidate vectors: each pick
+    maximizes (1 - diversity) * relevance - diversity * (highest similarity to
+    an earlier pick). Candidates at least `duplicate` similar to an earlier
+    pick are dropped as near-duplicates.
+    """
+    remaining = np.arange(vectors.shape[0])
+    similarity = vectors @ vectors.T
+    redundancy = np.full(vectors.shape[0], -np.inf, dtype=np.float32)
+    order: List[int] = []
+    while remaining.size:
+        gains = (1 - diversity) * relevance[remaining] - diversity * np.maximum(redundancy[remaining], 0)
+        pick = int(remaining[np.argmax(gains)])
+        order.append(pick)
+        redundancy = np.maximum(redundancy, similarity[pick])
+        remaining = remaining[(remaining != pick) & (redundancy[remaining] < duplicate)]
+    return order
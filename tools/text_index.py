@@ -0,0 +1,69 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i in is it of on or "
+    "that the their there this to was what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def split_passages(text: str, passage_words: int = 120, overlap_words: int = 20) -> List[str]:
+    """Split text into overlapping word windows."""
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, passage_words - overlap_words)
+    passages = []
+    for start in range(0, len(words), step):
+        passages.append(" ".join(words[start:start + passage_words]))
+        if start + passage_words >= len(words):
+            break
+    return passages
+
+
+class BM25Index:
+    """Small in-memory inverted index with Okapi BM25 scoring over a list of passages."""
+
+    def __init__(self, passages: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        self.passages: List[str] = list(passages)
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths: List[int] = []
+        for passage_id, passage in enumerate(self.passages):
+            counts = Counter(tokenize(passage))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((passage_id, tf))
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.passages) - df + 0.5) / (df + 0.5))
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """BM25 score of every passage that shares at least one term with the query."""
+        scores: Dict[int, float] = defaultdict(float)
+        if not self.average_length:
+            return scores
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for passage_id, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[passage_id] / self.average_length)
+                scores[passage_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k (passage id, score) pairs, best first; ties keep passage order."""
+        scores = self.scores(query)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
@@ -1,18 +1,112 @@
+import hashlib
+import importlib.util
 import os
-from typing import List, Dict, Any
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple
 import httpx
 from bs4 import BeautifulSoup
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
+
+from telemetry import span
+from tools.execution import run_cpu
+from tools.html_stream import StreamingPassageExtractor
+from tools.http_client import DEFAULT_TTL, get_async_client, response_cache
+from tools.text_index import BM25Index, split_passages
+
+
+URI_INDEX_CACHE_SIZE = int(os.environ.get("URI_INDEX_CACHE_SIZE", 64))
+TOP_PASSAGES = 3
+STREAM_MAX_BYTES = int(os.environ.get("URI_STREAM_MAX_BYTES", 5 * 1024 * 1024))
+STREAM_CHUNK_BYTES = 64 * 1024
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+_page_indexes: "OrderedDict[str, Tuple[str, BM25Index, str]]" = OrderedDict()
+_page_indexes_lock = threading.Lock()
+
+
+def _page_index(url: str, html: str) -> Tuple[BM25Index, str]:
+    """Parse and index a page once per (URL, content hash); also returns the page's leading text."""
+    content_hash = hashlib.sha1(html.encode("utf-8", "surrogatepass")).hexdigest()
+    with _page_indexes_lock:
+        cached = _page_indexes.get(url)
+        if cached is not None and cached[0] == content_hash:
+            _page_indexes.move_to_end(url)
+            return cached[1], cached[2]
+
+    soup = BeautifulSoup(html, HTML_PARSER)
+    for element in soup(["script", "style", "noscript"]):
+        element.decompose()
+    page_text = soup.get_text(separator=" ", strip=True)
+    index = BM25Index(split_passages(page_text))
+
+    with _page_indexes_lock:
+        _page_indexes[url] = (content_hash, index, page_text[:1000])
+        _page_indexes.move_to_end(url)
+        while len(_page_indexes) > URI_INDEX_CACHE_SIZE:
+            _page_indexes.popitem(last=False)
+    return index, page_text[:1000]
+
+
+def _extract_snippet(url: str, html: str, query: str) -> str:
+    index, page_head = _page_index(url, html)
+    if not index.passages:
+        return f"Error: No text content extracted from {url}"
+
+    hits = index.search(query, TOP_PASSAGES)
+    if not hits:
+        snippet = page_head
+    else:
+        snippet = "\n\n---\n\n".join(index.passages[passage_id] for passage_id, _ in hits)
+
+    return f"Content from {url}:\n\n{snippet}"
+
+
+def _streamed_snippet(url: str, extractor: StreamingPassageExtractor) -> str:
+    extractor.close()
+    passages = extractor.passages()
+    if not passages and not extractor.head:
+        return f"Error: No text content extracted from {url}"
+    snippet = "\n\n---\n\n".join(passages) if passages else extractor.head
+    return f"Content from {url}:\n\n{snippet}"
+
+
+def _stream_search(url: str, query: str, max_bytes: int) -> str:
+    with httpx.stream("GET", url, follow_redirects=True, timeout=15.0) as response:
+        response.raise_for_status()
+        extractor = StreamingPassageExtractor(query, TOP_PASSAGES, encoding=response.charset_encoding or "utf-8")
+        for chunk in response.iter_bytes(STREAM_CHUNK_BYTES):
+            extractor.feed_bytes(chunk)
+            if extractor.bytes_read >= max_bytes or extractor.satisfied:
+                break
+    return _streamed_snippet(url, extractor)
+
+
+async def _astream_search(url: str, query: str, max_bytes: int) -> str:
+    async with get_async_client().stream("GET", url) as response:
+        response.raise_for_status()
+        extractor = StreamingPassageExtractor(query, TOP_PASSAGES, encoding=response.charset_encoding or "utf-8")
+        async for chunk in response.aiter_bytes(STREAM_CHUNK_BYTES):
+            extractor.feed_bytes(chunk)
+            if extractor.bytes_read >= max_bytes or extractor.satisfied:
+                break
+    return _streamed_snippet(url, extractor)
 
 
 def get_uri_source_tool(settings: Dict[str, Any], name: str):
     """
     Factory that returns a LangChain tool for URI search,
     preconfigured with connector settings (like fixed URL).
+    The async variant goes through the shared client and response cache;
+    settings["cache_ttl"] sets how long a fetched page stays fresh.
+    With settings["stream"], the body is read incrementally up to
+    settings["max_bytes"] and never fully buffered or cached.
     """
     url = settings.get("url")
+    cache_ttl = float(settings.get("cache_ttl", DEFAULT_TTL))
+    stream = bool(settings.get("stream", False))
+    max_bytes = int(settings.get("max_bytes", STREAM_MAX_BYTES))
 
-    @tool
     def uri_search(query: str) -> str:
         """
         Search for relevant text in a preconfigured live web page.
@@ -24,31 +118,40 @@ def get_uri_source_tool(settings: Dict[str, Any], name: str):
         if not url:
             return "Error: No URL provided in settings."
 
-        try:
-            response = httpx.get(url, follow_redirects=True, timeout=15.0)
-            response.raise_for_status()
-        except httpx.RequestError as e:
-            return f"Error: Failed to fetch the content from {url}: {e}"
-        except Exception as e:
-            return f"Unexpected error fetching {url}: {e}"
-
-        soup = BeautifulSoup(response.text, "html.parser")
-        page_text = soup.get_text(separator=" ", strip=True)
-        if not page_text:
-            return f"Error: No text content extracted from {url}"
-
-        query_lower = query.lower()
-        page_text_lower = page_text.lower()
-        index = page_text_lower.find(query_lower)
-
-        if index == -1:
-            snippet = page_text[:1000]
-        else:
-            start = max(0, index - 500)
-            end = min(len(page_text), index + 500)
-            snippet = page_text[start:end]
-
-        return f"Content from {url}:\n\n{snippet}"
-
-    uri_search.name = name
-    return uri_search
\ No newline at end of file
+        with span("tool.invoke", tool=name):
+            try:
+                if stream:
+                    with span("uri.stream"):
+                        return _stream_search(url, query, max_bytes)
+                with span("uri.fetch"):
+                    response = httpx.get(url, follow_redirects=True, timeout=15.0)
+                    response.raise_for_status()
+            except httpx.RequestError as e:
+                return f"Error: Failed to fetch the content from {url}: {e}"
+            except Exception as e:
+                return f"Unexpected error fetching {url}: {e}"
+
+            with span("uri.extract"):
+                return _extract_snippet(url, response.text, query)
+
+    async def auri_search(query: str) -> str:
+        if not url:
+            return "Error: No URL provided in settings."
+
+        with span("tool.invoke", tool=name):
+            try:
+                if stream:
+                    with span("uri.stream"):
+                        return await _astream_search(url, query, max_bytes)
+                with span("uri.fetch"):
+                    html = await response_cache.get_text(url, ttl=cache_ttl)
+            except httpx.RequestError as e:
+                return f"Error: Failed to fetch the content from {url}: {e}"
+            except Exception as e:
+                return f"Unexpected error fetching {url}: {e}"
+
+            # Parsing and indexing a large page would stall every other session on the loop.
+            with span("uri.extract"):
+                return await run_cpu(_extract_snippet, url, html, query)
+
+    return StructuredTool.from_function(func=uri_search, coroutine=auri_search, name=name)